@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import db
+from config import Config
+
+if Config.DB_BACKEND == 'mysql':
+    import aiomysql
+    DatabaseError = aiomysql.DatabaseError
+    IntegrityError = aiomysql.IntegrityError
+else:
+    # SQLite has no async driver: queries run on db.py's pool in a thread.
+    aiomysql = None
+    DatabaseError = db.DatabaseError
+    IntegrityError = db.IntegrityError
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool():
+    """The worker's aiomysql pool, created on first use (None with SQLite).
+
+    Connections run in autocommit mode, so a read never leaves a transaction
+    open (aiomysql closes rather than reuses a connection returned inside
+    one); writes open their own transaction with BEGIN.
+    """
+    global _pool
+    if aiomysql is None:
+        return None
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await aiomysql.create_pool(
+                    host=Config.MYSQL_HOST, port=Config.MYSQL_PORT, user=Config.MYSQL_USER,
+                    password=Config.MYSQL_PASSWORD, db=Config.MYSQL_DB, charset='utf8mb4',
+                    minsize=Config.DB_POOL_MIN_SIZE, maxsize=Config.ASYNC_DB_POOL_MAX_SIZE,
+                    pool_recycle=Config.DB_POOL_RECYCLE, autocommit=True)
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        pool.close()
+        await pool.wait_closed()
+
+
+# --- QUERY HELPERS ---
+# Same contract as the ones in db.py.  Every call checks out its own
+# connection, so independent queries can run concurrently with gather().
+
+async def _timed(cur, query, args, fetch=None):
+    start = time.perf_counter()
+    await cur.execute(query, args)
+    if fetch == 'all':
+        result = await cur.fetchall()
+        rows = len(result)
+    elif fetch == 'one':
+        result = await cur.fetchone()
+        rows = 0 if result is None else 1
+    else:
+        result, rows = None, max(cur.rowcount, 0)
+    elapsed = time.perf_counter() - start
+    for listener in db.query_listeners:
+        listener(None, query, args, elapsed, rows)
+    return result
+
+def _fetch_in_thread(query, args, fetch):
+    with db.pool.connection() as conn:
+        cur = conn.cursor()
+        try:
+            return db._timed(None, cur, query, args, fetch)
+        finally:
+            cur.close()
+
+def _write_in_thread(query, args):
+    with db.pool.connection() as conn:
+        return db.write(conn, query, args)
+
+async def _fetch(query, args, fetch):
+    if aiomysql is None:
+        return await asyncio.to_thread(_fetch_in_thread, query, args, fetch)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            return await _timed(cur, query, args, fetch)
+
+async def fetch_all(query, args=None):
+    return await _fetch(query, args or (), 'all')
+
+async def fetch_one(query, args):
+    return await _fetch(query, args, 'one')
+
+async def _execute_write(query, args):
+    if aiomysql is None:
+        return await asyncio.to_thread(_write_in_thread, query, args)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.begin()
+        try:
+            async with conn.cursor() as cur:
+                await _timed(cur, query, args)
+                rowcount, lastrowid = cur.rowcount, cur.lastrowid
+                table = db.written_table(query)
+                if table and rowcount:
+                    await cur.execute(*db.version_bump(table))
+            start = time.perf_counter()
+            await conn.commit()
+            elapsed = time.perf_counter() - start
+        except Exception:
+            await conn.rollback()
+            raise
+    for listener in db.commit_listeners:
+        listener(elapsed)
+    if table and rowcount:
+        db.notify_write(table)
+    return rowcount, lastrowid
+
+async def execute_commit(query, args):
+    return (await _execute_write(query, args))[0]
+
+async def execute_insert(query, args):
+    return (await _execute_write(query, args))[1]
+
+async def table_version(table):
+    row = await fetch_one("SELECT Version FROM Table_Version WHERE Table_name=%s", (table,))
+    return row[0] if row else 0
@@ -0,0 +1,123 @@
+import db
+
+CHUNK = 1000  # victims placed per transaction
+
+
+class AllocationError(Exception):
+    pass
+
+
+class AllocationResult:
+    def __init__(self, disaster_id):
+        self.disaster_id = disaster_id
+        self.assigned = {}
+        self.unplaced = 0
+
+    @property
+    def total(self):
+        return sum(self.assigned.values())
+
+    def summary(self):
+        placed = ', '.join('camp %s: %d' % item for item in self.assigned.items()) or 'none'
+        return 'Assigned %d victims (%s); %d still unplaced.' % (self.total, placed, self.unplaced)
+
+
+def occupancy(camp_ids):
+    if not camp_ids:
+        return {}
+    rows = db.fetch_all("SELECT Camp_ID, Occupied FROM Camp_Occupancy WHERE Camp_ID IN (%s)"
+                        % ','.join(['%s'] * len(camp_ids)), tuple(camp_ids))
+    return dict(rows)
+
+
+def candidate_camps(disaster_id, camp_ids=None):
+    """Camps to fill for a disaster, most free beds first.
+
+    Without an explicit list, camps whose Location mentions the disaster's
+    city are used (Relief_Camp.Location is free text).
+    """
+    query = ("SELECT c.Camp_ID, c.Capacity - o.Occupied AS Free FROM Relief_Camp c "
+             "JOIN Camp_Occupancy o ON o.Camp_ID = c.Camp_ID ")
+    if camp_ids:
+        rows = db.fetch_all(query + "WHERE c.Camp_ID IN (%s) ORDER BY Free DESC, c.Camp_ID"
+                            % ','.join(['%s'] * len(camp_ids)), tuple(camp_ids))
+    else:
+        city = db.fetch_one("SELECT l.City FROM Disaster d JOIN Location l ON l.Location_ID = d.Location_ID "
+                            "WHERE d.Disaster_ID=%s", (disaster_id,))
+        if not city:
+            raise AllocationError('Disaster %s not found' % disaster_id)
+        rows = db.fetch_all(query + "WHERE c.Location LIKE %s ORDER BY Free DESC, c.Camp_ID", ('%' + city[0] + '%',))
+        if not rows:
+            raise AllocationError('No relief camp found in %s; choose camps explicitly' % city[0])
+    return [camp_id for camp_id, free in rows if free > 0]
+
+
+def assign_unplaced(disaster_id, camp_ids=None):
+    """Place a disaster's victims without a camp into camps with free beds.
+
+    Each step locks one camp's occupancy row, takes up to its free capacity
+    (at most CHUNK) of the oldest unplaced victims and moves them with a
+    single UPDATE, then commits.  The occupancy triggers still check every
+    row, so concurrent placements elsewhere can never overfill a camp.
+    """
+    result = AllocationResult(disaster_id)
+    conn = db.get_connection()
+    cur = conn.cursor()
+    exhausted = False
+    try:
+        for camp_id in candidate_camps(disaster_id, camp_ids):
+            while not exhausted:
+                cur.execute("SELECT c.Capacity - o.Occupied FROM Relief_Camp c "
+                            "JOIN Camp_Occupancy o ON o.Camp_ID = c.Camp_ID WHERE c.Camp_ID=%s FOR UPDATE", (camp_id,))
+                row = cur.fetchone()
+                free = row[0] if row else 0
+                if free <= 0:
+                    db.commit(conn)
+                    break
+                cur.execute("SELECT Victim_ID FROM Victim WHERE Disaster_ID=%s AND Camp_ID IS NULL "
+                            "ORDER BY Victim_ID LIMIT %s FOR UPDATE", (disaster_id, min(free, CHUNK)))
+                ids = [r[0] for r in cur.fetchall()]
+                if not ids:
+                    db.commit(conn)
+                    exhausted = True
+                    break
+                cur.execute("UPDATE Victim SET Camp_ID=%%s WHERE Victim_ID IN (%s)" % ','.join(['%s'] * len(ids)),
+                            [camp_id] + ids)
+                db.bump_versions(cur, 'Victim')
+                db.commit(conn)
+                db.notify_write('Victim')
+                result.assigned[camp_id] = result.assigned.get(camp_id, 0) + len(ids)
+                exhausted = len(ids) < min(free, CHUNK)
+            if exhausted:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    result.unplaced = db.fetch_one("SELECT COUNT(*) FROM Victim WHERE Disaster_ID=%s AND Camp_ID IS NULL",
+                                   (disaster_id,))[0]
+    return result
+
+
+def rebuild_occupancy():
+    """Recount Camp_Occupancy from Victim (repairs drift after manual SQL)."""
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM Camp_Occupancy")
+        cur.execute("INSERT INTO Camp_Occupancy (Camp_ID, Occupied) "
+                    "SELECT c.Camp_ID, COUNT(v.Victim_ID) FROM Relief_Camp c "
+                    "LEFT JOIN Victim v ON v.Camp_ID = c.Camp_ID GROUP BY c.Camp_ID")
+        count = cur.rowcount
+        # Camp pages, the dashboard and /reports are cached by these versions.
+        db.bump_versions(cur, 'Relief_Camp', 'Victim')
+        db.commit(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    db.notify_write('Relief_Camp')
+    db.notify_write('Victim')
+    return count
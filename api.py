@@ -0,0 +1,287 @@
+import datetime
+import decimal
+import hashlib
+
+from flask import Blueprint, Response, jsonify, request, url_for
+from werkzeug.datastructures import MultiDict
+
+import db
+import delete_jobs
+import inventory
+from entities import ENTITIES
+import search
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+RESOURCES = {entity.api_name: entity for entity in ENTITIES.values()}
+
+SIGNAL_ERROR = 1644  # raised by SIGNAL in a trigger: full camp, stale stock, ...
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, fields=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.fields = fields
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(e):
+    body = {'error': e.message}
+    if e.fields:
+        body['fields'] = e.fields
+    return jsonify(body), e.status
+
+
+def get_resource(name):
+    if name not in RESOURCES:
+        raise ApiError(404, 'Unknown resource: %s' % name)
+    return RESOURCES[name]
+
+
+def jsonable(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (datetime.timedelta, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+def to_item(columns, row, fields=None):
+    return {c: jsonable(v) for c, v in zip(columns, row) if fields is None or c in fields}
+
+
+def selected_fields(resource, value):
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in resource.columns]
+    if unknown:
+        raise ApiError(400, 'Unknown field(s): %s' % ', '.join(unknown))
+    return fields
+
+
+# --- CONDITIONAL GET ---
+
+def make_etag(resource, version, parts):
+    # The table version changes on every committed write, so the tag only
+    # needs the version plus whatever selects the representation.
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return '%s-%d-%s' % (resource.table, version, digest)
+
+
+def etag_for(resource, *parts):
+    return make_etag(resource, db.table_version(resource.table), parts)
+
+
+def not_modified(etag):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# --- WRITES ---
+
+def field_hint(form_class, name):
+    field = getattr(form_class, name, None)
+    return field.kwargs.get('description') if field is not None else None
+
+
+def validate(resource, data, existing=None, current=None):
+    """Form-validated values for an insert, or for an update of the row
+    `current` (PATCH also passes it as `existing`, the values to start
+    from).  An update may send back a column it cannot change, such as a
+    resource's Quantity, only with its current value."""
+    if resource.read_only:
+        raise ApiError(405, '%s is read-only' % resource.table)
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Request body must be a JSON object')
+    columns = resource.writable if current is None else resource.updatable
+    form_class = resource.form_class if current is None else resource.edit_form_class
+    if current is not None:
+        fixed = {c: [field_hint(form_class, c) or 'Cannot be changed'] for c in resource.writable
+                 if c not in columns and c in data and str(data[c]) != str(current.get(c))}
+        if fixed:
+            raise ApiError(409, 'Field(s) cannot be changed: %s' % ', '.join(sorted(fixed)), fixed)
+    values = dict(existing or {})
+    values.update({k: v for k, v in data.items() if k in columns})
+    formdata = MultiDict((c, '' if values.get(c) is None else str(values[c])) for c in columns)
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        raise ApiError(400, 'Validation failed', form.errors)
+    return tuple(form[c].data for c in columns)
+
+
+def page_body(page, needed, fields, link):
+    # link(args) -> URL of the same listing with these query arguments.
+    return {
+        'items': [to_item(needed, row, fields) for row in page.rows],
+        'sort': page.sort,
+        'order': page.order,
+        'size': page.size,
+        'next': link(page.args(after=page.next_cursor, fields=fields and ','.join(fields))) if page.has_next else None,
+        'prev': link(page.args(before=page.prev_cursor, fields=fields and ','.join(fields))) if page.has_prev else None,
+    }
+
+
+def needed_columns(resource, fields, sort):
+    return [c for c in resource.columns if fields is None or c in fields or c in (resource.pk, sort)]
+
+
+def load(resource, id, fields=None):
+    row = db.fetch_one(resource.select_sql, (id,))
+    if not row:
+        raise ApiError(404, '%s %s not found' % (resource.table, id))
+    return to_item(resource.columns, row, fields)
+
+
+def write(query, args, insert=False):
+    try:
+        return db.execute_insert(query, args) if insert else db.execute_commit(query, args)
+    except db.IntegrityError as e:
+        raise ApiError(409, str(e))
+    except db.OperationalError as e:
+        if e.args[0] == SIGNAL_ERROR:
+            raise ApiError(409, e.args[1])
+        raise
+
+
+# --- ROUTES ---
+
+@api.route('/search')
+def search_items():
+    kinds = [k for k in request.args.getlist('type') if k in search.TARGETS] or None
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+    except ValueError:
+        raise ApiError(400, 'limit must be an integer')
+    return jsonify(results=search.search(request.args.get('q', ''), kinds, limit))
+
+
+@api.route('/<name>', methods=['GET'])
+def list_items(name):
+    resource = get_resource(name)
+    fields = selected_fields(resource, request.args.get('fields'))
+    etag = etag_for(resource, 'list', sorted(request.args.items(multi=True)))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    needed = needed_columns(resource, fields, request.args.get('sort'))
+    page = resource.paginator_for(needed).page(db.fetch_all, request.args)
+    body = page_body(page, needed, fields, lambda args: url_for('api.list_items', name=name, **args))
+    return with_etag(jsonify(body), etag)
+
+
+@api.route('/<name>/<int:id>', methods=['GET'])
+def get_item(name, id):
+    resource = get_resource(name)
+    fields = selected_fields(resource, request.args.get('fields'))
+    etag = etag_for(resource, 'item', id, fields)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return with_etag(jsonify(load(resource, id, fields)), etag)
+
+
+@api.route('/<name>', methods=['POST'])
+def create_item(name):
+    resource = get_resource(name)
+    values = validate(resource, request.get_json(silent=True))
+    new_id = write(resource.insert_sql, values, insert=True)
+    search.row_saved(resource.table, new_id, values[0])
+    response = jsonify(load(resource, new_id))
+    response.status_code = 201
+    response.headers['Location'] = url_for('api.get_item', name=name, id=new_id)
+    return response
+
+
+@api.route('/<name>/<int:id>', methods=['PUT', 'PATCH'])
+def update_item(name, id):
+    resource = get_resource(name)
+    current = load(resource, id)
+    existing = current if request.method == 'PATCH' else None
+    values = validate(resource, request.get_json(silent=True), existing, current)
+    write(resource.update_sql, values + (id,))
+    search.row_saved(resource.table, id, values[0])
+    return jsonify(load(resource, id))
+
+
+@api.route('/<name>/<int:id>', methods=['DELETE'])
+def delete_item(name, id):
+    resource = get_resource(name)
+    if resource.read_only:
+        raise ApiError(405, '%s is read-only' % resource.table)
+    if resource.dependents:
+        try:
+            job_id, total, finished = delete_jobs.delete_later(resource, id)
+        except delete_jobs.DeleteRefused as e:
+            raise ApiError(409, str(e))
+        except delete_jobs.DeleteJobError as e:
+            raise ApiError(404, str(e))
+        if finished:
+            return '', 204
+        response = jsonify(load(RESOURCES['delete_jobs'], job_id))
+        response.status_code = 202
+        response.headers['Location'] = url_for('api.get_item', name='delete_jobs', id=job_id)
+        return response
+    if not write(resource.delete_sql, (id,)):
+        raise ApiError(404, '%s %s not found' % (resource.table, id))
+    search.row_deleted(resource.table, id)
+    return '', 204
+
+
+# --- INVENTORY ---
+# Stock moves through inventory.py only; the generic routes above can set a
+# new resource's opening Quantity but not change it afterwards.
+
+def stock_request(body, action):
+    items = body.get('items') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        raise ApiError(400, 'Request body must be {"items": [{"Resource_ID": ..., "Quantity": ...}, ...]}')
+    pairs = []
+    for item in items:
+        resource_id, quantity = item.get('Resource_ID'), item.get('Quantity')
+        if not isinstance(resource_id, int) or not isinstance(quantity, int) or isinstance(quantity, bool):
+            raise ApiError(400, 'Resource_ID and Quantity must be integers')
+        if quantity == 0 or (quantity < 0 and action != 'adjust'):
+            raise ApiError(400, 'Quantity must be positive%s' % (' or negative' if action == 'adjust' else ''))
+        pairs.append((resource_id, quantity))
+    reference = body.get('reference')
+    if reference is not None and (not isinstance(reference, str) or len(reference) > 100):
+        raise ApiError(400, 'reference must be a string of at most 100 characters')
+    return pairs, reference
+
+
+@api.route('/inventory/<any(receive, adjust, dispatch, reserve):action>', methods=['POST'])
+def move_stock(action):
+    items, reference = stock_request(request.get_json(silent=True), action)
+    try:
+        result = inventory.ACTIONS[action](items, reference)
+    except inventory.InventoryError as e:
+        raise ApiError(409, str(e))
+    resources = RESOURCES['resources']
+    body = {'resources': [load(resources, resource_id) for resource_id in sorted({r for r, _ in items})]}
+    if action == 'reserve':
+        body['reservations'] = [load(RESOURCES['reservations'], id) for id in result]
+        return jsonify(body), 201
+    return jsonify(body)
+
+
+@api.route('/reservations/<int:id>/<any(dispatch, release):action>', methods=['POST'])
+def close_reservation(id, action):
+    body = request.get_json(silent=True) or {}
+    try:
+        getattr(inventory, action)([id], body.get('reference'))
+    except inventory.InventoryError as e:
+        raise ApiError(409, str(e))
+    return jsonify(load(RESOURCES['reservations'], id))
@@ -1,541 +1,307 @@
-from flask import Flask, render_template, redirect, url_for, flash
-from flask_mysqldb import MySQL
-from flask_wtf import FlaskForm
-from wtforms import StringField, IntegerField, DateField, TimeField, DecimalField, SelectField, validators
+import io
+import click
+from flask import Flask, Response, render_template, redirect, url_for, flash, request, jsonify, abort
 from config import Config
+from forms import ImportForm, AllocationForm, StockForm
+from entities import ENTITIES
+import crud
+from dashboard_cache import DashboardCache, COUNTERS
+from changefeed import ChangeFeed, counts_payload
+from bulk_import import IMPORTS, read_rows, import_rows
+from export import EXPORTS, FORMATS, ExportError, export_stream
+from api import api
+import field_sync  # adds POST /api/v1/sync to the api blueprint
+import db
+from db import fetch_one
+import metrics
+import search
+import allocation
+import reports
+import delete_jobs
+import page_cache
+import inventory
+import archive
 
 app = Flask(__name__)
-app.config['MYSQL_HOST'] = Config.MYSQL_HOST
-app.config['MYSQL_USER'] = Config.MYSQL_USER
-app.config['MYSQL_PASSWORD'] = Config.MYSQL_PASSWORD
-app.config['MYSQL_DB'] = Config.MYSQL_DB
 app.secret_key = "supersecretkey"
 
-mysql = MySQL(app)
-
-# --- FORMS ---
-
-class LocationForm(FlaskForm):
-    City = StringField('City', [validators.InputRequired(), validators.Length(max=50)])
-    District = StringField('District', [validators.InputRequired(), validators.Length(max=50)])
-    State = StringField('State', [validators.InputRequired(), validators.Length(max=50)])
-
-class DisasterForm(FlaskForm):
-    D_type = SelectField('Disaster Type', choices=[
-        ('Flood','Flood'),('Cyclone','Cyclone'),('Earthquake','Earthquake'),
-        ('Landslide','Landslide'),('Fire','Fire'),('Other','Other')
-    ])
-    D_date = DateField('Date', format='%Y-%m-%d')
-    D_time = TimeField('Time', format='%H:%M')
-    Location_ID = IntegerField('Location ID', [validators.InputRequired()])
-
-class ReliefCampForm(FlaskForm):
-    Camp_Name = StringField('Camp Name', [validators.InputRequired(), validators.Length(max=100)])
-    Location = StringField('Location', [validators.InputRequired(), validators.Length(max=100)])
-    Capacity = IntegerField('Capacity', [validators.InputRequired(), validators.NumberRange(min=1)])
-    Incharge = StringField('Incharge', [validators.InputRequired(), validators.Length(max=100)])
-
-class VictimForm(FlaskForm):
-    Vic_name = StringField('Name', [validators.InputRequired(), validators.Length(max=100)])
-    DOB = DateField('Date of Birth', format='%Y-%m-%d')
-    Contact = StringField('Contact', [validators.InputRequired(), validators.Length(max=15)])
-    Disaster_ID = IntegerField('Disaster ID', [validators.InputRequired()])
-    Camp_ID = IntegerField('Camp ID (optional)', [validators.Optional()])
-
-class VolunteersForm(FlaskForm):
-    V_name = StringField('Name', [validators.InputRequired(), validators.Length(max=100)])
-    Age = IntegerField('Age', [validators.InputRequired(), validators.NumberRange(min=18)])
-    Gender = SelectField('Gender', choices=[('Male','Male'), ('Female','Female'), ('Other','Other')])
-    Contact_Info = StringField('Contact', [validators.InputRequired(), validators.Length(max=15)])
-
-class ResourcesForm(FlaskForm):
-    R_name = StringField('Resource Name', [validators.InputRequired(), validators.Length(max=100)])
-    R_type = StringField('Resource Type', [validators.InputRequired(), validators.Length(max=50)])
-    Quantity = IntegerField('Quantity', [validators.InputRequired(), validators.NumberRange(min=1)])
-
-class RescueTeamForm(FlaskForm):
-    Team_name = StringField('Team Name', [validators.InputRequired(), validators.Length(max=100)])
-    Team_type = SelectField('Team Type', choices=[('Medical','Medical'),('Rescue','Rescue'),('Army','Army'),('Fire','Fire'),('Other','Other')])
-    No_of_People = IntegerField('Number of People', [validators.InputRequired(), validators.NumberRange(min=1)])
-    Disaster_ID = IntegerField('Disaster ID', [validators.InputRequired()])
-
-class DonorForm(FlaskForm):
-    Donor_name = StringField('Donor Name', [validators.InputRequired(), validators.Length(max=100)])
-    Contact = StringField('Contact', [validators.InputRequired(), validators.Length(max=15)])
-
-class DonationForm(FlaskForm):
-    Donor_ID = IntegerField('Donor ID', [validators.InputRequired()])
-    Amount = DecimalField('Amount', [validators.InputRequired(), validators.NumberRange(min=0.01)])
-    Donation_date = DateField('Donation Date', format='%Y-%m-%d')
-    Resource_ID = IntegerField('Resource ID', [validators.InputRequired()])
-
-def fetch_all(query, args=None):
-    cur = mysql.connection.cursor()
-    cur.execute(query, args or ())
-    rows = cur.fetchall()
-    cur.close()
-    return rows
-
-def fetch_one(query, args):
-    cur = mysql.connection.cursor()
-    cur.execute(query, args)
-    row = cur.fetchone()
-    cur.close()
-    return row
-
-def execute_commit(query, args):
-    cur = mysql.connection.cursor()
-    cur.execute(query, args)
-    mysql.connection.commit()
-    cur.close()
+db.init_app(app)
+metrics.init_app(app)
+page_cache.init_app(app)
+dashboard_cache = DashboardCache(ttl=Config.DASHBOARD_CACHE_TTL, stale_grace=Config.DASHBOARD_STALE_GRACE)
+db.on_write(dashboard_cache.invalidate)
+change_feed = ChangeFeed(app, dashboard_cache, interval=Config.CHANGE_FEED_POLL_INTERVAL,
+                         heartbeat=Config.CHANGE_FEED_HEARTBEAT, retention=Config.CHANGE_FEED_RETENTION)
+delete_jobs.init_app(app)
+app.register_blueprint(api)
+
+# CRUD PAGES - one set of list/add/edit/delete routes per entity in entities.py.
+# Sortable columns must be NOT NULL and indexed (see database.txt).
+
+# Deleted disasters older than Config.ARCHIVE_AFTER_DAYS are listed from the archive files.
+archive.attach(ENTITIES['disaster_delete_log'])
+
+def camp_occupancy(rows):
+    return {'occupancy': allocation.occupancy([row.Camp_ID for row in rows])}
+
+for entity in ENTITIES.values():
+    if entity.name == 'relief_camp':
+        # Occupancy moves with every victim placed or removed.
+        crud.register_routes(app, entity, camp_occupancy, tables=['Victim'])
+    else:
+        crud.register_routes(app, entity)
 
 # DASHBOARD + LIVE DONATIONS BOX
 
+DASHBOARD_TABLES = sorted({table for table, _ in COUNTERS.values()})
+
 @app.route('/')
+@page_cache.cached(DASHBOARD_TABLES)
 def dashboard():
-    counts = {
-        'locations': fetch_one("SELECT COUNT(*) FROM Location", ())[0],
-        'disasters': fetch_one("SELECT COUNT(*) FROM Disaster", ())[0],
-        'relief_camps': fetch_one("SELECT COUNT(*) FROM Relief_Camp", ())[0],
-        'victims': fetch_one("SELECT COUNT(*) FROM Victim", ())[0],
-        'volunteers': fetch_one("SELECT COUNT(*) FROM Volunteers", ())[0],
-        'resources': fetch_one("SELECT COUNT(*) FROM Resources", ())[0],
-        'rescue_teams': fetch_one("SELECT COUNT(*) FROM Rescue_Team", ())[0],
-        'donors': fetch_one("SELECT COUNT(*) FROM Donor", ())[0],
-        'donations': fetch_one("SELECT COUNT(*) FROM Donation", ())[0],
-    }
-    total_donations = fetch_one("SELECT IFNULL(SUM(Amount),0) FROM Donation", ())[0]
+    # Only reached when the page changed, so pick up other workers' writes now.
+    dashboard_cache.observe(db.table_versions(DASHBOARD_TABLES))
+    counts = dashboard_cache.get(fetch_one)
+    total_donations = counts.pop('total_donations')
     return render_template('dashboard.html', counts=counts, total_donations=total_donations)
 
-# LOCATIONS
-@app.route('/location')
-def location_list():
-    rows = fetch_all("SELECT * FROM Location ORDER BY Location_ID ASC")
-    return render_template('location.html', rows=rows)
-
-@app.route('/location/add', methods=['GET', 'POST'])
-def location_add():
-    form = LocationForm()
-    if form.validate_on_submit():
-        try:
-            execute_commit("INSERT INTO Location (City, District, State) VALUES (%s,%s,%s)", (form.City.data, form.District.data, form.State.data))
-            flash('Location added successfully.', 'success')
-            return redirect(url_for('location_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Location')
-
-@app.route('/location/edit/<int:id>', methods=['GET', 'POST'])
-def location_edit(id):
-    row = fetch_one("SELECT * FROM Location WHERE Location_ID=%s", (id,))
-    if not row:
-        flash("Location not found", "danger")
-        return redirect(url_for('location_list'))
-    form = LocationForm(obj=row)
-    if form.validate_on_submit():
-        try:
-            execute_commit("UPDATE Location SET City=%s, District=%s, State=%s WHERE Location_ID=%s", (form.City.data, form.District.data, form.State.data, id))
-            flash('Location updated successfully.', 'success')
-            return redirect(url_for('location_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    else:
-        form.City.data, form.District.data, form.State.data = row[1], row[2], row[3]
-    return render_template('form.html', form=form, title='Edit Location')
+@app.route('/api/v1/dashboard')
+def dashboard_counts():
+    return jsonify(counts_payload(dashboard_cache.get(fetch_one)))
 
-@app.route('/location/delete/<int:id>', methods=['POST'])
-def location_delete(id):
-    try:
-        execute_commit("DELETE FROM Location WHERE Location_ID=%s", (id,))
-        flash('Location deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('location_list'))
-
-# DISASTERS
-@app.route('/disaster')
-def disaster_list():
-    rows = fetch_all("SELECT * FROM Disaster ORDER BY Disaster_ID ASC")
-    return render_template('disaster.html', rows=rows)
-
-@app.route('/disaster/add', methods=['GET', 'POST'])
-def disaster_add():
-    form = DisasterForm()
-    if form.validate_on_submit():
-        try:
-            execute_commit("INSERT INTO Disaster (D_type, D_date, D_time, Location_ID) VALUES (%s,%s,%s,%s)", (form.D_type.data, form.D_date.data, form.D_time.data, form.Location_ID.data))
-            flash('Disaster added successfully', 'success')
-            return redirect(url_for('disaster_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Disaster')
-
-@app.route('/disaster/edit/<int:id>', methods=['GET', 'POST'])
-def disaster_edit(id):
-    row = fetch_one("SELECT * FROM Disaster WHERE Disaster_ID=%s", (id,))
-    if not row:
-        flash("Disaster not found", "danger")
-        return redirect(url_for('disaster_list'))
-    form = DisasterForm(obj=row)
-    if form.validate_on_submit():
-        try:
-            execute_commit("UPDATE Disaster SET D_type=%s, D_date=%s, D_time=%s, Location_ID=%s WHERE Disaster_ID=%s", (form.D_type.data, form.D_date.data, form.D_time.data, form.Location_ID.data, id))
-            flash('Disaster updated successfully.', 'success')
-            return redirect(url_for('disaster_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    else:
-        form.D_type.data, form.D_date.data, form.D_time.data, form.Location_ID.data = row[1], row[2], row[3], row[4]
-    return render_template('form.html', form=form, title='Edit Disaster')
-
-@app.route('/disaster/delete/<int:id>', methods=['POST'])
-def disaster_delete(id):
-    try:
-        execute_commit("DELETE FROM Disaster WHERE Disaster_ID=%s", (id,))
-        flash('Disaster deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('disaster_list'))
+@app.route('/events/dashboard')
+def dashboard_events():
+    # Server-Sent Events: current counts first, then deltas as they happen.
+    return Response(change_feed.stream(dashboard_cache.get(fetch_one)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # RELIEF CAMPS
-@app.route('/relief_camp')
-def relief_camp_list():
-    rows = fetch_all("SELECT * FROM Relief_Camp ORDER BY Camp_ID ASC")
-    return render_template('relief_camp.html', rows=rows)
-
-@app.route('/relief_camp/add', methods=['GET', 'POST'])
-def relief_camp_add():
-    form = ReliefCampForm()
+@app.route('/relief_camp/allocate', methods=['GET', 'POST'])
+def relief_camp_allocate():
+    form = AllocationForm()
     if form.validate_on_submit():
+        camp_ids = [int(c) for c in form.Camp_IDs.data.split(',')] if form.Camp_IDs.data else None
         try:
-            execute_commit("INSERT INTO Relief_Camp (Camp_Name, Location, Capacity, Incharge) VALUES (%s,%s,%s,%s)",
-                (form.Camp_Name.data, form.Location.data, form.Capacity.data, form.Incharge.data))
-            flash('Relief Camp added successfully', 'success')
+            result = allocation.assign_unplaced(form.Disaster_ID.data, camp_ids)
+            flash(result.summary(), 'success' if not result.unplaced else 'warning')
             return redirect(url_for('relief_camp_list'))
         except Exception as e:
             flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Relief Camp')
-
-@app.route('/relief_camp/edit/<int:id>', methods=['GET', 'POST'])
-def relief_camp_edit(id):
-    row = fetch_one("SELECT * FROM Relief_Camp WHERE Camp_ID=%s", (id,))
-    if not row:
-        flash("Relief Camp not found", "danger")
-        return redirect(url_for('relief_camp_list'))
-    form = ReliefCampForm(obj=row)
-    if form.validate_on_submit():
-        try:
-            execute_commit("UPDATE Relief_Camp SET Camp_Name=%s, Location=%s, Capacity=%s, Incharge=%s WHERE Camp_ID=%s",
-                (form.Camp_Name.data, form.Location.data, form.Capacity.data, form.Incharge.data, id))
-            flash('Relief Camp updated successfully.', 'success')
-            return redirect(url_for('relief_camp_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    else:
-        form.Camp_Name.data, form.Location.data, form.Capacity.data, form.Incharge.data = row[1], row[2], row[3], row[4]
-    return render_template('form.html', form=form, title='Edit Relief Camp')
+    return render_template('form.html', form=form, title='Allocate Unplaced Victims to Camps')
 
-@app.route('/relief_camp/delete/<int:id>', methods=['POST'])
-def relief_camp_delete(id):
-    try:
-        execute_commit("DELETE FROM Relief_Camp WHERE Camp_ID=%s", (id,))
-        flash('Relief Camp deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('relief_camp_list'))
-
-# VICTIMS - AGE HIDDEN
-@app.route('/victim')
-def victim_list():
-    rows = fetch_all("SELECT * FROM Victim ORDER BY Victim_ID ASC")
-    return render_template('victim.html', rows=rows)
-
-@app.route('/victim/add', methods=['GET', 'POST'])
-def victim_add():
-    form = VictimForm()
-    if form.validate_on_submit():
-        try:
-            camp_id = form.Camp_ID.data if form.Camp_ID.data else None
-            execute_commit("INSERT INTO Victim (Vic_name, DOB, Contact, Disaster_ID, Camp_ID) VALUES (%s,%s,%s,%s,%s)",
-                (form.Vic_name.data, form.DOB.data, form.Contact.data, form.Disaster_ID.data, camp_id))
-            flash('Victim added successfully', 'success')
-            return redirect(url_for('victim_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Victim')
-
-@app.route('/victim/edit/<int:id>', methods=['GET', 'POST'])
-def victim_edit(id):
-    row = fetch_one("SELECT * FROM Victim WHERE Victim_ID=%s", (id,))
-    if not row:
-        flash("Victim not found", "danger")
-        return redirect(url_for('victim_list'))
-    form = VictimForm(obj=row)
+# INVENTORY - stock moves only through inventory.py: conditional updates plus the Stock_Movement ledger.
+@app.route('/resources/stock', methods=['GET', 'POST'])
+def resources_stock():
+    form = StockForm()
     if form.validate_on_submit():
         try:
-            camp_id = form.Camp_ID.data if form.Camp_ID.data else None
-            execute_commit("UPDATE Victim SET Vic_name=%s, DOB=%s, Contact=%s, Disaster_ID=%s, Camp_ID=%s WHERE Victim_ID=%s",
-                (form.Vic_name.data, form.DOB.data, form.Contact.data, form.Disaster_ID.data, camp_id, id))
-            flash('Victim updated successfully', 'success')
-            return redirect(url_for('victim_list'))
-        except Exception as e:
+            result = inventory.ACTIONS[form.Action.data](inventory.parse_items(form.Items.data), form.Reference.data or None)
+            if form.Action.data == 'reserve':
+                flash('Reserved: reservation(s) %s.' % ', '.join(map(str, result)), 'success')
+                return redirect(url_for('resource_reservation_list'))
+            flash('Stock updated for %d resource(s).' % result, 'success')
+            return redirect(url_for('stock_movement_list'))
+        except inventory.InventoryError as e:
             flash(str(e), 'danger')
-    else:
-        form.Vic_name.data, form.DOB.data, form.Contact.data, form.Disaster_ID.data, form.Camp_ID.data = row[1], row[2], row[4], row[5], row[6]
-    return render_template('form.html', form=form, title='Edit Victim')
+    return render_template('form.html', form=form, title='Move Stock')
 
-@app.route('/victim/delete/<int:id>', methods=['POST'])
-def victim_delete(id):
+@app.route('/resource_reservation/<int:id>/<any(dispatch, release):action>', methods=['POST'])
+def reservation_action(id, action):
     try:
-        execute_commit("DELETE FROM Victim WHERE Victim_ID=%s", (id,))
-        flash('Victim deleted.', 'success')
-    except Exception as e:
+        getattr(inventory, action)([id])
+        flash('Reservation %d %s.' % (id, 'dispatched' if action == 'dispatch' else 'released'), 'success')
+    except inventory.InventoryError as e:
         flash(str(e), 'danger')
-    return redirect(url_for('victim_list'))
-
-# VOLUNTEERS
-@app.route('/volunteers')
-def volunteers_list():
-    rows = fetch_all("SELECT * FROM Volunteers ORDER BY Volunteer_ID ASC")
-    return render_template('volunteers.html', rows=rows)
-
-@app.route('/volunteers/add', methods=['GET', 'POST'])
-def volunteers_add():
-    form = VolunteersForm()
-    if form.validate_on_submit():
-        try:
-            execute_commit(
-                "INSERT INTO Volunteers (V_name, Age, Gender, Contact_Info) VALUES (%s,%s,%s,%s)",
-                (form.V_name.data, form.Age.data, form.Gender.data, form.Contact_Info.data)
-            )
-            flash('Volunteer added successfully', 'success')
-            return redirect(url_for('volunteers_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Volunteer')
-
-@app.route('/volunteers/edit/<int:id>', methods=['GET', 'POST'])
-def volunteers_edit(id):
-    row = fetch_one("SELECT * FROM Volunteers WHERE Volunteer_ID=%s", (id,))
-    if not row:
-        flash("Volunteer not found", "danger")
-        return redirect(url_for('volunteers_list'))
-    form = VolunteersForm(obj=row)
-    if form.validate_on_submit():
-        try:
-            execute_commit(
-                "UPDATE Volunteers SET V_name=%s, Age=%s, Gender=%s, Contact_Info=%s WHERE Volunteer_ID=%s",
-                (form.V_name.data, form.Age.data, form.Gender.data, form.Contact_Info.data, id)
-            )
-            flash('Volunteer updated successfully', 'success')
-            return redirect(url_for('volunteers_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    else:
-        form.V_name.data, form.Age.data, form.Gender.data, form.Contact_Info.data = row[1], row[2], row[3], row[4]
-    return render_template('form.html', form=form, title='Edit Volunteer')
-
-@app.route('/volunteers/delete/<int:id>', methods=['POST'])
-def volunteers_delete(id):
+    return redirect(url_for('resource_reservation_list'))
+
+@app.cli.command('inventory-check')
+def inventory_check_command():
+    """Compare every resource's stock with the sum of its ledger entries."""
+    rows = inventory.mismatches()
+    for row in rows:
+        click.echo('resource %s: Quantity %s, Reserved %s, but the ledger sums to %s / %s' % row)
+    if rows:
+        raise click.ClickException('%d resource(s) out of step with Stock_Movement.' % len(rows))
+    click.echo('Stock matches the ledger for every resource.')
+
+# SEARCH
+@app.route('/search')
+def search_page():
+    query = request.args.get('q', '')
+    kinds = [k for k in request.args.getlist('type') if k in search.TARGETS] or None
     try:
-        execute_commit("DELETE FROM Volunteers WHERE Volunteer_ID=%s", (id,))
-        flash('Volunteer deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('volunteers_list'))
-
-# RESOURCES
-@app.route('/resources')
-def resources_list():
-    rows = fetch_all("SELECT * FROM Resources ORDER BY Resource_ID ASC")
-    return render_template('resources.html', rows=rows)
-
-@app.route('/resources/add', methods=['GET', 'POST'])
-def resources_add():
-    form = ResourcesForm()
-    if form.validate_on_submit():
-        try:
-            execute_commit(
-                "INSERT INTO Resources (R_name, R_type, Quantity) VALUES (%s,%s,%s)",
-                (form.R_name.data, form.R_type.data, form.Quantity.data)
-            )
-            flash('Resource added successfully', 'success')
-            return redirect(url_for('resources_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Resource')
-
-@app.route('/resources/edit/<int:id>', methods=['GET', 'POST'])
-def resources_edit(id):
-    row = fetch_one("SELECT * FROM Resources WHERE Resource_ID=%s", (id,))
-    if not row:
-        flash("Resource not found", "danger")
-        return redirect(url_for('resources_list'))
-    form = ResourcesForm(obj=row)
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    results = search.search(query, kinds, limit) if query else []
+    return render_template('search.html', query=query, kinds=kinds or [], results=results)
+
+# REPORTS - read from the rollup tables kept up to date by triggers (see database.txt).
+@app.route('/reports')
+@page_cache.cached(reports.TABLES)
+def reports_page():
+    group = request.args.get('group')
+    if group not in ('donations', 'victims', 'rescue'):
+        group = None
+    return render_template('reports.html', results=reports.run_reports(group), group=group)
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the report rollup tables from the raw tables."""
+    for table, rows in reports.rebuild_rollups().items():
+        click.echo('%-24s %d rows' % (table, rows))
+    # The rebuild does not move Table_Version, so cached report pages would survive it.
+    if 'page_cache' in app.extensions:
+        app.extensions['page_cache'].prune(everything=True)
+
+# BULK IMPORT
+@app.route('/<any(%s):kind>/import' % ', '.join(IMPORTS), methods=['GET', 'POST'])
+def bulk_import(kind):
+    form = ImportForm()
+    report = None
     if form.validate_on_submit():
+        upload = form.File.data
         try:
-            execute_commit("UPDATE Resources SET R_name=%s, R_type=%s, Quantity=%s WHERE Resource_ID=%s",
-                (form.R_name.data, form.R_type.data, form.Quantity.data, id))
-            flash('Resource updated successfully', 'success')
-            return redirect(url_for('resources_list'))
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            report = import_rows(kind, read_rows(stream, upload.filename))
+            flash('Imported %d of %d rows.' % (report.inserted, report.rows), 'success' if not report.failed else 'warning')
         except Exception as e:
             flash(str(e), 'danger')
-    else:
-        form.R_name.data, form.R_type.data, form.Quantity.data = row[1], row[2], row[3]
-    return render_template('form.html', form=form, title='Edit Resource')
-
-@app.route('/resources/delete/<int:id>', methods=['POST'])
-def resources_delete(id):
+    return render_template('import.html', form=form, kind=kind, report=report, title='Import %s' % IMPORTS[kind].table)
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT batch and transaction.')
+def import_command(kind, path, batch_size):
+    """Bulk import a CSV, JSON or JSON Lines file."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        report = import_rows(kind, read_rows(f, path), batch_size)
+    for line, message in report.errors:
+        click.echo('line %s: %s' % (line, message), err=True)
+    click.echo('%d rows read, %d inserted, %d rejected in %.2fs (%.0f rows/s)'
+               % (report.rows, report.inserted, report.failed, report.elapsed, report.rate))
+
+# STREAMING EXPORT
+def split_columns(value):
+    return [c.strip() for c in value.split(',') if c.strip()] if value else None
+
+@app.route('/export/<name>.<any(csv, jsonl):fmt>')
+def export_table(name, fmt):
+    compress = request.args.get('gzip') in ('1', 'true', 'yes')
     try:
-        execute_commit("DELETE FROM Resources WHERE Resource_ID=%s", (id,))
-        flash('Resource deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('resources_list'))
-
-# RESCUE TEAMS
-@app.route('/rescue_team')
-def rescue_team_list():
-    rows = fetch_all("SELECT * FROM Rescue_Team ORDER BY Team_ID ASC")
-    return render_template('rescue_team.html', rows=rows)
-
-@app.route('/rescue_team/add', methods=['GET', 'POST'])
-def rescue_team_add():
-    form = RescueTeamForm()
-    if form.validate_on_submit():
-        try:
-            execute_commit("INSERT INTO Rescue_Team (Team_name, Team_type, No_of_People, Disaster_ID) VALUES (%s,%s,%s,%s)",
-                (form.Team_name.data, form.Team_type.data, form.No_of_People.data, form.Disaster_ID.data))
-            flash('Rescue Team added successfully', 'success')
-            return redirect(url_for('rescue_team_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Rescue Team')
-
-@app.route('/rescue_team/edit/<int:id>', methods=['GET', 'POST'])
-def rescue_team_edit(id):
-    row = fetch_one("SELECT * FROM Rescue_Team WHERE Team_ID=%s", (id,))
-    if not row:
-        flash("Rescue Team not found", "danger")
-        return redirect(url_for('rescue_team_list'))
-    form = RescueTeamForm(obj=row)
-    if form.validate_on_submit():
-        try:
-            execute_commit("UPDATE Rescue_Team SET Team_name=%s, Team_type=%s, No_of_People=%s, Disaster_ID=%s WHERE Team_ID=%s",
-                (form.Team_name.data, form.Team_type.data, form.No_of_People.data, form.Disaster_ID.data, id))
-            flash('Rescue Team updated successfully', 'success')
-            return redirect(url_for('rescue_team_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    else:
-        form.Team_name.data, form.Team_type.data, form.No_of_People.data, form.Disaster_ID.data = row[1], row[2], row[3], row[4]
-    return render_template('form.html', form=form, title='Edit Rescue Team')
-
-@app.route('/rescue_team/delete/<int:id>', methods=['POST'])
-def rescue_team_delete(id):
+        stream = export_stream(name, fmt, split_columns(request.args.get('columns')),
+                               request.args.get('from'), request.args.get('to'), compress)
+    except ExportError as e:
+        abort(400, str(e))
+    filename = '%s.%s%s' % (name, fmt, '.gz' if compress else '')
+    return Response(stream, mimetype='application/gzip' if compress else FORMATS[fmt],
+                    headers={'Content-Disposition': 'attachment; filename=%s' % filename})
+
+@app.cli.command('export')
+@click.argument('name', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', default='-', help='Output file (default: stdout).')
+@click.option('--columns', help='Comma-separated list of columns to export.')
+@click.option('--from', 'date_from', help='Only rows on or after this date (YYYY-MM-DD).')
+@click.option('--to', 'date_to', help='Only rows on or before this date (YYYY-MM-DD).')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+def export_command(name, fmt, output, columns, date_from, date_to, compress):
+    """Stream a table to CSV or JSON Lines."""
     try:
-        execute_commit("DELETE FROM Rescue_Team WHERE Team_ID=%s", (id,))
-        flash('Rescue Team deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('rescue_team_list'))
-
-# DONORS
-@app.route('/donor')
-def donor_list():
-    rows = fetch_all("SELECT * FROM Donor ORDER BY Donor_ID ASC")
-    return render_template('donor.html', rows=rows)
-
-@app.route('/donor/add', methods=['GET', 'POST'])
-def donor_add():
-    form = DonorForm()
-    if form.validate_on_submit():
-        try:
-            execute_commit("INSERT INTO Donor (Donor_name, Contact) VALUES (%s,%s)", (form.Donor_name.data, form.Contact.data))
-            flash('Donor added successfully', 'success')
-            return redirect(url_for('donor_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Donor')
-
-@app.route('/donor/edit/<int:id>', methods=['GET', 'POST'])
-def donor_edit(id):
-    row = fetch_one("SELECT * FROM Donor WHERE Donor_ID=%s", (id,))
-    if not row:
-        flash("Donor not found", "danger")
-        return redirect(url_for('donor_list'))
-    form = DonorForm(obj=row)
-    if form.validate_on_submit():
-        try:
-            execute_commit("UPDATE Donor SET Donor_name=%s, Contact=%s WHERE Donor_ID=%s", (form.Donor_name.data, form.Contact.data, id))
-            flash('Donor updated successfully', 'success')
-            return redirect(url_for('donor_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    else:
-        form.Donor_name.data, form.Contact.data = row[1], row[2]
-    return render_template('form.html', form=form, title='Edit Donor')
-
-@app.route('/donor/delete/<int:id>', methods=['POST'])
-def donor_delete(id):
+        stream = export_stream(name, fmt, split_columns(columns), date_from, date_to, compress)
+    except ExportError as e:
+        raise click.UsageError(str(e))
+    with click.open_file(output, 'wb') as f:
+        for chunk in stream:
+            f.write(chunk)
+
+# CAMP ALLOCATION
+@app.cli.command('allocate')
+@click.argument('disaster_id', type=int)
+@click.option('--camp', 'camp_ids', type=int, multiple=True, help='Camp to fill (repeatable; default: camps in the disaster city).')
+def allocate_command(disaster_id, camp_ids):
+    """Place a disaster's unplaced victims into camps with free beds."""
     try:
-        execute_commit("DELETE FROM Donor WHERE Donor_ID=%s", (id,))
-        flash('Donor deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('donor_list'))
-
-# DONATIONS
-@app.route('/donation')
-def donation_list():
-    rows = fetch_all("SELECT * FROM Donation ORDER BY Donation_ID ASC")
-    return render_template('donation.html', rows=rows)
-
-@app.route('/donation/add', methods=['GET', 'POST'])
-def donation_add():
-    form = DonationForm()
-    if form.validate_on_submit():
-        try:
-            execute_commit("INSERT INTO Donation (Donor_ID, Amount, Donation_date, Resource_ID) VALUES (%s,%s,%s,%s)",
-                (form.Donor_ID.data, form.Amount.data, form.Donation_date.data, form.Resource_ID.data))
-            flash('Donation added successfully', 'success')
-            return redirect(url_for('donation_list'))
-        except Exception as e:
-            flash(str(e), 'danger')
-    return render_template('form.html', form=form, title='Add Donation')
-
-@app.route('/donation/edit/<int:id>', methods=['GET', 'POST'])
-def donation_edit(id):
-    row = fetch_one("SELECT * FROM Donation WHERE Donation_ID=%s", (id,))
-    if not row:
-        flash("Donation not found", "danger")
-        return redirect(url_for('donation_list'))
-    form = DonationForm(obj=row)
-    if form.validate_on_submit():
+        result = allocation.assign_unplaced(disaster_id, list(camp_ids) or None)
+    except allocation.AllocationError as e:
+        raise click.ClickException(str(e))
+    click.echo(result.summary())
+
+@app.cli.command('rebuild-occupancy')
+def rebuild_occupancy_command():
+    """Recount camp occupancy from the Victim table."""
+    click.echo('Recounted occupancy for %d camps.' % allocation.rebuild_occupancy())
+
+# PAGE CACHE
+@app.cli.command('page-cache')
+@click.option('--clear', is_flag=True, help='Delete every cached page.')
+def page_cache_command(clear):
+    """Show the size of the rendered-page cache, or empty it."""
+    cache = app.extensions.get('page_cache')
+    if cache is None:
+        raise click.ClickException('The page cache is disabled (Config.PAGE_CACHE).')
+    if clear:
+        click.echo('Deleted %d files.' % cache.prune(everything=True))
+    click.echo('%(directory)s: %(files)d files, %(bytes)d bytes' % cache.stats())
+
+# BACKGROUND DELETES
+@app.cli.command('delete-jobs')
+@click.option('--run', 'run_jobs', is_flag=True, help='Run queued and interrupted jobs here until none are left.')
+def delete_jobs_command(run_jobs):
+    """List unfinished background deletes, or run them."""
+    if run_jobs:
+        while True:
+            job_id = delete_jobs.claim_next()
+            if job_id is None:
+                break
+            click.echo('Running delete job %d...' % job_id)
+            delete_jobs.run(job_id)
+    for row in db.fetch_all("SELECT Job_ID, Table_name, Row_ID, Status, Deleted, Total, Updated_At FROM Delete_Job "
+                            "WHERE Status <> 'done' ORDER BY Job_ID"):
+        click.echo('job %d: %s %s %s, %d/%d rows, last update %s' % row)
+
+# ARCHIVE - old history rows move to gzipped monthly files (archive.py); run from cron.
+@app.cli.command('archive')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(sorted(archive.POLICIES)),
+              help='Only this table (repeatable).')
+@click.option('--dry-run', is_flag=True, help='Only count the rows that would be moved.')
+def archive_command(tables, dry_run):
+    """Move rows past their retention age out of MySQL into the archive."""
+    try:
+        results = archive.run(tables or None, dry_run=dry_run)
+    except archive.ArchiveError as e:
+        raise click.ClickException(str(e))
+    for table, (moved, dropped) in results.items():
+        click.echo('%s: %d rows %s' % (table, moved, 'to archive' if dry_run else 'archived'))
+        if dropped:
+            click.echo('  dropped archive months %s' % ', '.join(dropped))
+    for table in sorted(archive.POLICIES):
+        index = archive.archive_for(archive.POLICIES[table]).index()
+        if index:
+            click.echo('%s archive: %d rows in %d months (%s to %s)' % (
+                table, sum(m['rows'] for m in index.values()), len(index), min(index), max(index)))
+
+# DATABASE
+@app.route('/db/pool')
+def db_pool_stats():
+    stats = db.pool.stats()
+    if db.replicas.replicas:
+        stats['replicas'] = db.replicas.stats()
+    return jsonify(stats)
+
+@app.cli.command('replica-status')
+def replica_status_command():
+    """Check every read replica in Config.MYSQL_REPLICAS."""
+    if not db.replicas.replicas:
+        click.echo('No read replicas configured; all queries go to %s.' % Config.MYSQL_HOST)
+    for replica in db.replicas.replicas:
         try:
-            execute_commit("UPDATE Donation SET Donor_ID=%s, Amount=%s, Donation_date=%s, Resource_ID=%s WHERE Donation_ID=%s",
-                (form.Donor_ID.data, form.Amount.data, form.Donation_date.data, form.Resource_ID.data, id))
-            flash('Donation updated successfully', 'success')
-            return redirect(url_for('donation_list'))
+            with replica.pool.connection() as conn:
+                ok = db.replicas.check(replica, conn)
         except Exception as e:
-            flash(str(e), 'danger')
-    else:
-        form.Donor_ID.data, form.Amount.data, form.Donation_date.data, form.Resource_ID.data = row[1], row[2], row[3], row[4]
-    return render_template('form.html', form=form, title='Edit Donation')
-
-@app.route('/donation/delete/<int:id>', methods=['POST'])
-def donation_delete(id):
-    try:
-        execute_commit("DELETE FROM Donation WHERE Donation_ID=%s", (id,))
-        flash('Donation deleted.', 'success')
-    except Exception as e:
-        flash(str(e), 'danger')
-    return redirect(url_for('donation_list'))
-
-@app.route('/disaster_delete_log')
-def disaster_delete_log_list():
-    rows = fetch_all("SELECT * FROM Disaster_Delete_Log ORDER BY Log_ID DESC")
-    return render_template('disaster_delete_log.html', rows=rows)
+            db.replicas.mark_down(replica, e)
+            ok = False
+        click.echo('%-24s %s' % (replica.name, 'ok, %ss behind' % replica.lag if ok else 'DOWN: %s' % replica.error))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,322 @@
+import datetime
+import fcntl
+import gzip
+import json
+import os
+import tempfile
+import threading
+
+import db
+from config import Config
+from entities import BY_TABLE
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class Policy:
+    """How one history table is aged out of MySQL.
+
+    Rows whose date_column is more than Config.ARCHIVE_AFTER_DAYS[table] days
+    old (and that match `where`) are moved to the archive, one gzipped
+    file per month; archive months older than
+    Config.ARCHIVE_KEEP_MONTHS[table] are deleted (None keeps them).
+    """
+
+    def __init__(self, table, date_column, where=None):
+        entity = BY_TABLE[table]
+        self.table = table
+        self.pk = entity.pk
+        self.columns = entity.columns
+        self.date_column = date_column
+        self.where = where
+
+    @property
+    def after_days(self):
+        return Config.ARCHIVE_AFTER_DAYS.get(self.table)
+
+    @property
+    def keep_months(self):
+        return Config.ARCHIVE_KEEP_MONTHS.get(self.table)
+
+
+# Tables that only ever grow and that nothing reads back for correctness.
+# Victim and Donation are not here: they feed the dashboard totals, the report
+# rollups and camp occupancy, which would all change if their old rows left
+# the database.  Stock_Movement is kept whole so the stock can always be
+# checked against it, and Sync_Operation because its keys are what stops an
+# old offline journal from being applied twice (field_sync.py).
+POLICIES = {policy.table: policy for policy in [
+    Policy('Disaster_Delete_Log', 'Deleted_At'),
+    Policy('Delete_Job', 'Updated_At', where="Status IN ('done', 'failed')"),
+]}
+
+
+def archive_dir():
+    directory = Config.ARCHIVE_DIR
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
+    return directory
+
+
+def plain(value):
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    # Dates, times and decimals are kept as MySQL prints them.
+    return str(value)
+
+
+# --- ARCHIVE FILES ---
+# <ARCHIVE_DIR>/<table>/<YYYY-MM>.json.gz holds a month of rows column by
+# column ({"columns": [...], "data": {column: [values]}}), which compresses
+# far better than row by row.  index.json lists every month with its row
+# count and smallest and largest key, so readers only open the files a page
+# needs.
+
+class TableArchive:
+    def __init__(self, table, pk, columns, directory=None):
+        self.table = table
+        self.pk = pk
+        self.columns = columns
+        self.directory = os.path.join(directory or archive_dir(), table)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def path(self, month):
+        return os.path.join(self.directory, '%s.json.gz' % month)
+
+    def index(self):
+        try:
+            with open(os.path.join(self.directory, 'index.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _replace(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def read_month(self, month):
+        """Rows of one month as tuples in column order, cached per process
+        until the file changes."""
+        path = self.path(month)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            cached = self._cache.get(month)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            stored = json.load(f)
+        rows = list(zip(*[stored['data'].get(c, [None] * stored['rows']) for c in self.columns]))
+        with self._lock:
+            self._cache[month] = (mtime, rows)
+        return rows
+
+    def write_months(self, rows_by_month):
+        """Merge rows into their month files.  Rows already archived (same
+        key) are skipped, so re-running an interrupted archive is safe."""
+        index = self.index()
+        pk = self.columns.index(self.pk)
+        for month, rows in sorted(rows_by_month.items()):
+            existing = self.read_month(month)
+            seen = {row[pk] for row in existing}
+            merged = sorted(list(existing) + [row for row in rows if row[pk] not in seen], key=lambda row: row[pk])
+            stored = {'table': self.table, 'columns': self.columns, 'rows': len(merged),
+                      'data': {c: [plain(row[i]) for row in merged] for i, c in enumerate(self.columns)}}
+            self._replace(self.path(month), gzip.compress(json.dumps(stored, separators=(',', ':')).encode(), 9))
+            index[month] = {'rows': len(merged), 'min': merged[0][pk], 'max': merged[-1][pk]}
+        self._replace(os.path.join(self.directory, 'index.json'), json.dumps(index, sort_keys=True).encode())
+
+    def drop_months(self, before):
+        index = self.index()
+        dropped = [month for month in index if month < before]
+        for month in dropped:
+            del index[month]
+        if dropped:
+            self._replace(os.path.join(self.directory, 'index.json'), json.dumps(index, sort_keys=True).encode())
+            for month in dropped:
+                try:
+                    os.unlink(self.path(month))
+                except FileNotFoundError:
+                    pass
+        return dropped
+
+    def seek(self, key, ascending, limit):
+        """Up to `limit` archived rows after key (None: from the start) in
+        key order, opening only the month files that can hold them."""
+        pk = self.columns.index(self.pk)
+        months = sorted(self.index().items(), key=lambda item: item[1]['min' if ascending else 'max'],
+                        reverse=not ascending)
+        found = []
+        for month, info in months:
+            if key is not None and (info['max'] <= key if ascending else info['min'] >= key):
+                continue
+            if len(found) >= limit:
+                # Files are visited by their nearest key; stop once this one starts past the last row kept.
+                bound = found[limit - 1][pk]
+                if (info['min'] > bound) if ascending else (info['max'] < bound):
+                    break
+            found.extend(row for row in self.read_month(month)
+                         if key is None or (row[pk] > key if ascending else row[pk] < key))
+            found.sort(key=lambda row: row[pk], reverse=not ascending)
+            del found[limit:]
+        return found
+
+
+_archives = {}
+
+def archive_for(policy):
+    table_archive = _archives.get(policy.table)
+    if table_archive is None:
+        table_archive = _archives[policy.table] = TableArchive(policy.table, policy.pk, policy.columns)
+    return table_archive
+
+
+# --- MOVING ROWS ---
+
+class ArchiveLock:
+    """Only one archive run per archive directory at a time."""
+
+    def __enter__(self):
+        os.makedirs(archive_dir(), exist_ok=True)
+        self.f = open(os.path.join(archive_dir(), '.lock'), 'w')
+        try:
+            fcntl.flock(self.f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.f.close()
+            raise ArchiveError('Another archive run is in progress')
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.f, fcntl.LOCK_UN)
+        self.f.close()
+
+
+def archive_table(policy, now=None, dry_run=False):
+    """Move a table's rows past its age limit into the archive,
+    ARCHIVE_CHUNK_SIZE rows per transaction: the rows are written to their
+    month files first and deleted from MySQL after, so a crash in between
+    leaves them in both places and the next run just deletes them.
+    Returns (rows moved, archive months dropped)."""
+    if policy.after_days is None:
+        return 0, []
+    now = now or datetime.datetime.now()
+    cutoff = now - datetime.timedelta(days=policy.after_days)
+    table_archive = archive_for(policy)
+    where = "%s < %%s" % policy.date_column + (" AND (%s)" % policy.where if policy.where else "")
+    select = "SELECT %s FROM %s WHERE %s ORDER BY %s, %s LIMIT %d FOR UPDATE" % (
+        ', '.join(policy.columns), policy.table, where, policy.date_column, policy.pk, Config.ARCHIVE_CHUNK_SIZE)
+    if dry_run:
+        count = db.fetch_one("SELECT COUNT(*) FROM %s WHERE %s" % (policy.table, where), (cutoff,))[0]
+        return count, []
+
+    moved = 0
+    pk = policy.columns.index(policy.pk)
+    date = policy.columns.index(policy.date_column)
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        while True:
+            cur.execute(select, (cutoff,))
+            rows = cur.fetchall()
+            if not rows:
+                db.commit(conn)
+                break
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(str(row[date])[:7], []).append(row)
+            table_archive.write_months(by_month)
+            ids = [row[pk] for row in rows]
+            cur.execute("DELETE FROM %s WHERE %s IN (%s)" % (policy.table, policy.pk, ','.join(['%s'] * len(ids))), ids)
+            db.bump_versions(cur, policy.table)
+            db.commit(conn)
+            db.notify_write(policy.table)
+            moved += len(rows)
+            if len(rows) < Config.ARCHIVE_CHUNK_SIZE:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    dropped = []
+    if policy.keep_months is not None:
+        first_kept = now.year * 12 + now.month - 1 - policy.keep_months
+        dropped = table_archive.drop_months('%04d-%02d' % (first_kept // 12, first_kept % 12 + 1))
+        if dropped:
+            # Cached listings (page cache, ETags) still show the dropped rows.
+            cur = conn.cursor()
+            db.bump_versions(cur, policy.table)
+            db.commit(conn)
+            cur.close()
+            db.notify_write(policy.table)
+    return moved, dropped
+
+
+def run(tables=None, dry_run=False):
+    """Apply every policy (or those of `tables`); returns {table: (moved, dropped months)}."""
+    results = {}
+    with ArchiveLock():
+        for table, policy in POLICIES.items():
+            if tables is None or table in tables:
+                results[table] = archive_table(policy, dry_run=dry_run)
+    return results
+
+
+# --- READING ---
+
+class ArchivedPaginator:
+    """Pages through a table and its archive as if they were one table.
+
+    Only the primary key order is supported, which is all the archived
+    tables' list pages offer: each page takes the next rows from MySQL and
+    from the archive files and keeps the first `size` of the merge.
+    """
+
+    def __init__(self, paginator, table_archive):
+        self.paginator = paginator
+        self.archive = table_archive
+        self.sortable = paginator.sortable
+        self.columns = paginator.columns
+        # The API may list a subset of the columns the files hold.
+        self._project = [table_archive.columns.index(c) for c in paginator.columns]
+
+    def _merge(self, plan, rows):
+        ascending = (plan.order == 'asc') != plan.backward
+        key = plan.key[1] if plan.key is not None else None
+        pk = self.columns.index(self.paginator.pk)
+        archived = self.archive.seek(key, ascending, plan.size + 1)
+        rows = list(rows) + [tuple(row[i] for i in self._project) for row in archived]
+        rows.sort(key=lambda row: row[pk], reverse=not ascending)
+        return self.paginator.finish(plan, rows[:plan.size + 1])
+
+    def page(self, fetch_all, params):
+        plan = self.paginator.plan(params)
+        return self._merge(plan, fetch_all(plan.sql, plan.args))
+
+    async def page_async(self, fetch_all, params):
+        plan = self.paginator.plan(params)
+        return self._merge(plan, await fetch_all(plan.sql, plan.args))
+
+
+def attach(entity):
+    """Make the entity's list page and API listings include its archive."""
+    assert entity.paginator.sortable == [entity.pk], 'archived listings are sorted by primary key only'
+    table_archive = archive_for(POLICIES[entity.table])
+    entity.wrap_paginator = lambda paginator: ArchivedPaginator(paginator, table_archive)
+    entity.paginator = entity.wrap_paginator(entity.paginator)
+    entity._paginators = {tuple(entity.columns): entity.paginator}
@@ -0,0 +1,137 @@
+"""Optional asyncio serving mode.
+
+    pip install aiomysql asgiref uvicorn
+    uvicorn asgi:application --workers 4
+
+The JSON endpoints that field clients poll (/api/v1/dashboard and the GET
+endpoints of /api/v1/<resource>) are answered on the event loop from an
+aiomysql pool (aiodb.py), so a request waiting on MySQL holds a coroutine
+rather than a thread, and the dashboard counters are queried concurrently.
+Every other request (HTML pages, forms, API writes, search, SSE) is handed to
+the regular Flask app, which runs in asgiref's thread pool exactly as it does
+under a WSGI server.  `flask --app app run` keeps working unchanged.
+"""
+import json
+import time
+import urllib.parse
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags, quote_etag
+
+import aiodb
+import metrics
+from api import ApiError, RESOURCES, make_etag, needed_columns, page_body, selected_fields, to_item
+from app import app as flask_app, dashboard_cache
+from changefeed import counts_payload
+
+wsgi = WsgiToAsgi(flask_app)
+
+
+class Request:
+    def __init__(self, scope):
+        self.path = scope['path']
+        self.query = urllib.parse.parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+        self.args = MultiDict(self.query)
+        self.headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+
+
+async def respond(send, status, body=b'', headers=()):
+    headers = [(b'content-length', str(len(body)).encode())] + [(k.encode(), v.encode()) for k, v in headers]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+    return status
+
+
+async def respond_json(send, status, data, etag=None):
+    body = json.dumps(data, separators=(',', ':'), sort_keys=True, default=str).encode()
+    headers = [('content-type', 'application/json')]
+    if etag:
+        headers += [('etag', quote_etag(etag, weak=True)), ('cache-control', 'no-cache')]
+    return await respond(send, status, body, headers)
+
+
+def not_modified(request, etag):
+    return parse_etags(request.headers.get('if-none-match')).contains_weak(etag)
+
+
+# --- ROUTES ---
+
+async def dashboard_counts(request, send):
+    counts = await dashboard_cache.get_async(aiodb.fetch_one)
+    return await respond_json(send, 200, counts_payload(counts))
+
+
+async def list_items(request, send, resource):
+    fields = selected_fields(resource, request.args.get('fields'))
+    etag = make_etag(resource, await aiodb.table_version(resource.table), ('list', sorted(request.query)))
+    if not_modified(request, etag):
+        return await respond(send, 304, headers=[('etag', quote_etag(etag, weak=True))])
+    needed = needed_columns(resource, fields, request.args.get('sort'))
+    page = await resource.paginator_for(needed).page_async(aiodb.fetch_all, request.args)
+    link = lambda args: '%s?%s' % (request.path, urllib.parse.urlencode(args))
+    return await respond_json(send, 200, page_body(page, needed, fields, link), etag)
+
+
+async def get_item(request, send, resource, id):
+    fields = selected_fields(resource, request.args.get('fields'))
+    etag = make_etag(resource, await aiodb.table_version(resource.table), ('item', id, fields))
+    if not_modified(request, etag):
+        return await respond(send, 304, headers=[('etag', quote_etag(etag, weak=True))])
+    row = await aiodb.fetch_one(resource.select_sql, (id,))
+    if not row:
+        raise ApiError(404, '%s %s not found' % (resource.table, id))
+    return await respond_json(send, 200, to_item(resource.columns, row, fields), etag)
+
+
+def route(path):
+    """(endpoint label, handler, extra arguments) for requests served
+    natively, or None to hand the request to Flask."""
+    parts = path.strip('/').split('/')
+    if parts[:2] != ['api', 'v1'] or len(parts) not in (3, 4):
+        return None
+    if len(parts) == 3 and parts[2] == 'dashboard':
+        return 'async.dashboard_counts', dashboard_counts, ()
+    resource = RESOURCES.get(parts[2])
+    if resource is None:
+        return None
+    if len(parts) == 3:
+        return 'async.list_items', list_items, (resource,)
+    if parts[3].isdigit():
+        return 'async.get_item', get_item, (resource, int(parts[3]))
+    return None
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await aiodb.get_pool()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aiodb.close_pool()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    match = route(scope['path']) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+    if match is None:
+        return await wsgi(scope, receive, send)
+    endpoint, handler, args = match
+    started = time.perf_counter()
+    try:
+        status = await handler(Request(scope), send, *args)
+    except ApiError as e:
+        status = e.status
+        body = {'error': e.message}
+        if e.fields:
+            body['fields'] = e.fields
+        await respond_json(send, status, body)
+    except aiodb.DatabaseError as e:
+        status = 500
+        flask_app.logger.error('async %s failed: %s', endpoint, e)
+        await respond_json(send, status, {'error': 'Database error'})
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, 'GET', status)
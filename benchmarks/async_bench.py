@@ -0,0 +1,172 @@
+"""Compare the sync (WSGI) and async (ASGI) serving modes at high concurrency.
+
+    gunicorn --workers 4 --threads 8 --bind 127.0.0.1:8000 app:app &
+    uvicorn asgi:application --workers 4 --port 8001 &
+    python -m benchmarks.async_bench --sync-url http://127.0.0.1:8000 --async-url http://127.0.0.1:8001 \\
+        --concurrency 500 --duration 30
+
+Both servers must point at the same database (fill it with benchmarks.datagen).
+Each of --concurrency clients keeps one keep-alive connection open and loops
+over the read endpoints the async mode serves natively: the dashboard
+counters, first and sorted API list pages and single API rows.  The same
+request mix (same seed) is replayed against each URL in turn, and
+throughput and p50/p95/p99 latency are printed per mode.  The client is
+itself asyncio-based, so hundreds of connections do not need hundreds of
+threads on the benchmarking side.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+import urllib.request
+
+from benchmarks.search_bench import percentile
+from entities import ENTITIES
+
+READ_ENTITIES = ['victim', 'donation', 'disaster', 'relief_camp', 'donor']
+
+
+def discover_ids(base_url, pool_size):
+    ids = {}
+    for name in READ_ENTITIES:
+        entity = ENTITIES[name]
+        url = '%s/api/v1/%s?size=%d&fields=%s' % (base_url, entity.api_name, pool_size, entity.pk)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            ids[name] = [item[entity.pk] for item in json.loads(response.read())['items']]
+    return ids
+
+
+def next_path(ids, rng):
+    """Return (route label, path)."""
+    choice = rng.random()
+    if choice < 0.2:
+        return 'GET /api/v1/dashboard', '/api/v1/dashboard'
+    entity = ENTITIES[rng.choice(READ_ENTITIES)]
+    if choice < 0.5 and ids[entity.name]:
+        return 'GET /api/v1/%s/<id>' % entity.api_name, '/api/v1/%s/%d' % (entity.api_name, rng.choice(ids[entity.name]))
+    if choice < 0.75 and entity.sortable:
+        return ('GET /api/v1/%s?sort=' % entity.api_name,
+                '/api/v1/%s?sort=%s&order=desc&size=50' % (entity.api_name, rng.choice(entity.sortable)))
+    return 'GET /api/v1/%s' % entity.api_name, '/api/v1/%s?size=50' % entity.api_name
+
+
+# --- HTTP/1.1 CLIENT ---
+
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\nAccept: application/json\r\n\r\n'
+                           % (path, self.host)).encode('latin-1'))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def client(base_url, ids, deadline, seed, timings, errors):
+    url = urllib.parse.urlsplit(base_url)
+    conn = Connection(url.hostname, url.port or 80)
+    rng = random.Random(seed)
+    try:
+        while time.monotonic() < deadline:
+            route, path = next_path(ids, rng)
+            started = time.perf_counter()
+            try:
+                ok = await conn.get(path) == 200
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                conn.close()
+                ok = False
+            timings.setdefault(route, []).append(time.perf_counter() - started)
+            if not ok:
+                errors[route] = errors.get(route, 0) + 1
+    finally:
+        conn.close()
+
+
+async def run(base_url, ids, concurrency, duration, seed):
+    timings, errors = {}, {}
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*(client(base_url, ids, deadline, seed + i, timings, errors) for i in range(concurrency)))
+    return timings, errors, time.monotonic() - started
+
+
+def stats(timings, errors, elapsed):
+    ms = [t * 1000 for t in timings]
+    return {
+        'requests': len(ms),
+        'errors': errors,
+        'rps': round(len(ms) / elapsed, 2),
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+    }
+
+
+def print_row(label, s):
+    print('%-40s %8d %6d %8.1f %8.1f %8.1f %8.1f' % (
+        label, s['requests'], s['errors'], s['rps'], s['p50_ms'], s['p95_ms'], s['p99_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sync-url', help='Server running app:app under a WSGI server.')
+    parser.add_argument('--async-url', help='Server running asgi:application under an ASGI server.')
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run against each server.')
+    parser.add_argument('--pool-size', type=int, default=500, help='Existing ids per table to request.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--per-route', action='store_true', help='Also print every route.')
+    args = parser.parse_args()
+    modes = [(mode, url) for mode, url in (('sync', args.sync_url), ('async', args.async_url)) if url]
+    if not modes:
+        parser.error('give --sync-url, --async-url or both')
+
+    ids = discover_ids(modes[0][1].rstrip('/'), args.pool_size)
+    print('%-40s %8s %6s %8s %8s %8s %8s' % ('mode / route', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for mode, url in modes:
+        timings, errors, elapsed = asyncio.run(run(url.rstrip('/'), ids, args.concurrency, args.duration, args.seed))
+        everything = [t for values in timings.values() for t in values]
+        if not everything:
+            print('%-40s no requests completed' % mode)
+            continue
+        print_row('%s (c=%d)' % (mode, args.concurrency), stats(everything, sum(errors.values()), elapsed))
+        if args.per_route:
+            for route in sorted(timings):
+                print_row('  ' + route, stats(timings[route], errors.get(route, 0), elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""Fill the database with synthetic rows at disaster scale.
+
+    python -m benchmarks.datagen --victims 1000000
+    python -m benchmarks.datagen --victims 10000000 --batch-size 20000
+    python -m benchmarks.datagen --victims 1000000 --sqlite disaster.db
+
+Every other table is sized from the victim count.  Rows satisfy the schema:
+foreign keys point at rows created earlier in the run, Contact numbers are
+unique (derived from the primary key), CHECK constraints hold and no relief
+camp is filled past its capacity.  Rows are appended after the current
+maximum ids, so running it twice adds a second batch of data.
+
+Use a scratch database: the load harness (benchmarks.loadtest) writes to it.
+"""
+import argparse
+import datetime
+import random
+import time
+
+import db
+import factory
+from benchmarks.search_bench import FIRST, LAST, synthetic_name
+
+CITIES = ['Mumbai', 'Chennai', 'Kolkata', 'Guwahati', 'Dehradun', 'Shimla', 'Bhubaneswar', 'Hyderabad',
+          'Patna', 'Kochi', 'Surat', 'Puri', 'Srinagar', 'Jaipur', 'Nagpur', 'Vizag']
+STATES = ['Maharashtra', 'Tamil Nadu', 'West Bengal', 'Assam', 'Uttarakhand', 'Himachal Pradesh', 'Odisha',
+          'Telangana', 'Bihar', 'Kerala', 'Gujarat', 'Odisha', 'Jammu and Kashmir', 'Rajasthan', 'Maharashtra',
+          'Andhra Pradesh']
+DISASTER_TYPES = ['Flood', 'Cyclone', 'Earthquake', 'Landslide', 'Fire', 'Other']
+TEAM_TYPES = ['Medical', 'Rescue', 'Army', 'Fire', 'Other']
+GENDERS = ['Male', 'Female', 'Other']
+RESOURCES = [('Rice Bags', 'Food'), ('Blankets', 'Clothing'), ('Medicines', 'Medical'), ('Drinking Water', 'Essential'),
+             ('Tents', 'Shelter'), ('First Aid Kits', 'Medical'), ('Clothes', 'Clothing'), ('Milk Packets', 'Food')]
+PLACED = 0.8  # share of victims given a camp
+
+TODAY = datetime.date.today()
+
+
+def random_date(rng, start_year, end=TODAY):
+    start = datetime.date(start_year, 1, 1)
+    return start + datetime.timedelta(days=rng.randrange((end - start).days))
+
+
+def person_name(rng):
+    return '%s %s' % (rng.choice(FIRST), rng.choice(LAST))
+
+
+# --- ROW FACTORIES: one dict of writable columns per row ---
+# Shared with the load harness, which posts the same values through the forms.
+
+def location_row(rng, n):
+    city = rng.randrange(len(CITIES))
+    return {'City': '%s %d' % (CITIES[city], n), 'District': CITIES[city], 'State': STATES[city]}
+
+
+def disaster_row(rng, location_ids):
+    return {'D_type': rng.choice(DISASTER_TYPES), 'D_date': random_date(rng, 2015),
+            'D_time': datetime.time(rng.randrange(24), rng.randrange(60)), 'Location_ID': rng.choice(location_ids)}
+
+
+def camp_row(rng, capacity):
+    city = rng.choice(CITIES)
+    return {'Camp_Name': '%s %s Camp' % (city, rng.choice(LAST)), 'Location': '%s Ward %d, %s' % (rng.choice(FIRST), rng.randrange(1, 99), city),
+            'Capacity': capacity, 'Incharge': person_name(rng)}
+
+
+def victim_row(rng, contact, disaster_ids, camp_id=None):
+    # At least a year old: Age is computed from DOB and must be > 0.
+    return {'Vic_name': synthetic_name(rng), 'DOB': random_date(rng, 1930, TODAY - datetime.timedelta(days=400)),
+            'Contact': contact, 'Disaster_ID': rng.choice(disaster_ids), 'Camp_ID': camp_id}
+
+
+def volunteer_row(rng, contact):
+    return {'V_name': synthetic_name(rng), 'Age': rng.randint(18, 65), 'Gender': rng.choice(GENDERS), 'Contact_Info': contact}
+
+
+def resource_row(rng):
+    name, type = rng.choice(RESOURCES)
+    return {'R_name': name, 'R_type': type, 'Quantity': rng.randint(1, 5000)}
+
+
+def team_row(rng, disaster_ids):
+    type = rng.choice(TEAM_TYPES)
+    return {'Team_name': '%s %s Unit' % (rng.choice(CITIES), type), 'Team_type': type,
+            'No_of_People': rng.randint(5, 60), 'Disaster_ID': rng.choice(disaster_ids)}
+
+
+def donor_row(rng, contact):
+    return {'Donor_name': '%s Foundation' % person_name(rng), 'Contact': contact}
+
+
+def donation_row(rng, donor_ids, resource_ids):
+    return {'Donor_ID': rng.choice(donor_ids), 'Amount': '%d.%02d' % (rng.randint(100, 2000000), rng.randrange(100)),
+            'Donation_date': random_date(rng, 2018), 'Resource_ID': rng.choice(resource_ids)}
+
+
+def contact(prefix, id):
+    # 10 digits, unique per table; the seed data uses 9xxxxxxxxx numbers.
+    return '%d%09d' % (prefix, id)
+
+
+# --- BULK LOADING ---
+
+def next_id(cur, table, pk):
+    cur.execute("SELECT COALESCE(MAX(%s), 0) FROM %s" % (pk, table))
+    return cur.fetchone()[0] + 1
+
+
+def load(conn, table, pk, count, make_row, batch_size):
+    """Insert count rows with explicit ids, batch_size rows per multi-row
+    INSERT and transaction.  Returns the new ids."""
+    cur = conn.cursor()
+    first = next_id(cur, table, pk)
+    ids = range(first, first + count)
+    started = time.perf_counter()
+    sql = columns = None
+    batch = []
+    for id in ids:
+        row = make_row(id)
+        if sql is None:
+            columns = list(row)
+            sql = "INSERT INTO %s (%s, %s) VALUES (%s)" % (
+                table, pk, ', '.join(columns), ','.join(['%s'] * (len(columns) + 1)))
+        batch.append([id] + [row[c] for c in columns])
+        if len(batch) >= batch_size:
+            cur.executemany(sql, batch)
+            db.commit(conn)
+            batch = []
+    if batch:
+        cur.executemany(sql, batch)
+    db.bump_versions(cur, table)
+    db.commit(conn)
+    cur.close()
+    elapsed = time.perf_counter() - started
+    print('%-12s %10d rows in %7.1fs (%.0f rows/s)' % (table, count, elapsed, count / elapsed if elapsed else 0))
+    return list(ids)
+
+
+def sizes(victims):
+    return {
+        'locations': max(8, min(victims // 2000, 2000)),
+        'disasters': max(8, victims // 1000),
+        'camps': max(8, victims // 400),
+        'volunteers': max(8, victims // 10),
+        'resources': max(8, victims // 2000),
+        'teams': max(8, victims // 500),
+        'donors': max(8, victims // 20),
+        'donations': max(8, victims // 5),
+    }
+
+
+def generate(conn, victims, batch_size=10000, seed=42):
+    rng = random.Random(seed)
+    n = sizes(victims)
+    location_ids = load(conn, 'Location', 'Location_ID', n['locations'], lambda id: location_row(rng, id), batch_size)
+    disaster_ids = load(conn, 'Disaster', 'Disaster_ID', n['disasters'], lambda id: disaster_row(rng, location_ids), batch_size)
+
+    # Enough beds for every placed victim plus some slack, spread evenly.
+    capacity = -(-int(victims * PLACED * 1.25) // n['camps']) or 1
+    camp_ids = load(conn, 'Relief_Camp', 'Camp_ID', n['camps'], lambda id: camp_row(rng, capacity), batch_size)
+    free = {camp_id: capacity for camp_id in camp_ids}
+    open_camps = list(camp_ids)
+
+    def make_victim(id):
+        camp_id = None
+        if open_camps and rng.random() < PLACED:
+            i = rng.randrange(len(open_camps))
+            camp_id = open_camps[i]
+            free[camp_id] -= 1
+            if not free[camp_id]:
+                open_camps[i] = open_camps[-1]
+                open_camps.pop()
+        return victim_row(rng, contact(7, id), disaster_ids, camp_id)
+
+    load(conn, 'Victim', 'Victim_ID', victims, make_victim, batch_size)
+    load(conn, 'Volunteers', 'Volunteer_ID', n['volunteers'], lambda id: volunteer_row(rng, contact(6, id)), batch_size)
+    resource_ids = load(conn, 'Resources', 'Resource_ID', n['resources'], lambda id: resource_row(rng), batch_size)
+    load(conn, 'Rescue_Team', 'Team_ID', n['teams'], lambda id: team_row(rng, disaster_ids), batch_size)
+    donor_ids = load(conn, 'Donor', 'Donor_ID', n['donors'], lambda id: donor_row(rng, contact(5, id)), batch_size)
+    load(conn, 'Donation', 'Donation_ID', n['donations'], lambda id: donation_row(rng, donor_ids, resource_ids), batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--victims', type=int, default=10000, help='Victim rows to add; other tables scale from it.')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows per multi-row INSERT and transaction.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sqlite', metavar='PATH', help='Fill this SQLite database instead of MySQL.')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        factory.configure(DB_BACKEND='sqlite', SQLITE_PATH=args.sqlite)
+    conn = db.connect()
+    try:
+        started = time.perf_counter()
+        generate(conn, args.victims, args.batch_size, args.seed)
+        print('done in %.1fs' % (time.perf_counter() - started))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
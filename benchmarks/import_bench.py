@@ -0,0 +1,74 @@
+"""Throughput benchmark for bulk import (the `flask import` command).
+
+    python -m benchmarks.import_bench --rows 200000 --batch-size 1000
+    python -m benchmarks.import_bench --sqlite :memory: --rows 200000
+
+Writes --rows synthetic victims to a CSV file, imports it with
+bulk_import.import_rows() exactly as the command does (parse, validate with
+the add form, batched INSERTs) and reports rows/s against TARGET, the rate a
+local MySQL is expected to sustain.  Against MySQL use a scratch database
+with at least one Disaster row; the imported rows are left behind.
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+import db
+import factory
+from benchmarks import datagen
+
+TARGET = 10000  # rows/s
+COLUMNS = ['Vic_name', 'DOB', 'Contact', 'Disaster_ID', 'Camp_ID']
+
+
+def write_csv(path, rows, disaster_ids, first_id, seed):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        for id in range(first_id, first_id + rows):
+            # Contacts with prefix 4 are not used by datagen or the seed data.
+            writer.writerow(datagen.victim_row(rng, datagen.contact(4, id), disaster_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sqlite', metavar='PATH', help='Import into this SQLite database instead of MySQL.')
+    args = parser.parse_args()
+
+    settings = {'DB_BACKEND': 'sqlite', 'SQLITE_PATH': args.sqlite} if args.sqlite else {}
+    app = factory.create_app(**settings)
+    from bulk_import import import_rows, read_rows
+
+    with app.app_context():
+        disaster_ids = [row[0] for row in db.fetch_all("SELECT Disaster_ID FROM Disaster")]
+        first_id = db.fetch_one("SELECT COALESCE(MAX(Victim_ID), 0) + 1 FROM Victim", ())[0]
+    if not disaster_ids:
+        parser.error('the database has no Disaster rows to attach victims to')
+
+    fd, path = tempfile.mkstemp(prefix='import-bench-', suffix='.csv')
+    os.close(fd)
+    try:
+        write_csv(path, args.rows, disaster_ids, first_id, args.seed)
+        with app.app_context(), open(path, encoding='utf-8', newline='') as f:
+            started = time.perf_counter()
+            report = import_rows('victim', read_rows(f, path), args.batch_size)
+            elapsed = time.perf_counter() - started
+    finally:
+        os.unlink(path)
+
+    for line, message in report.errors[:10]:
+        print('line %s: %s' % (line, message))
+    rate = report.inserted / elapsed if elapsed else 0.0
+    print('%d rows read, %d inserted, %d rejected in %.2fs' % (report.rows, report.inserted, report.failed, elapsed))
+    print('%.0f rows/s (target %d rows/s: %s)' % (rate, TARGET, 'met' if rate >= TARGET else 'NOT met'))
+
+
+if __name__ == '__main__':
+    main()
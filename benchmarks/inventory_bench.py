@@ -0,0 +1,173 @@
+"""Hammer a few resources with concurrent stock movements and check that no
+update was lost.
+
+    flask --app app run --with-threads &
+    python -m benchmarks.inventory_bench --url http://127.0.0.1:5000 --concurrency 32 --resources 3 --duration 30
+
+A handful of fresh resources are created, then every worker thread loops
+over receives, batch dispatches (1-3 resources in one request) and
+reservations that it dispatches or releases straight away, all through
+the inventory API and all on the same few rows.  Each worker adds up the
+quantities of the requests that succeeded; at the end the stock of every
+resource must equal its opening stock plus those sums, with nothing left
+reserved.  A second phase replays the old blind read-modify-write (read
+Quantity, PATCH it back minus one) from every thread: the database refuses
+every such PATCH (409), so the stock must not move.  Throughput, latency
+and the number of refused (409) requests are printed per operation.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from benchmarks.loadtest import Session
+from benchmarks.search_bench import percentile
+
+OPENING_STOCK = 1000000
+
+
+def create_resources(session, count):
+    ids = []
+    for i in range(count):
+        status, body = session.request('/api/v1/resources', json_body={
+            'R_name': 'Bench blankets %d' % i, 'R_type': 'Benchmark', 'Quantity': OPENING_STOCK})
+        if status != 201:
+            raise SystemExit('could not create a resource: %d %s' % (status, body[:200]))
+        ids.append(json.loads(body)['Resource_ID'])
+    return ids
+
+
+def stock(session, resource_id):
+    status, body = session.request('/api/v1/resources/%d' % resource_id)
+    item = json.loads(body)
+    return item['Quantity'], item['Reserved']
+
+
+class Tally:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.refused = {}
+        self.errors = {}
+        self.quantity = {}
+
+    def add(self, op, seconds, status, changes=()):
+        with self.lock:
+            self.timings.setdefault(op, []).append(seconds)
+            if status == 409:
+                self.refused[op] = self.refused.get(op, 0) + 1
+            elif status >= 300:
+                self.errors[op] = self.errors.get(op, 0) + 1
+            else:
+                for resource_id, change in changes:
+                    self.quantity[resource_id] = self.quantity.get(resource_id, 0) + change
+
+
+def post(session, tally, op, path, body, changes=()):
+    started = time.perf_counter()
+    status, response = session.request(path, json_body=body)
+    tally.add(op, time.perf_counter() - started, status, changes)
+    return status, response
+
+
+def worker(base_url, ids, tally, deadline, seed):
+    session = Session(base_url)
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        choice = rng.random()
+        if choice < 0.3:
+            resource_id, quantity = rng.choice(ids), rng.randint(1, 5)
+            post(session, tally, 'receive', '/api/v1/inventory/receive',
+                 {'items': [{'Resource_ID': resource_id, 'Quantity': quantity}]}, [(resource_id, quantity)])
+        elif choice < 0.7:
+            items = [(resource_id, rng.randint(1, 5)) for resource_id in rng.sample(ids, rng.randint(1, min(3, len(ids))))]
+            post(session, tally, 'dispatch (batch)', '/api/v1/inventory/dispatch',
+                 {'items': [{'Resource_ID': r, 'Quantity': q} for r, q in items]}, [(r, -q) for r, q in items])
+        else:
+            resource_id, quantity = rng.choice(ids), rng.randint(1, 5)
+            status, body = post(session, tally, 'reserve', '/api/v1/inventory/reserve',
+                                {'items': [{'Resource_ID': resource_id, 'Quantity': quantity}]})
+            if status != 201:
+                continue
+            reservation = json.loads(body)['reservations'][0]['Reservation_ID']
+            if rng.random() < 0.5:
+                post(session, tally, 'dispatch reservation', '/api/v1/reservations/%d/dispatch' % reservation, {},
+                     [(resource_id, -quantity)])
+            else:
+                post(session, tally, 'release reservation', '/api/v1/reservations/%d/release' % reservation, {})
+
+
+def blind_worker(base_url, ids, tally, deadline, seed):
+    session = Session(base_url)
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        resource_id = rng.choice(ids)
+        quantity, _ = stock(session, resource_id)
+        started = time.perf_counter()
+        status, _ = session.request('/api/v1/resources/%d' % resource_id, json_body={'Quantity': quantity - 1},
+                                    method='PATCH')
+        tally.add('blind PATCH Quantity-1', time.perf_counter() - started, status, [(resource_id, -1)])
+
+
+def run(target, base_url, ids, concurrency, duration, seed):
+    tally = Tally()
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    threads = [threading.Thread(target=target, args=(base_url, ids, tally, deadline, seed + i))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return tally, time.monotonic() - started
+
+
+def report(tally, elapsed):
+    print('%-26s %8s %8s %7s %8s %8s %8s' % ('operation', 'requests', 'req/s', '409', 'errors', 'p50 ms', 'p95 ms'))
+    for op in sorted(tally.timings):
+        ms = [t * 1000 for t in tally.timings[op]]
+        print('%-26s %8d %8.1f %7d %8d %8.1f %8.1f' % (
+            op, len(ms), len(ms) / elapsed, tally.refused.get(op, 0), tally.errors.get(op, 0),
+            percentile(ms, 50), percentile(ms, 95)))
+
+
+def check(session, ids, expected, label):
+    lost = 0
+    for resource_id in ids:
+        quantity, reserved = stock(session, resource_id)
+        if quantity != expected[resource_id] or reserved:
+            lost += 1
+            print('  resource %d: Quantity %d Reserved %d, expected %d / 0'
+                  % (resource_id, quantity, reserved, expected[resource_id]))
+    print('%s: %s' % (label, 'no lost updates' if not lost else '%d resource(s) out of step' % lost))
+    return lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--resources', type=int, default=3, help='Resources all the workers contend on.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per phase.')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    session = Session(args.url)
+    ids = create_resources(session, args.resources)
+    tally, elapsed = run(worker, args.url, ids, args.concurrency, args.duration, args.seed)
+    report(tally, elapsed)
+    expected = {resource_id: OPENING_STOCK + tally.quantity.get(resource_id, 0) for resource_id in ids}
+    lost = check(session, ids, expected, 'inventory API')
+
+    print()
+    tally, elapsed = run(blind_worker, args.url, ids, args.concurrency, args.duration, args.seed)
+    report(tally, elapsed)
+    expected = {resource_id: expected[resource_id] + tally.quantity.get(resource_id, 0) for resource_id in ids}
+    lost += check(session, ids, expected, 'blind PATCHes')
+    if lost:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""Load test every page of a running instance of the app.
+
+    flask --app app run --with-threads &
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --concurrency 16 --duration 60
+    python -m benchmarks.loadtest ... --compare benchmarks/results/before.json
+
+Each worker thread keeps its own session and loops over a random mix of the
+dashboard, every list page (first page and a sorted page) and, with
+probability --write-ratio, an add, edit or delete of a random entity posted
+through the same HTML forms a user fills in.  Rows to delete are created
+through the JSON API before the clock starts.  Throughput and p50/p95/p99
+latency are reported per route and saved as JSON for later comparison.
+
+Run it against a scratch database filled by benchmarks.datagen: the rows it
+adds and edits are left behind.  With --sqlite no server or MySQL is
+needed: the app is started in this process on an embedded SQLite database
+(':memory:' for a throwaway one) and filled with --victims rows first.
+
+    python -m benchmarks.loadtest --sqlite :memory: --victims 100000 --duration 30
+"""
+import argparse
+import datetime
+import http.cookiejar
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from werkzeug.serving import make_server
+
+import db
+import factory
+from benchmarks import datagen
+from benchmarks.search_bench import percentile
+from entities import ENTITIES
+
+CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A successful form post answers 302; time the post itself, not the list page after it.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Session:
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+        self.csrf_token = None
+
+    def request(self, path, data=None, json_body=None, method=None):
+        headers = {}
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            data = urllib.parse.urlencode(dict(data, csrf_token=self.csrf_token)).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self):
+        # Any form page hands out the session's CSRF token.
+        status, body = self.request('/location/add')
+        match = CSRF_RE.search(body.decode('utf-8', 'replace'))
+        self.csrf_token = match.group(1) if match else ''
+
+
+# --- WORKLOAD ---
+
+class Workload:
+    """Ids the generated operations refer to, discovered through the API."""
+
+    def __init__(self, session, pool_size, deletes, rng):
+        # Contacts and location names must be unique across runs, so they
+        # come from the clock rather than the (seeded) rng.
+        self.serials = itertools.count(int(time.time() * 1000) % 10 ** 9)
+        self.ids = {}
+        self.deletable = {}
+        self.lock = threading.Lock()
+        for entity in ENTITIES.values():
+            status, body = session.request('/api/v1/%s?size=%d&fields=%s' % (entity.api_name, pool_size, entity.pk))
+            items = json.loads(body)['items'] if status == 200 else []
+            self.ids[entity.name] = [item[entity.pk] for item in items]
+        for entity in ENTITIES.values():
+            if entity.read_only:
+                continue
+            created = []
+            for _ in range(deletes):
+                status, body = session.request('/api/v1/%s' % entity.api_name, json_body=self.form_data(entity, rng))
+                if status == 201:
+                    created.append(json.loads(body)[entity.pk])
+            self.deletable[entity.name] = created
+
+    def pick(self, name, rng):
+        ids = self.ids.get(name)
+        return rng.choice(ids) if ids else None
+
+    def take_deletable(self, name):
+        with self.lock:
+            ids = self.deletable.get(name)
+            return ids.pop() if ids else None
+
+    def form_data(self, entity, rng):
+        unique = next(self.serials) % 10 ** 9
+        ids = lambda name: self.ids[name] or [1]
+        if entity.name == 'location':
+            row = datagen.location_row(rng, unique)
+        elif entity.name == 'disaster':
+            row = datagen.disaster_row(rng, ids('location'))
+        elif entity.name == 'relief_camp':
+            row = datagen.camp_row(rng, rng.randint(50, 1000))
+        elif entity.name == 'victim':
+            row = datagen.victim_row(rng, datagen.contact(4, unique), ids('disaster'))
+        elif entity.name == 'volunteers':
+            row = datagen.volunteer_row(rng, datagen.contact(3, unique))
+        elif entity.name == 'resources':
+            row = datagen.resource_row(rng)
+        elif entity.name == 'rescue_team':
+            row = datagen.team_row(rng, ids('disaster'))
+        elif entity.name == 'donor':
+            row = datagen.donor_row(rng, datagen.contact(2, unique))
+        else:
+            row = datagen.donation_row(rng, ids('donor'), ids('resources'))
+        return {k: form_value(v) for k, v in row.items()}
+
+
+def form_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M')
+    return str(value)
+
+
+def next_operation(workload, rng, write_ratio):
+    """Return (route label, path, form data or None, success statuses)."""
+    writable = [e for e in ENTITIES.values() if not e.read_only]
+    if rng.random() < write_ratio:
+        entity = rng.choice(writable)
+        op = rng.choice(['add', 'edit', 'delete'])
+        if op == 'delete':
+            id = workload.take_deletable(entity.name)
+            if id is not None:
+                return 'POST /%s/delete/<id>' % entity.name, '/%s/delete/%d' % (entity.name, id), {}, (302,)
+            op = 'add'
+        if op == 'edit':
+            id = workload.pick(entity.name, rng)
+            if id is not None:
+                # Only what the edit form saves: a resource's Quantity moves through the inventory.
+                data = {k: v for k, v in workload.form_data(entity, rng).items() if k in entity.updatable}
+                return 'POST /%s/edit/<id>' % entity.name, '/%s/edit/%d' % (entity.name, id), data, (302,)
+        return 'POST /%s/add' % entity.name, '/%s/add' % entity.name, workload.form_data(entity, rng), (302,)
+
+    choice = rng.randrange(len(ENTITIES) * 2 + 1)
+    if choice == 0:
+        return 'GET /', '/', None, (200,)
+    entity = list(ENTITIES.values())[(choice - 1) // 2]
+    if choice % 2 and entity.sortable:
+        sort = rng.choice(entity.sortable)
+        return 'GET /%s?sort=' % entity.name, '/%s?sort=%s&order=desc' % (entity.name, sort), None, (200,)
+    return 'GET /%s' % entity.name, '/%s' % entity.name, None, (200,)
+
+
+# --- RUNNER ---
+
+class Recorder:
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def add(self, route, seconds, ok):
+        with self.lock:
+            self.timings.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def worker(base_url, workload, recorder, deadline, write_ratio, seed):
+    rng = random.Random(seed)
+    session = Session(base_url)
+    session.login()
+    while time.monotonic() < deadline:
+        route, path, data, ok_statuses = next_operation(workload, rng, write_ratio)
+        started = time.perf_counter()
+        status, _ = session.request(path, data=data)
+        recorder.add(route, time.perf_counter() - started, status in ok_statuses)
+
+
+def summarize(recorder, elapsed):
+    def stats(timings, errors):
+        ms = [t * 1000 for t in timings]
+        return {
+            'requests': len(ms),
+            'errors': errors,
+            'rps': round(len(ms) / elapsed, 2),
+            'mean_ms': round(sum(ms) / len(ms), 2),
+            'p50_ms': round(percentile(ms, 50), 2),
+            'p95_ms': round(percentile(ms, 95), 2),
+            'p99_ms': round(percentile(ms, 99), 2),
+            'max_ms': round(max(ms), 2),
+        }
+    routes = {route: stats(timings, recorder.errors.get(route, 0)) for route, timings in sorted(recorder.timings.items())}
+    everything = [t for timings in recorder.timings.values() for t in timings]
+    total = stats(everything, sum(recorder.errors.values())) if everything else {}
+    return routes, total
+
+
+def print_report(routes, total, baseline=None):
+    print('%-36s %8s %6s %8s %8s %8s %8s' % ('route', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for route, s in list(routes.items()) + [('TOTAL', total)]:
+        line = '%-36s %8d %6d %8.1f %8.1f %8.1f %8.1f' % (
+            route, s['requests'], s['errors'], s['rps'], s['p50_ms'], s['p95_ms'], s['p99_ms'])
+        before = (baseline or {}).get('total' if route == 'TOTAL' else 'routes', {})
+        before = before if route == 'TOTAL' else before.get(route)
+        if before:
+            line += '   p95 %+.0f%%' % ((s['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0)
+        print(line)
+
+
+def serve_sqlite(path, victims, seed):
+    """Start the app on a SQLite database in a background thread; returns its URL."""
+    app = factory.create_app(DB_BACKEND='sqlite', SQLITE_PATH=path)
+    if victims:
+        conn = db.connect()
+        try:
+            datagen.generate(conn, victims, seed=seed)
+        finally:
+            conn.close()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no line per request
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return 'http://127.0.0.1:%d' % server.server_port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--write-ratio', type=float, default=0.1, help='Share of requests that add, edit or delete.')
+    parser.add_argument('--deletes', type=int, default=50, help='Rows per table created up front for delete requests.')
+    parser.add_argument('--pool-size', type=int, default=500, help='Existing ids per table used for foreign keys and edits.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sqlite', metavar='PATH', help='Serve the app from this process on a SQLite database instead of --url.')
+    parser.add_argument('--victims', type=int, default=0, help='With --sqlite: datagen rows to add first.')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/loadtest-<time>.json).')
+    parser.add_argument('--compare', help='Earlier results file to show p95 changes against.')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        args.url = serve_sqlite(args.sqlite, args.victims, args.seed)
+    rng = random.Random(args.seed)
+    setup = Session(args.url)
+    workload = Workload(setup, args.pool_size, args.deletes, rng)
+    recorder = Recorder()
+    started_at = datetime.datetime.now()
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=worker, args=(args.url, workload, recorder, deadline, args.write_ratio, args.seed + i))
+               for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    routes, total = summarize(recorder, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(routes, total, baseline)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, 'loadtest-%s.json' % datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))
+    with open(output, 'w') as f:
+        json.dump({
+            'started': started_at.isoformat(timespec='seconds'),
+            'url': args.url,
+            'concurrency': args.concurrency,
+            'duration': round(elapsed, 2),
+            'write_ratio': args.write_ratio,
+            'routes': routes,
+            'total': total,
+        }, f, indent=2)
+    print('saved %s' % output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Latency benchmark for search.search(), the /search and /api/v1/search path.
+
+    python -m benchmarks.datagen --victims 1000000 --sqlite bench.db
+    python -m benchmarks.search_bench --sqlite bench.db --queries 2000
+
+Runs a mix of prefix, full, misspelt and contact-number queries through
+search.search() over all three targets, each in its own app context as a
+request would: the Table_Version check and catch-up read of every target,
+the trigram index (or the contact prefix query) and the re-read of the hits
+by primary key.  Names and contacts are sampled from the database, so fill
+it with benchmarks.datagen first (without --sqlite it uses MySQL).  The
+one-off index build is timed separately; p99 is checked against TARGET_P99.
+"""
+import argparse
+import random
+import time
+
+import factory
+
+TARGET_P99 = 50  # ms
+
+FIRST = ['Amit', 'Lakshmi', 'Ravi', 'Pooja', 'Suresh', 'Ananya', 'Rohit', 'Farhan', 'Karan', 'Sneha',
+         'Arjun', 'Meera', 'Rakesh', 'Shalini', 'Vikram', 'Nisha', 'Priya', 'Anirban', 'Seema', 'Ankita',
+         'Bikram', 'Sunil', 'Rajesh', 'Kavya', 'Imran', 'Deepa', 'Gaurav', 'Harini', 'Jatin', 'Lalita']
+LAST = ['Sharma', 'Nair', 'Das', 'Singh', 'Reddy', 'Sen', 'Mehta', 'Ali', 'Malhotra', 'Verma',
+        'Pillai', 'Yadav', 'Rao', 'Khan', 'Iyer', 'Ghosh', 'Rawat', 'Mohanty', 'Kumar', 'Patel',
+        'Banerjee', 'Chopra', 'Desai', 'Gupta', 'Joshi', 'Kapoor', 'Mishra', 'Naidu', 'Shetty', 'Thakur']
+
+
+def synthetic_name(rng):
+    # A random suffix keeps names from collapsing into a few hundred distinct values.
+    suffix = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 4)))
+    return '%s %s%s' % (rng.choice(FIRST), rng.choice(LAST), suffix)
+
+
+def misspell(name, rng):
+    chars = list(name)
+    i = rng.randrange(1, len(chars) - 1)
+    op = rng.choice('swap drop dup'.split())
+    if op == 'swap':
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    elif op == 'drop':
+        del chars[i]
+    else:
+        chars.insert(i, chars[i])
+    return ''.join(chars)
+
+
+def make_queries(rows, count, rng):
+    # (query, victim id it was made from, whether that id must be found),
+    # from (Victim_ID, Vic_name, Contact) rows.
+    queries = []
+    for id, name, contact in rows:
+        kind = rng.random()
+        if kind < 0.35:
+            # Prefixes match thousands of names equally well; any of them is fine.
+            queries.append((name.split()[rng.randrange(2)][:rng.randint(3, 6)], id, False))
+        elif kind < 0.6:
+            queries.append((name, id, True))
+        elif kind < 0.9:
+            queries.append((misspell(name, rng), id, True))
+        else:
+            queries.append((contact, id, True))
+    return queries[:count]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sqlite', metavar='PATH', help='Search this SQLite database instead of MySQL.')
+    args = parser.parse_args()
+
+    app = factory.create_app(**({'DB_BACKEND': 'sqlite', 'SQLITE_PATH': args.sqlite} if args.sqlite else {}))
+    import search
+
+    started = time.perf_counter()
+    with app.app_context():
+        for target in search.TARGETS.values():
+            target.build()
+    victims = search.TARGETS['victim']
+    print('built indexes in %.1fs (%s names)' % (time.perf_counter() - started, ', '.join(
+        '%d %s' % (len(target.index.names), kind) for kind, target in search.TARGETS.items())))
+    if not victims.index.names:
+        parser.error('no victims to search: fill the database with benchmarks.datagen first')
+
+    rng = random.Random(args.seed)
+    ids = rng.sample(sorted(victims.index.names), min(args.queries, len(victims.index.names)))
+    with app.app_context():
+        rows = victims.load(ids)
+    queries = make_queries([rows[id] for id in ids if id in rows], args.queries, rng)
+
+    timings = []
+    found = expected = recalled = 0
+    for query, id, must_find in queries:
+        started = time.perf_counter()
+        with app.app_context():
+            results = search.search(query, limit=args.limit)
+        timings.append((time.perf_counter() - started) * 1000)
+        found += bool(results)
+        if must_find:
+            expected += 1
+            recalled += any(r['type'] == 'victim' and r['id'] == id for r in results)
+    print('%d queries, %d with results, full/misspelt name or contact found in top %d: %d/%d'
+          % (len(queries), found, args.limit, recalled, expected))
+    p99 = percentile(timings, 99)
+    print('p50 %.2fms  p95 %.2fms  p99 %.2fms  max %.2fms' % tuple(
+        [percentile(timings, p) for p in (50, 95)] + [p99, max(timings)]))
+    print('p99 target %dms: %s' % (TARGET_P99, 'met' if p99 < TARGET_P99 else 'NOT met'))
+
+
+if __name__ == '__main__':
+    main()
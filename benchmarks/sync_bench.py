@@ -0,0 +1,101 @@
+"""Time an offline journal uploaded through POST /api/v1/sync against the same
+changes posted one by one through the HTML forms.
+
+    flask --app app run --with-threads &
+    python -m benchmarks.sync_bench --url http://127.0.0.1:5000 --operations 1000
+
+The journal mixes creates and edits of victims, donations, volunteers and
+donors, the writes a field team queues while offline.  It is applied three
+ways: one form post per change, as a single sync request, and as the same
+sync request again, which a client whose connection dropped before the
+response would send and which must only replay the journal.  Operations per
+second are printed for each.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.loadtest import Session, Workload
+from entities import ENTITIES
+
+JOURNAL_ENTITIES = ['victim', 'donation', 'volunteers', 'donor']
+
+
+def build_journal(workload, count, rng):
+    """Return a list of (entity, id or None, data), about one edit per three creates."""
+    journal = []
+    for _ in range(count):
+        entity = ENTITIES[rng.choice(JOURNAL_ENTITIES)]
+        id = workload.pick(entity.name, rng) if rng.random() < 0.25 else None
+        journal.append((entity, id, workload.form_data(entity, rng)))
+    return journal
+
+
+def via_forms(session, journal):
+    failed = 0
+    for entity, id, data in journal:
+        if id is None:
+            status, _ = session.request('/%s/add' % entity.name, data=data)
+        else:
+            status, _ = session.request('/%s/edit/%d' % (entity.name, id), data=data)
+        failed += status != 302
+    return failed
+
+
+def sync_body(journal, run):
+    operations = []
+    for i, (entity, id, data) in enumerate(journal):
+        op = {'key': 'bench-%s-%d' % (run, i), 'resource': entity.api_name, 'data': data}
+        if id is None:
+            op['op'] = 'create'
+        else:
+            op.update(op='update', id=id)
+        operations.append(op)
+    return {'client': 'bench-%s' % run, 'operations': operations}
+
+
+def via_sync(session, body):
+    status, response = session.request('/api/v1/sync', json_body=body)
+    if status != 200:
+        raise SystemExit('sync failed with %d: %s' % (status, response[:200]))
+    return json.loads(response)
+
+
+def timed(label, count, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print('%-24s %8d ops %8.2f s %10.1f ops/s' % (label, count, elapsed, count / elapsed))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--operations', type=int, default=1000)
+    parser.add_argument('--pool-size', type=int, default=500, help='Existing ids per table used for foreign keys and edits.')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    session = Session(args.url)
+    session.login()
+    workload = Workload(session, args.pool_size, 0, rng)
+    journal = build_journal(workload, args.operations, rng)
+    run = int(time.time())
+
+    failed = timed('form posts', len(journal), lambda: via_forms(session, journal))
+    if failed:
+        print('  %d form posts failed' % failed)
+    # Creates carry unique contacts, so the sync runs get their own copies of the rows.
+    journal = [(entity, id, workload.form_data(entity, rng) if id is None else data) for entity, id, data in journal]
+    body = sync_body(journal, run)
+    first = timed('sync', len(journal), lambda: via_sync(session, body))
+    again = timed('sync (retried)', len(journal), lambda: via_sync(session, body))
+    print('sync: %(applied)d applied, %(replayed)d replayed, %(failed)d failed' % first)
+    print('retry: %(applied)d applied, %(replayed)d replayed, %(failed)d failed' % again)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import csv
+import json
+import time
+
+from werkzeug.datastructures import MultiDict
+
+import db
+from entities import ENTITIES
+
+LOCK_ERRORS = (1205, 1213)  # lock wait timeout, deadlock
+MAX_ATTEMPTS = 3
+
+# Import name -> entity; its form's field rules validate each row and its writable
+# columns are inserted (CSV headers / JSON keys use the same names).
+IMPORTS = {name: entity for name, entity in ENTITIES.items() if entity.importable}
+
+
+class ImportReport:
+    def __init__(self, max_errors=1000):
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+# --- READERS: each yields (line or record number, row dict, error message) ---
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def read_jsonl(stream):
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError as e:
+            yield line_no, None, 'Invalid JSON: %s' % e
+
+
+def read_json(stream, chunk_size=65536):
+    # Decode a top-level array one element at a time instead of json.load()ing
+    # the whole file.
+    decoder = json.JSONDecoder()
+    buf = stream.read(chunk_size).lstrip()
+    if not buf.startswith('['):
+        raise ValueError('A .json import must contain an array of objects')
+    buf, eof, record = buf[1:], False, 0
+    while True:
+        buf = buf.lstrip()
+        if buf.startswith(','):
+            buf = buf[1:].lstrip()
+        if buf.startswith(']'):
+            return
+        if buf:
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except ValueError as e:
+                if eof:
+                    raise ValueError('Invalid JSON after record %d: %s' % (record, e))
+                obj = None
+            if obj is not None:
+                record += 1
+                buf = buf[end:]
+                yield record, obj, None
+                continue
+        if eof:
+            raise ValueError('Unexpected end of JSON after record %d' % record)
+        more = stream.read(chunk_size)
+        eof = not more
+        buf += more
+
+
+def read_rows(stream, filename):
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return read_csv(stream)
+    if name.endswith(('.jsonl', '.ndjson')):
+        return read_jsonl(stream)
+    if name.endswith('.json'):
+        return read_json(stream)
+    raise ValueError('Unsupported file type: %s (expected .csv, .json or .jsonl)' % filename)
+
+
+# --- IMPORT ---
+
+def validate_row(form, spec, row):
+    if not isinstance(row, dict):
+        return None, 'Expected an object with fields %s' % ', '.join(spec.writable)
+    formdata = MultiDict((c, '' if row.get(c) is None else str(row.get(c))) for c in spec.writable)
+    form.process(formdata)
+    if not form.validate():
+        return None, '; '.join('%s: %s' % (name, ' '.join(errors)) for name, errors in form.errors.items())
+    return tuple(form[c].data for c in spec.writable), None
+
+
+def _insert(cur, conn, spec, batch):
+    # (rows inserted, [(line, message) of rejected rows]) in the open transaction.
+    try:
+        cur.executemany(spec.insert_sql, [values for _, values in batch])
+        return len(batch), []
+    except db.DatabaseError as e:
+        if e.args[0] in LOCK_ERRORS:
+            raise
+    # The multi-row INSERT failed as a whole; retry row by row so only the
+    # offending rows (e.g. a duplicate Contact) are rejected.
+    conn.rollback()
+    inserted, errors = 0, []
+    for line, values in batch:
+        try:
+            cur.execute(spec.insert_sql, values)
+            inserted += 1
+        except db.DatabaseError as e:
+            if e.args[0] in LOCK_ERRORS:
+                raise
+            errors.append((line, str(e)))
+    return inserted, errors
+
+
+def insert_batch(conn, spec, batch, report):
+    """Insert one batch in one transaction; rows are counted once it commits.
+
+    A lock wait timeout or deadlock says nothing about the rows, so the whole
+    batch is retried; only if every attempt fails are its rows reported.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        cur = conn.cursor()
+        try:
+            inserted, errors = _insert(cur, conn, spec, batch)
+            db.bump_versions(cur, spec.table)
+            db.commit(conn)
+            break
+        except db.DatabaseError as e:
+            conn.rollback()
+            if e.args[0] not in LOCK_ERRORS:
+                raise
+            inserted, errors = 0, [(line, 'Not imported: %s' % e) for line, _ in batch]
+        finally:
+            cur.close()
+    report.inserted += inserted
+    for line, message in errors:
+        report.error(line, message)
+
+
+def import_rows(kind, rows, batch_size=1000):
+    """Validate rows with the entity's form and insert them in batches.
+
+    Every batch is one executemany() and one transaction, so a bad row only
+    costs its own batch a slower row-by-row retry and never aborts the file.
+    """
+    spec = IMPORTS[kind]
+    form = spec.form_class(formdata=None, meta={'csrf': False})
+    conn = db.get_connection()
+    report = ImportReport()
+    batch = []
+    for line, row, error in rows:
+        report.rows += 1
+        if error is None:
+            values, error = validate_row(form, spec, row)
+        if error is not None:
+            report.error(line, error)
+            continue
+        batch.append((line, values))
+        if len(batch) >= batch_size:
+            insert_batch(conn, spec, batch, report)
+            db.notify_write(spec.table)
+            batch = []
+    if batch:
+        insert_batch(conn, spec, batch, report)
+        db.notify_write(spec.table)
+    report.elapsed = time.perf_counter() - report.started
+    return report
@@ -0,0 +1,162 @@
+import json
+import queue
+import threading
+import time
+
+import db
+
+PURGE_EVERY = 3600  # seconds between Change_Log clean-ups
+BATCH = 500         # Change_Log rows read per poll
+# A Change_ID below the highest one read may still show up: its transaction
+# took the id first but committed later.  Skipped ids are looked for again
+# for this many seconds (then taken as rolled back), at most MAX_MISSING.
+GAP_TIMEOUT = 60
+MAX_MISSING = 1000
+
+CHANGES_SQL = ("SELECT c.Change_ID, c.Row_ID, c.Op, c.Amount_Delta, d.Amount, d.Donation_date, d.Donor_ID, r.Donor_name "
+               "FROM Change_Log c LEFT JOIN Donation d ON d.Donation_ID = c.Row_ID "
+               "LEFT JOIN Donor r ON r.Donor_ID = d.Donor_ID WHERE c.Table_name = 'Donation' AND ")
+
+
+def format_event(name, data):
+    return 'event: %s\ndata: %s\n\n' % (name, json.dumps(data, default=str, separators=(',', ':')))
+
+
+def counts_payload(counts):
+    counts = dict(counts)
+    counts['total_donations'] = float(counts['total_donations'])
+    return counts
+
+
+class ChangeFeed:
+    """Pushes dashboard updates to every open Server-Sent Events stream.
+
+    One background thread per worker polls the database, and only while at
+    least one dashboard is connected.  Each poll is two small queries: the
+    Table_Version rows, to find which tables changed (from any worker), and
+    the Change_Log rows written since the last poll (and, for a minute, any
+    ids it skipped because their transaction had not committed yet, so a
+    late commit is still sent once).  Changed tables
+    invalidate their dashboard counters, which are re-read once and
+    published as a single 'counts' event; every new donation becomes a
+    'donation' event.  Events are encoded once and shared by all
+    subscribers, so the database work depends on the number of changes,
+    not on the number of viewers.
+    """
+
+    def __init__(self, app, cache, interval=1.0, heartbeat=15, retention=86400):
+        self.app = app
+        self.cache = cache
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.retention = retention
+        self.subscribers = set()
+        self.versions = None
+        self.last_change = None
+        self.missing = {}  # Change_ID skipped below last_change -> monotonic time first missed
+        self.purged_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=100)
+        with self._lock:
+            self.subscribers.add(q)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self.subscribers.discard(q)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # A stalled client misses events; the next 'counts' event
+                # is a full snapshot and puts it right again.
+                pass
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self.subscribers:
+                    # Nobody is watching: stop, and start from scratch on the next subscriber.
+                    self.versions = self.last_change = None
+                    self.missing = {}
+                    self._thread = None
+                    return
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except db.DatabaseError as e:
+                self.app.logger.warning('change feed poll failed: %s', e)
+
+    def poll(self):
+        versions = dict(db.fetch_all("SELECT Table_name, Version FROM Table_Version"))
+        if self.versions is None:
+            self.versions = versions
+            self.last_change = db.fetch_one("SELECT COALESCE(MAX(Change_ID), 0) FROM Change_Log", ())[0]
+            return
+        changed = [table for table, version in versions.items() if self.versions.get(table) != version]
+        self.versions = versions
+
+        rows = self.read_changes()
+        for change_id, row_id, op, delta, amount, date, donor_id, donor_name in rows:
+            if op == 'I':
+                self.publish(format_event('donation', {
+                    'id': row_id, 'amount': float(amount if amount is not None else delta),
+                    'date': date, 'donor_id': donor_id, 'donor': donor_name}))
+        if rows and 'Donation' not in changed:
+            changed.append('Donation')
+
+        if changed:
+            for table in changed:
+                self.cache.invalidate(table)
+            self.publish(format_event('counts', counts_payload(self.cache.get(db.fetch_one))))
+
+        if time.monotonic() - self.purged_at > PURGE_EVERY:
+            self.purged_at = time.monotonic()
+            db.execute_commit("DELETE FROM Change_Log WHERE Changed_At < NOW() - INTERVAL %s SECOND",
+                              (self.retention,))
+
+    def read_changes(self):
+        """Change_Log rows not seen yet, in Change_ID order: the ones past
+        last_change and any late commits among the missing ids below it."""
+        now = time.monotonic()
+        self.missing = {id: at for id, at in self.missing.items() if now - at < GAP_TIMEOUT}
+        late = []
+        if self.missing:
+            late = db.fetch_all(CHANGES_SQL + "c.Change_ID IN (%s)" % ','.join(['%s'] * len(self.missing)),
+                                tuple(self.missing))
+            for row in late:
+                del self.missing[row[0]]
+        rows = db.fetch_all(CHANGES_SQL + "c.Change_ID > %s ORDER BY c.Change_ID LIMIT %s", (self.last_change, BATCH))
+        for row in rows:
+            for id in range(max(self.last_change + 1, row[0] - MAX_MISSING), row[0]):
+                self.missing[id] = now
+            self.last_change = row[0]
+        if len(self.missing) > MAX_MISSING:
+            for id in sorted(self.missing)[:len(self.missing) - MAX_MISSING]:
+                del self.missing[id]
+        return sorted(late) + list(rows)
+
+    def stream(self, counts):
+        """Generator for one SSE response: a snapshot, then live events."""
+        q = self.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            yield format_event('counts', counts_payload(counts))
+            while True:
+                try:
+                    yield q.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+        finally:
+            self.unsubscribe(q)
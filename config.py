@@ -4,3 +4,102 @@ class Config:
     MYSQL_USER = 'root'
     MYSQL_PASSWORD = 'bhargavee'
     MYSQL_DB = 'DISASTER_MANAGEMENT'
+    MYSQL_PORT = 3306
+
+    # Storage engine: 'mysql' (the settings above) or 'sqlite', an embedded
+    # database file for tests, benchmarks and single-node field deployments
+    # with no database server (sqlite_db.py).  An empty SQLITE_PATH is created
+    # from database_sqlite.sql on first connect; relative paths are from the
+    # project directory, and ':memory:' is a scratch database deleted at exit
+    DB_BACKEND = 'mysql'
+    SQLITE_PATH = 'disaster.db'
+    # Seconds a SQLite writer waits for the one before it to commit
+    SQLITE_BUSY_TIMEOUT = 10
+
+    # Read replicas, e.g. [('127.0.0.1', 3307)]: (host, port) pairs with the same
+    # user, password and database as the primary.  fetch_all/fetch_one read from
+    # them; writes always go to MYSQL_HOST.  Empty sends everything to MYSQL_HOST
+    MYSQL_REPLICAS = []
+    # After a write, that session reads from the primary for this many seconds
+    READ_YOUR_WRITES_SECONDS = 5
+    # If > 0, a session that just wrote may still read from a replica once it has
+    # applied the write, waiting at most this many seconds (needs GTID replication)
+    REPLICA_GTID_WAIT = 0
+    # Replicas more than this many seconds behind the primary are skipped
+    REPLICA_MAX_LAG = 10
+    # Seconds between replication lag checks of a replica
+    REPLICA_CHECK_INTERVAL = 5
+    # Seconds before a replica that failed or lagged is tried again
+    REPLICA_RETRY = 30
+
+    # Connection pool shared by all request threads in a worker
+    DB_POOL_MIN_SIZE = 2
+    DB_POOL_MAX_SIZE = 20
+    DB_POOL_TIMEOUT = 10         # seconds to wait for a free connection
+    DB_POOL_RECYCLE = 3600       # replace connections older than this
+    DB_POOL_IDLE_TIMEOUT = 300   # close idle connections above the min size
+    DB_POOL_PING_INTERVAL = 30   # ping connections idle longer than this on checkout
+
+    # Async mode (asgi.py): aiomysql pool per worker process.  Each connection
+    # serves one query at a time, so this caps the queries in flight per worker
+    ASYNC_DB_POOL_MAX_SIZE = 50
+
+    # Rendered list pages, the dashboard and /reports are cached in files shared
+    # by the workers on the host, keyed on the URL and the Table_Version of every
+    # table the page shows.  PAGE_CACHE_DIR None uses the system temp directory
+    PAGE_CACHE = True
+    PAGE_CACHE_DIR = None
+    # Cached pages older than this many seconds are dropped, and the oldest ones
+    # once the directory holds more than PAGE_CACHE_MAX_BYTES
+    PAGE_CACHE_MAX_AGE = 3600
+    PAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    # HTML, JSON and text responses of at least COMPRESS_MIN_SIZE bytes are sent
+    # brotli (if installed) or gzip compressed to clients that accept it
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+
+    # Dashboard counters are cached per worker for this many seconds
+    DASHBOARD_CACHE_TTL = 30
+    # Seconds an invalidated counter may still be served before it is re-queried
+    DASHBOARD_STALE_GRACE = 0
+
+    # Seconds between full rebuilds of the in-memory name search index
+    # (new rows are picked up incrementally; this catches edits by other workers)
+    SEARCH_REBUILD_INTERVAL = 600
+
+    # Queries slower than this many seconds go to the slow-query log (0 disables)
+    SLOW_QUERY_SECONDS = 0.5
+    # Append the EXPLAIN plan of slow SELECTs to their log entry
+    SLOW_QUERY_EXPLAIN = True
+    # File for the slow-query log (None logs to stderr)
+    SLOW_QUERY_LOG = None
+
+    # Live dashboard feed: seconds between change polls (one poller per worker),
+    # seconds between SSE keep-alives, and how long Change_Log rows are kept
+    CHANGE_FEED_POLL_INTERVAL = 1.0
+    CHANGE_FEED_HEARTBEAT = 15
+    CHANGE_FEED_RETENTION = 86400
+
+    # Background deletes (delete_jobs.py): dependent rows deleted per transaction,
+    # seconds to pause between chunks so other writers get the locks, seconds
+    # between checks for queued jobs, and seconds without progress after which
+    # a running job is considered crashed and resumed by another worker
+    DELETE_CHUNK_SIZE = 1000
+    DELETE_CHUNK_PAUSE = 0.05
+    DELETE_JOB_POLL_INTERVAL = 5
+    DELETE_JOB_STALE = 120
+
+    # Field sync (POST /api/v1/sync): most operations accepted per request, and
+    # operations applied per transaction (one commit per group)
+    SYNC_MAX_OPERATIONS = 5000
+    SYNC_GROUP_SIZE = 250
+
+    # Retention (archive.py, `flask archive`): rows older than this many days are
+    # moved out of MySQL into gzipped monthly files under ARCHIVE_DIR (relative
+    # paths are from the project directory), ARCHIVE_CHUNK_SIZE rows per
+    # transaction; archive months older than ARCHIVE_KEEP_MONTHS are deleted
+    # (None keeps them for good).  Tables not listed are never archived.
+    ARCHIVE_DIR = 'archive'
+    ARCHIVE_AFTER_DAYS = {'Disaster_Delete_Log': 365, 'Delete_Job': 30}
+    ARCHIVE_KEEP_MONTHS = {'Disaster_Delete_Log': None, 'Delete_Job': 12}
+    ARCHIVE_CHUNK_SIZE = 5000
@@ -0,0 +1,94 @@
+from flask import render_template, redirect, url_for, flash, request
+
+from db import fetch_all, fetch_one, execute_commit, execute_insert
+import delete_jobs
+import page_cache
+import search
+
+
+def list_view(entity, extra_context=None, tables=()):
+    @page_cache.cached([entity.table] + list(tables))
+    def view():
+        page = entity.paginator.page(fetch_all, request.args)
+        context = extra_context(page.rows) if extra_context else {}
+        return render_template(entity.template, rows=page.rows, page=page, **context)
+    return view
+
+
+def add_view(entity):
+    def view():
+        form = entity.form_class()
+        if form.validate_on_submit():
+            try:
+                values = entity.form_values(form)
+                new_id = execute_insert(entity.insert_sql, values)
+                search.row_saved(entity.table, new_id, values[0])
+                flash('%s added successfully.' % entity.label, 'success')
+                return redirect(url_for('%s_list' % entity.name))
+            except Exception as e:
+                flash(str(e), 'danger')
+        return render_template('form.html', form=form, title='Add %s' % entity.label)
+    return view
+
+
+def edit_view(entity):
+    def view(id):
+        record = entity.get(fetch_one, id)
+        if record is None:
+            flash('%s not found' % entity.label, 'danger')
+            return redirect(url_for('%s_list' % entity.name))
+        # Field names match the column names, so the record fills the form on GET.
+        form = entity.edit_form_class(obj=record)
+        if form.validate_on_submit():
+            try:
+                values = entity.update_values(form)
+                execute_commit(entity.update_sql, values + (id,))
+                search.row_saved(entity.table, id, values[0])
+                flash('%s updated successfully.' % entity.label, 'success')
+                return redirect(url_for('%s_list' % entity.name))
+            except Exception as e:
+                flash(str(e), 'danger')
+        return render_template('form.html', form=form, title='Edit %s' % entity.label)
+    return view
+
+
+def delete_view(entity):
+    def view(id):
+        if entity.dependents:
+            return delete_later_view(entity, id)
+        try:
+            execute_commit(entity.delete_sql, (id,))
+            search.row_deleted(entity.table, id)
+            flash('%s deleted.' % entity.label, 'success')
+        except Exception as e:
+            flash(str(e), 'danger')
+        return redirect(url_for('%s_list' % entity.name))
+    return view
+
+
+def delete_later_view(entity, id):
+    try:
+        job_id, total, finished = delete_jobs.delete_later(entity, id)
+    except Exception as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('%s_list' % entity.name))
+    if finished:
+        flash('%s deleted.' % entity.label, 'success')
+        return redirect(url_for('%s_list' % entity.name))
+    flash('%s %s and its %d linked rows are being deleted in the background (job %d).'
+          % (entity.label, id, total - 1, job_id), 'info')
+    return redirect(url_for('delete_job_list'))
+
+
+def register_routes(app, entity, extra_context=None, tables=()):
+    """Add the /<name>, /<name>/add, /<name>/edit/<id> and /<name>/delete/<id>
+    pages for an entity, under the endpoint names the templates use
+    (<name>_list, <name>_add, ...).  tables lists any other tables whose
+    changes show on the list page (see page_cache.cached)."""
+    base = '/' + entity.name
+    app.add_url_rule(base, '%s_list' % entity.name, list_view(entity, extra_context, tables))
+    if entity.read_only:
+        return
+    app.add_url_rule(base + '/add', '%s_add' % entity.name, add_view(entity), methods=['GET', 'POST'])
+    app.add_url_rule(base + '/edit/<int:id>', '%s_edit' % entity.name, edit_view(entity), methods=['GET', 'POST'])
+    app.add_url_rule(base + '/delete/<int:id>', '%s_delete' % entity.name, delete_view(entity), methods=['POST'])
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+# Dashboard counter -> (table it is computed from, scalar subquery)
+COUNTERS = {
+    'locations': ('Location', "SELECT COUNT(*) FROM Location"),
+    'disasters': ('Disaster', "SELECT COUNT(*) FROM Disaster"),
+    'relief_camps': ('Relief_Camp', "SELECT COUNT(*) FROM Relief_Camp"),
+    'victims': ('Victim', "SELECT COUNT(*) FROM Victim"),
+    'volunteers': ('Volunteers', "SELECT COUNT(*) FROM Volunteers"),
+    'resources': ('Resources', "SELECT COUNT(*) FROM Resources"),
+    'rescue_teams': ('Rescue_Team', "SELECT COUNT(*) FROM Rescue_Team"),
+    'donors': ('Donor', "SELECT COUNT(*) FROM Donor"),
+    'donations': ('Donation', "SELECT COUNT(*) FROM Donation"),
+    'total_donations': ('Donation', "SELECT IFNULL(SUM(Amount),0) FROM Donation"),
+}
+
+
+class DashboardCache:
+    """In-process cache of the dashboard counters.
+
+    All stale counters are refreshed together in a single round trip, and a
+    write to one table only invalidates the counters computed from it.  With
+    stale_grace > 0 an invalidated counter may keep being served for that many
+    seconds, and while one request is refreshing, concurrent requests get the
+    previous values instead of queueing behind it.  Each worker process keeps
+    its own cache, so ttl bounds how long other workers can lag behind a write.
+    """
+
+    def __init__(self, ttl=30, stale_grace=0):
+        self.ttl = ttl
+        self.stale_grace = stale_grace
+        self._values = {}
+        self._loaded_at = {}
+        self._dirty = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._pending = None
+
+    def invalidate(self, table):
+        now = time.monotonic()
+        with self._lock:
+            for key, (source, _) in COUNTERS.items():
+                if source == table:
+                    self._dirty.setdefault(key, now)
+
+    def observe(self, versions):
+        """Invalidate the counters of tables whose Table_Version moved since
+        the last call, i.e. tables written by other workers."""
+        with self._lock:
+            changed = [table for table, version in versions.items() if self._versions.get(table) != version]
+            self._versions.update(versions)
+        for table in changed:
+            self.invalidate(table)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._loaded_at.clear()
+            self._dirty.clear()
+
+    def _stale_keys(self, now):
+        stale, urgent = [], False
+        for key in COUNTERS:
+            if key not in self._values:
+                stale.append(key)
+                urgent = True
+                continue
+            expired_at = self._loaded_at[key] + self.ttl
+            if key in self._dirty:
+                expired_at = min(expired_at, self._dirty[key])
+            if now >= expired_at:
+                stale.append(key)
+                if now >= expired_at + self.stale_grace:
+                    urgent = True
+        return stale, urgent
+
+    def get(self, fetch_one):
+        now = time.monotonic()
+        with self._lock:
+            stale, urgent = self._stale_keys(now)
+            values = dict(self._values)
+        if not stale or not urgent:
+            return values
+        # Only block when there is nothing to show yet; otherwise let the
+        # request already refreshing do the work and serve what we have.
+        if not self._refreshing.acquire(blocking=len(values) < len(COUNTERS)):
+            return values
+        try:
+            with self._lock:
+                stale, _ = self._stale_keys(time.monotonic())
+            if stale:
+                self._refresh(fetch_one, stale)
+            with self._lock:
+                return dict(self._values)
+        finally:
+            self._refreshing.release()
+
+    async def get_async(self, fetch_one):
+        """get() for the async mode: fetch_one is a coroutine function, and
+        stale counters are queried concurrently, one connection each.
+        Callers arriving while a refresh is in flight wait for it only when
+        there is nothing to show yet."""
+        now = time.monotonic()
+        with self._lock:
+            stale, urgent = self._stale_keys(now)
+            values = dict(self._values)
+        if not stale or not urgent:
+            return values
+        if self._pending is not None and not self._pending.done():
+            if len(values) == len(COUNTERS):
+                return values
+        else:
+            self._pending = asyncio.ensure_future(self._refresh_async(fetch_one, stale))
+        await asyncio.shield(self._pending)
+        with self._lock:
+            return dict(self._values)
+
+    def _refresh(self, fetch_one, keys):
+        started = time.monotonic()
+        query = "SELECT " + ", ".join("(%s)" % COUNTERS[key][1] for key in keys)
+        self._store(keys, fetch_one(query, ()), started)
+
+    async def _refresh_async(self, fetch_one, keys):
+        started = time.monotonic()
+        rows = await asyncio.gather(*(fetch_one(COUNTERS[key][1], ()) for key in keys))
+        self._store(keys, [row[0] for row in rows], started)
+
+    def _store(self, keys, row, started):
+        with self._lock:
+            for key, value in zip(keys, row):
+                self._values[key] = value
+                self._loaded_at[key] = started
+                # Keep the dirty mark if a write landed while we were querying.
+                if key in self._dirty and self._dirty[key] <= started:
+                    del self._dirty[key]
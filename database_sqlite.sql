@@ -0,0 +1,626 @@
+-- SQLite port of database.txt, loaded by sqlite_db.py into an empty database
+-- file on first connect (Config.DB_BACKEND = 'sqlite').  Keep the two in step.
+--
+-- Differences from the MySQL schema:
+--  * Tables are created in their final form (no ALTER TABLE) and the seed
+--    rows are inserted after the triggers, which fill Camp_Occupancy, the
+--    report rollups and the opening Stock_Movement entries.
+--  * SIGNAL becomes RAISE(ABORT, ...); sqlite_db.py reports it as MySQL
+--    error 1644, so api.py answers 409 as it does on MySQL.
+--  * ON DELETE CASCADE / SET NULL do fire the child table's triggers in
+--    SQLite, so the trg_disaster_before_delete_occupancy/_rollup triggers
+--    are not needed here.
+--  * A trigger cannot change NEW, so Victim.Age is set by AFTER triggers
+--    (and is nullable for that one statement).  It is recomputed when any
+--    other Victim column is updated.
+--  * age_years(), age_band(), NOW() and the other MySQL functions the
+--    queries use are Python functions registered by sqlite_db.py; open the
+--    file through it, not the sqlite3 shell, to write to these tables.
+--  * Text columns compare and sort case-insensitively (COLLATE NOCASE), like
+--    MySQL's default collation.
+--  * SQLite does not index foreign key columns by itself; see FOREIGN KEY
+--    INDEXES.
+
+-- LOCATION
+CREATE TABLE Location (
+    Location_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    City VARCHAR(50) NOT NULL COLLATE NOCASE,
+    District VARCHAR(50) NOT NULL COLLATE NOCASE,
+    State VARCHAR(50) NOT NULL COLLATE NOCASE,
+    UNIQUE (City, District, State)
+);
+
+-- DISASTER
+CREATE TABLE Disaster (
+    Disaster_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    D_type VARCHAR(50) NOT NULL COLLATE NOCASE CHECK (D_type IN ('Flood','Cyclone','Earthquake','Landslide','Fire','Other')),
+    D_date DATE NOT NULL,
+    D_time TIME,
+    Location_ID INT NOT NULL,
+    FOREIGN KEY (Location_ID) REFERENCES Location(Location_ID)
+);
+
+-- RELIEF CAMP
+CREATE TABLE Relief_Camp (
+    Camp_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Camp_Name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    Location VARCHAR(100) NOT NULL COLLATE NOCASE,
+    Capacity INT NOT NULL CHECK (Capacity > 0),
+    Incharge VARCHAR(100) NOT NULL COLLATE NOCASE
+);
+
+-- VICTIM
+CREATE TABLE Victim (
+    Victim_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Vic_name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    DOB DATE NOT NULL,
+    Age INT CHECK (Age > 0),  -- set from DOB by trg_victim_age_insert / trg_victim_rollup_update
+    Contact VARCHAR(15) NOT NULL UNIQUE COLLATE NOCASE,
+    Disaster_ID INT NOT NULL,
+    Camp_ID INT,
+    CONSTRAINT fk_Disaster FOREIGN KEY (Disaster_ID) REFERENCES Disaster(Disaster_ID) ON DELETE CASCADE,
+    CONSTRAINT fk_Relief_Camp FOREIGN KEY (Camp_ID) REFERENCES Relief_Camp(Camp_ID) ON DELETE SET NULL
+);
+
+-- VOLUNTEERS
+CREATE TABLE Volunteers (
+    Volunteer_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    V_name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    Age INT NOT NULL CHECK (Age >= 18),
+    Gender VARCHAR(10) COLLATE NOCASE CHECK (Gender IN ('Male','Female','Other')),
+    Contact_Info VARCHAR(15) NOT NULL UNIQUE COLLATE NOCASE
+);
+
+-- RESOURCES (with the RESOURCE INVENTORY columns)
+CREATE TABLE Resources (
+    Resource_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    R_name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    R_type VARCHAR(50) NOT NULL COLLATE NOCASE,
+    Quantity INT NOT NULL CHECK (Quantity >= 0),
+    Reserved INT NOT NULL DEFAULT 0,
+    Stock_Version INT NOT NULL DEFAULT 0,
+    CONSTRAINT chk_resource_reserved CHECK (Reserved >= 0 AND Reserved <= Quantity)
+);
+
+-- RESCUE TEAM
+CREATE TABLE Rescue_Team (
+    Team_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Team_name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    Team_type VARCHAR(50) COLLATE NOCASE CHECK (Team_type IN ('Medical','Rescue','Army','Fire','Other')),
+    No_of_People INT NOT NULL CHECK (No_of_People > 0),
+    Disaster_ID INT NOT NULL,
+    CONSTRAINT fk2_Disaster FOREIGN KEY (Disaster_ID) REFERENCES Disaster(Disaster_ID)
+);
+
+-- DONOR
+CREATE TABLE Donor (
+    Donor_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Donor_name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    Contact VARCHAR(15) NOT NULL UNIQUE COLLATE NOCASE
+);
+
+-- DONATION
+CREATE TABLE Donation (
+    Donation_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Donor_ID INT NOT NULL,
+    Amount DECIMAL(12,2) NOT NULL CHECK (Amount > 0),
+    Donation_date DATE NOT NULL,
+    Resource_ID INT NOT NULL,
+    CONSTRAINT fk_Donor FOREIGN KEY (Donor_ID) REFERENCES Donor(Donor_ID),
+    CONSTRAINT fk_Resources FOREIGN KEY (Resource_ID) REFERENCES Resources(Resource_ID)
+);
+
+CREATE TABLE Disaster_Delete_Log (
+    Log_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Disaster_ID INT,
+    D_type VARCHAR(50) COLLATE NOCASE,
+    D_date DATE,
+    D_time TIME,
+    Location_ID INT,
+    Deleted_At DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+
+-- INDEXES FOR SORTED LIST PAGES
+-- As in database.txt.  SQLite indexes also end with the rowid, which is the
+-- INTEGER PRIMARY KEY, so (col, pk) keyset pages are a range scan too.
+CREATE INDEX idx_disaster_type ON Disaster (D_type);
+CREATE INDEX idx_disaster_date ON Disaster (D_date);
+CREATE INDEX idx_camp_name ON Relief_Camp (Camp_Name);
+CREATE INDEX idx_camp_capacity ON Relief_Camp (Capacity);
+CREATE INDEX idx_victim_name ON Victim (Vic_name);
+CREATE INDEX idx_victim_dob ON Victim (DOB);
+CREATE INDEX idx_volunteer_name ON Volunteers (V_name);
+CREATE INDEX idx_volunteer_age ON Volunteers (Age);
+CREATE INDEX idx_resource_name ON Resources (R_name);
+CREATE INDEX idx_resource_type ON Resources (R_type);
+CREATE INDEX idx_resource_quantity ON Resources (Quantity);
+CREATE INDEX idx_team_name ON Rescue_Team (Team_name);
+CREATE INDEX idx_team_people ON Rescue_Team (No_of_People);
+CREATE INDEX idx_donor_name ON Donor (Donor_name);
+CREATE INDEX idx_donation_amount ON Donation (Amount);
+CREATE INDEX idx_donation_date ON Donation (Donation_date);
+
+
+-- FOREIGN KEY INDEXES
+-- InnoDB creates these with the foreign keys; cascades and the
+-- Donor/Resources delete checks would scan the child table without them.
+CREATE INDEX idx_disaster_location ON Disaster (Location_ID);
+CREATE INDEX idx_victim_camp ON Victim (Camp_ID);
+CREATE INDEX idx_team_disaster ON Rescue_Team (Disaster_ID);
+CREATE INDEX idx_donation_donor ON Donation (Donor_ID);
+CREATE INDEX idx_donation_resource ON Donation (Resource_ID);
+
+
+-- TABLE VERSIONS
+CREATE TABLE Table_Version (
+    Table_name VARCHAR(64) PRIMARY KEY COLLATE NOCASE,
+    Version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO Table_Version (Table_name) VALUES
+('Location'), ('Disaster'), ('Relief_Camp'), ('Victim'), ('Volunteers'),
+('Resources'), ('Rescue_Team'), ('Donor'), ('Donation'), ('Disaster_Delete_Log'),
+('Delete_Job'), ('Resource_Reservation'), ('Stock_Movement');
+
+
+-- RELIEF CAMP OCCUPANCY
+CREATE INDEX idx_victim_disaster_camp ON Victim (Disaster_ID, Camp_ID);
+
+CREATE TABLE Camp_Occupancy (
+    Camp_ID INTEGER PRIMARY KEY,
+    Occupied INT NOT NULL DEFAULT 0 CHECK (Occupied >= 0),
+    CONSTRAINT fk_Occupancy_Camp FOREIGN KEY (Camp_ID) REFERENCES Relief_Camp(Camp_ID) ON DELETE CASCADE
+);
+
+
+-- CHANGE FEED
+CREATE TABLE Change_Log (
+    Change_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Table_name VARCHAR(64) NOT NULL COLLATE NOCASE,
+    Row_ID INT NOT NULL,
+    Op CHAR(1) NOT NULL CHECK (Op IN ('I', 'U', 'D')),
+    Amount_Delta DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Changed_At DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX idx_change_log_time ON Change_Log (Changed_At);
+
+
+-- REPORTING ROLLUPS
+CREATE TABLE Donation_By_Donor (
+    Donor_ID INTEGER PRIMARY KEY,
+    Donations INT NOT NULL DEFAULT 0,
+    Total DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE INDEX idx_donation_by_donor_total ON Donation_By_Donor (Total);
+
+CREATE TABLE Donation_By_Resource (
+    Resource_ID INTEGER PRIMARY KEY,
+    Donations INT NOT NULL DEFAULT 0,
+    Total DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE Donation_By_Month (
+    Month DATE NOT NULL PRIMARY KEY,  -- first day of the month
+    Donations INT NOT NULL DEFAULT 0,
+    Total DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE Victim_By_Disaster (
+    Disaster_ID INTEGER PRIMARY KEY,
+    Victims INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE Victim_By_Age_Band (
+    Band VARCHAR(8) NOT NULL PRIMARY KEY,
+    Victims INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE Rescue_By_Disaster_Type (
+    Disaster_ID INT NOT NULL,
+    Team_type VARCHAR(50) NOT NULL COLLATE NOCASE,
+    Teams INT NOT NULL DEFAULT 0,
+    People INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Disaster_ID, Team_type)
+);
+
+
+-- BACKGROUND DELETES
+CREATE TABLE Delete_Job (
+    Job_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Table_name VARCHAR(64) NOT NULL COLLATE NOCASE,
+    Row_ID INT NOT NULL,
+    Status VARCHAR(10) NOT NULL DEFAULT 'queued' CHECK (Status IN ('queued','running','done','failed')),
+    Total INT NOT NULL DEFAULT 0,
+    Deleted INT NOT NULL DEFAULT 0,
+    Worker VARCHAR(100),
+    Error VARCHAR(500),
+    Created_At DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    Updated_At DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX idx_delete_job_status ON Delete_Job (Status, Updated_At);
+CREATE INDEX idx_delete_job_row ON Delete_Job (Table_name, Row_ID);
+
+
+-- FIELD SYNC JOURNAL
+CREATE TABLE Sync_Operation (
+    Client_ID VARCHAR(64) NOT NULL,
+    Op_Key VARCHAR(100) NOT NULL,
+    Resource VARCHAR(64) NOT NULL,
+    Row_ID INT,
+    Status SMALLINT NOT NULL,
+    Applied_At DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    PRIMARY KEY (Client_ID, Op_Key)
+);
+
+CREATE INDEX idx_sync_operation_applied ON Sync_Operation (Applied_At);
+
+
+-- RETENTION
+CREATE INDEX idx_delete_log_deleted_at ON Disaster_Delete_Log (Deleted_At);
+
+
+-- RESOURCE INVENTORY
+CREATE TABLE Resource_Reservation (
+    Reservation_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Resource_ID INT NOT NULL,
+    Quantity INT NOT NULL CHECK (Quantity > 0),
+    Status VARCHAR(10) NOT NULL DEFAULT 'held' CHECK (Status IN ('held','dispatched','released')),
+    Reference VARCHAR(100),
+    Created_At DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    Updated_At DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    CONSTRAINT fk_Reservation_Resource FOREIGN KEY (Resource_ID) REFERENCES Resources(Resource_ID) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_reservation_resource ON Resource_Reservation (Resource_ID, Status);
+
+CREATE TABLE Stock_Movement (
+    Movement_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Resource_ID INT NOT NULL,
+    Kind VARCHAR(10) NOT NULL CHECK (Kind IN ('receive','adjust','reserve','release','dispatch')),
+    Quantity_Change INT NOT NULL,
+    Reserved_Change INT NOT NULL,
+    Reservation_ID INT,
+    Reference VARCHAR(100),
+    Created_At DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX idx_movement_resource ON Stock_Movement (Resource_ID, Movement_ID);
+
+
+-- TRIGGERS
+-- Same names and behaviour as in database.txt unless noted.
+
+-- No other trigger is fired by an update of Age alone, so the UPDATE in
+-- this trigger and in trg_victim_rollup_update sets Age and nothing more.
+CREATE TRIGGER trg_victim_age_insert
+AFTER INSERT ON Victim
+BEGIN
+    UPDATE Victim SET Age = age_years(NEW.DOB) WHERE Victim_ID = NEW.Victim_ID;
+END;
+
+CREATE TRIGGER trg_donation_before_insert
+BEFORE INSERT ON Donation
+WHEN NEW.Amount IS NULL
+BEGIN
+    SELECT RAISE(ABORT, 'Donation amount cannot be NULL');
+END;
+
+CREATE TRIGGER trg_donation_before_update
+BEFORE UPDATE ON Donation
+WHEN NEW.Amount IS NULL
+BEGIN
+    SELECT RAISE(ABORT, 'Donation amount cannot be NULL');
+END;
+
+CREATE TRIGGER trg_disaster_before_delete
+BEFORE DELETE ON Disaster
+BEGIN
+    INSERT INTO Disaster_Delete_Log (Disaster_ID, D_type, D_date, D_time, Location_ID)
+    VALUES (OLD.Disaster_ID, OLD.D_type, OLD.D_date, OLD.D_time, OLD.Location_ID);
+END;
+
+CREATE TRIGGER trg_camp_after_insert
+AFTER INSERT ON Relief_Camp
+BEGIN
+    INSERT INTO Camp_Occupancy (Camp_ID, Occupied) VALUES (NEW.Camp_ID, 0);
+END;
+
+CREATE TRIGGER trg_camp_before_update
+BEFORE UPDATE OF Capacity ON Relief_Camp
+WHEN NEW.Capacity < (SELECT Occupied FROM Camp_Occupancy WHERE Camp_ID = OLD.Camp_ID)
+BEGIN
+    SELECT RAISE(ABORT, 'Capacity cannot be lower than the number of victims already in the camp');
+END;
+
+-- Writers hold the whole database (BEGIN IMMEDIATE, see sqlite_db.py), so
+-- checking for a free bed and then taking it cannot race.
+CREATE TRIGGER trg_victim_after_insert
+AFTER INSERT ON Victim
+WHEN NEW.Camp_ID IS NOT NULL
+BEGIN
+    SELECT RAISE(ABORT, 'Relief camp is full')
+    WHERE NOT EXISTS (SELECT 1 FROM Camp_Occupancy o JOIN Relief_Camp c ON c.Camp_ID = o.Camp_ID
+                      WHERE o.Camp_ID = NEW.Camp_ID AND o.Occupied < c.Capacity);
+    UPDATE Camp_Occupancy SET Occupied = Occupied + 1 WHERE Camp_ID = NEW.Camp_ID;
+END;
+
+-- Also fires for ON DELETE SET NULL when a camp is deleted.
+CREATE TRIGGER trg_victim_after_update
+AFTER UPDATE OF Camp_ID ON Victim
+WHEN NEW.Camp_ID IS NOT OLD.Camp_ID
+BEGIN
+    UPDATE Camp_Occupancy SET Occupied = Occupied - 1 WHERE Camp_ID = OLD.Camp_ID;
+    SELECT RAISE(ABORT, 'Relief camp is full')
+    WHERE NEW.Camp_ID IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM Camp_Occupancy o JOIN Relief_Camp c ON c.Camp_ID = o.Camp_ID
+                      WHERE o.Camp_ID = NEW.Camp_ID AND o.Occupied < c.Capacity);
+    UPDATE Camp_Occupancy SET Occupied = Occupied + 1 WHERE Camp_ID = NEW.Camp_ID;
+END;
+
+-- Also fires for victims removed by ON DELETE CASCADE.
+CREATE TRIGGER trg_victim_after_delete
+AFTER DELETE ON Victim
+WHEN OLD.Camp_ID IS NOT NULL
+BEGIN
+    UPDATE Camp_Occupancy SET Occupied = Occupied - 1 WHERE Camp_ID = OLD.Camp_ID;
+END;
+
+CREATE TRIGGER trg_donation_after_insert
+AFTER INSERT ON Donation
+BEGIN
+    INSERT INTO Change_Log (Table_name, Row_ID, Op, Amount_Delta)
+    VALUES ('Donation', NEW.Donation_ID, 'I', NEW.Amount);
+END;
+
+CREATE TRIGGER trg_donation_after_update
+AFTER UPDATE ON Donation
+BEGIN
+    INSERT INTO Change_Log (Table_name, Row_ID, Op, Amount_Delta)
+    VALUES ('Donation', NEW.Donation_ID, 'U', NEW.Amount - OLD.Amount);
+END;
+
+CREATE TRIGGER trg_donation_after_delete
+AFTER DELETE ON Donation
+BEGIN
+    INSERT INTO Change_Log (Table_name, Row_ID, Op, Amount_Delta)
+    VALUES ('Donation', OLD.Donation_ID, 'D', -OLD.Amount);
+END;
+
+CREATE TRIGGER trg_donation_rollup_insert
+AFTER INSERT ON Donation
+BEGIN
+    INSERT INTO Donation_By_Donor (Donor_ID, Donations, Total) VALUES (NEW.Donor_ID, 1, NEW.Amount)
+        ON CONFLICT (Donor_ID) DO UPDATE SET Donations = Donations + 1, Total = Total + NEW.Amount;
+    INSERT INTO Donation_By_Resource (Resource_ID, Donations, Total) VALUES (NEW.Resource_ID, 1, NEW.Amount)
+        ON CONFLICT (Resource_ID) DO UPDATE SET Donations = Donations + 1, Total = Total + NEW.Amount;
+    INSERT INTO Donation_By_Month (Month, Donations, Total)
+        VALUES (strftime('%Y-%m-01', NEW.Donation_date), 1, NEW.Amount)
+        ON CONFLICT (Month) DO UPDATE SET Donations = Donations + 1, Total = Total + NEW.Amount;
+END;
+
+CREATE TRIGGER trg_donation_rollup_update
+AFTER UPDATE ON Donation
+BEGIN
+    UPDATE Donation_By_Donor SET Donations = Donations - 1, Total = Total - OLD.Amount WHERE Donor_ID = OLD.Donor_ID;
+    UPDATE Donation_By_Resource SET Donations = Donations - 1, Total = Total - OLD.Amount WHERE Resource_ID = OLD.Resource_ID;
+    UPDATE Donation_By_Month SET Donations = Donations - 1, Total = Total - OLD.Amount
+        WHERE Month = strftime('%Y-%m-01', OLD.Donation_date);
+    INSERT INTO Donation_By_Donor (Donor_ID, Donations, Total) VALUES (NEW.Donor_ID, 1, NEW.Amount)
+        ON CONFLICT (Donor_ID) DO UPDATE SET Donations = Donations + 1, Total = Total + NEW.Amount;
+    INSERT INTO Donation_By_Resource (Resource_ID, Donations, Total) VALUES (NEW.Resource_ID, 1, NEW.Amount)
+        ON CONFLICT (Resource_ID) DO UPDATE SET Donations = Donations + 1, Total = Total + NEW.Amount;
+    INSERT INTO Donation_By_Month (Month, Donations, Total)
+        VALUES (strftime('%Y-%m-01', NEW.Donation_date), 1, NEW.Amount)
+        ON CONFLICT (Month) DO UPDATE SET Donations = Donations + 1, Total = Total + NEW.Amount;
+END;
+
+CREATE TRIGGER trg_donation_rollup_delete
+AFTER DELETE ON Donation
+BEGIN
+    UPDATE Donation_By_Donor SET Donations = Donations - 1, Total = Total - OLD.Amount WHERE Donor_ID = OLD.Donor_ID;
+    UPDATE Donation_By_Resource SET Donations = Donations - 1, Total = Total - OLD.Amount WHERE Resource_ID = OLD.Resource_ID;
+    UPDATE Donation_By_Month SET Donations = Donations - 1, Total = Total - OLD.Amount
+        WHERE Month = strftime('%Y-%m-01', OLD.Donation_date);
+END;
+
+-- NEW.Age is not set yet when AFTER triggers on Victim run, so the band is
+-- computed from DOB.
+CREATE TRIGGER trg_victim_rollup_insert
+AFTER INSERT ON Victim
+BEGIN
+    INSERT INTO Victim_By_Disaster (Disaster_ID, Victims) VALUES (NEW.Disaster_ID, 1)
+        ON CONFLICT (Disaster_ID) DO UPDATE SET Victims = Victims + 1;
+    INSERT INTO Victim_By_Age_Band (Band, Victims) VALUES (age_band(age_years(NEW.DOB)), 1)
+        ON CONFLICT (Band) DO UPDATE SET Victims = Victims + 1;
+END;
+
+-- Also takes the place of trg_victim_before_update: the rollups move from
+-- the stored Age to the one computed now, then Age is stored.
+CREATE TRIGGER trg_victim_rollup_update
+AFTER UPDATE OF Vic_name, DOB, Contact, Disaster_ID, Camp_ID ON Victim
+BEGIN
+    UPDATE Victim_By_Disaster SET Victims = Victims - 1
+        WHERE Disaster_ID = OLD.Disaster_ID AND NEW.Disaster_ID <> OLD.Disaster_ID;
+    INSERT INTO Victim_By_Disaster (Disaster_ID, Victims)
+        SELECT NEW.Disaster_ID, 1 WHERE NEW.Disaster_ID <> OLD.Disaster_ID
+        ON CONFLICT (Disaster_ID) DO UPDATE SET Victims = Victims + 1;
+    UPDATE Victim_By_Age_Band SET Victims = Victims - 1
+        WHERE Band = age_band(OLD.Age) AND age_band(age_years(NEW.DOB)) <> age_band(OLD.Age);
+    INSERT INTO Victim_By_Age_Band (Band, Victims)
+        SELECT age_band(age_years(NEW.DOB)), 1 WHERE age_band(age_years(NEW.DOB)) <> age_band(OLD.Age)
+        ON CONFLICT (Band) DO UPDATE SET Victims = Victims + 1;
+    UPDATE Victim SET Age = age_years(NEW.DOB) WHERE Victim_ID = NEW.Victim_ID;
+END;
+
+-- Also fires for victims removed by ON DELETE CASCADE.
+CREATE TRIGGER trg_victim_rollup_delete
+AFTER DELETE ON Victim
+BEGIN
+    UPDATE Victim_By_Disaster SET Victims = Victims - 1 WHERE Disaster_ID = OLD.Disaster_ID;
+    UPDATE Victim_By_Age_Band SET Victims = Victims - 1 WHERE Band = age_band(OLD.Age);
+END;
+
+-- The rest of trg_disaster_before_delete_rollup.
+CREATE TRIGGER trg_disaster_after_delete_rollup
+AFTER DELETE ON Disaster
+BEGIN
+    DELETE FROM Victim_By_Disaster WHERE Disaster_ID = OLD.Disaster_ID;
+END;
+
+CREATE TRIGGER trg_team_rollup_insert
+AFTER INSERT ON Rescue_Team
+BEGIN
+    INSERT INTO Rescue_By_Disaster_Type (Disaster_ID, Team_type, Teams, People)
+        VALUES (NEW.Disaster_ID, IFNULL(NEW.Team_type, 'Unknown'), 1, NEW.No_of_People)
+        ON CONFLICT (Disaster_ID, Team_type) DO UPDATE SET Teams = Teams + 1, People = People + NEW.No_of_People;
+END;
+
+CREATE TRIGGER trg_team_rollup_update
+AFTER UPDATE ON Rescue_Team
+BEGIN
+    UPDATE Rescue_By_Disaster_Type SET Teams = Teams - 1, People = People - OLD.No_of_People
+        WHERE Disaster_ID = OLD.Disaster_ID AND Team_type = IFNULL(OLD.Team_type, 'Unknown');
+    INSERT INTO Rescue_By_Disaster_Type (Disaster_ID, Team_type, Teams, People)
+        VALUES (NEW.Disaster_ID, IFNULL(NEW.Team_type, 'Unknown'), 1, NEW.No_of_People)
+        ON CONFLICT (Disaster_ID, Team_type) DO UPDATE SET Teams = Teams + 1, People = People + NEW.No_of_People;
+END;
+
+CREATE TRIGGER trg_team_rollup_delete
+AFTER DELETE ON Rescue_Team
+BEGIN
+    UPDATE Rescue_By_Disaster_Type SET Teams = Teams - 1, People = People - OLD.No_of_People
+        WHERE Disaster_ID = OLD.Disaster_ID AND Team_type = IFNULL(OLD.Team_type, 'Unknown');
+END;
+
+CREATE TRIGGER trg_resources_after_insert
+AFTER INSERT ON Resources
+BEGIN
+    INSERT INTO Stock_Movement (Resource_ID, Kind, Quantity_Change, Reserved_Change, Reference)
+    VALUES (NEW.Resource_ID, 'receive', NEW.Quantity, 0, 'opening stock');
+END;
+
+CREATE TRIGGER trg_resources_before_update
+BEFORE UPDATE ON Resources
+WHEN (NEW.Quantity <> OLD.Quantity OR NEW.Reserved <> OLD.Reserved)
+     AND NEW.Stock_Version <> OLD.Stock_Version + 1
+BEGIN
+    SELECT RAISE(ABORT, 'Stock has changed since this was loaded; quantities only change through the inventory');
+END;
+
+CREATE TRIGGER trg_resources_before_delete
+BEFORE DELETE ON Resources
+WHEN OLD.Reserved > 0
+BEGIN
+    SELECT RAISE(ABORT, 'Resource has stock reserved; release or dispatch its reservations first');
+END;
+
+CREATE TRIGGER trg_stock_movement_before_update
+BEFORE UPDATE ON Stock_Movement
+BEGIN
+    SELECT RAISE(ABORT, 'Stock_Movement is append-only');
+END;
+
+CREATE TRIGGER trg_stock_movement_before_delete
+BEFORE DELETE ON Stock_Movement
+BEGIN
+    SELECT RAISE(ABORT, 'Stock_Movement is append-only');
+END;
+
+
+-- SEED DATA (as in database.txt)
+INSERT INTO Location VALUES
+(1, 'Mumbai', 'Mumbai Suburban', 'Maharashtra'),
+(2, 'Chennai', 'Chennai', 'Tamil Nadu'),
+(3, 'Kolkata', 'Kolkata', 'West Bengal'),
+(4, 'Guwahati', 'Kamrup', 'Assam'),
+(5, 'Dehradun', 'Dehradun', 'Uttarakhand'),
+(6, 'Shimla', 'Shimla', 'Himachal Pradesh'),
+(7, 'Bhubaneswar', 'Khordha', 'Odisha'),
+(8, 'Hyderabad', 'Hyderabad', 'Telangana');
+
+INSERT INTO Disaster VALUES
+(101, 'Flood', '2025-07-15', '10:30:00', 1),
+(102, 'Cyclone', '2025-11-05', '16:00:00', 2),
+(103, 'Earthquake', '2025-02-20', '05:15:00', 3),
+(104, 'Landslide', '2025-08-12', '09:45:00', 5),
+(105, 'Fire', '2025-04-03', '22:10:00', 8),
+(106, 'Flood', '2025-06-28', '14:20:00', 4),
+(107, 'Cyclone', '2025-10-19', '18:40:00', 7),
+(108, 'Other', '2025-01-12', '11:00:00', 6);
+
+INSERT INTO Relief_Camp VALUES
+(201, 'Andheri Sports Complex Camp', 'Andheri, Mumbai', 500, 'Rajesh Kumar'),
+(202, 'Marina Shelter', 'Marina Beach, Chennai', 300, 'Priya Iyer'),
+(203, 'Salt Lake Camp', 'Salt Lake, Kolkata', 400, 'Anirban Ghosh'),
+(204, 'Nehru Ground Shelter', 'Dispur, Guwahati', 250, 'Rakesh Das'),
+(205, 'Forest Colony Camp', 'Rajpur Road, Dehradun', 200, 'Seema Rawat'),
+(206, 'Shimla School Camp', 'Lakkar Bazar, Shimla', 150, 'Ankita Sharma'),
+(207, 'Bhubaneswar Relief Center', 'Saheed Nagar, Bhubaneswar', 350, 'Bikram Mohanty'),
+(208, 'Secunderabad Shelter', 'Secunderabad, Hyderabad', 280, 'Sunil Reddy');
+
+INSERT INTO Victim VALUES
+(301, 'Amit Sharma', '1985-05-12', 39, '9876543210', 101, 201),
+(302, 'Lakshmi Nair', '1990-11-23', 34, '9876543211', 102, 202),
+(303, 'Ravi Das', '1978-02-14', 46, '9876543212', 103, 203),
+(304, 'Pooja Singh', '2001-07-30', 23, '9876543213', 104, 205),
+(305, 'Suresh Reddy', '1995-09-19', 29, '9876543214', 105, 208),
+(306, 'Ananya Sen', '1988-03-10', 36, '9876543215', 103, 203),
+(307, 'Rohit Mehta', '2000-12-05', 24, '9876543216', 107, 207),
+(308, 'Farhan Ali', '1983-06-22', 41, '9876543217', 106, 204);
+
+INSERT INTO Volunteers VALUES
+(401, 'Karan Malhotra', 28, 'Male', '9000000001'),
+(402, 'Sneha Verma', 25, 'Female', '9000000002'),
+(403, 'Arjun Das', 32, 'Male', '9000000003'),
+(404, 'Meera Pillai', 29, 'Female', '9000000004'),
+(405, 'Rakesh Yadav', 35, 'Male', '9000000005'),
+(406, 'Shalini Rao', 27, 'Female', '9000000006'),
+(407, 'Vikram Singh', 30, 'Male', '9000000007'),
+(408, 'Nisha Khan', 26, 'Female', '9000000008');
+
+INSERT INTO Resources (Resource_ID, R_name, R_type, Quantity) VALUES
+(501, 'Rice Bags', 'Food', 200),
+(502, 'Blankets', 'Clothing', 150),
+(503, 'Medicines', 'Medical', 300),
+(504, 'Drinking Water', 'Essential', 500),
+(505, 'Tents', 'Shelter', 100),
+(506, 'First Aid Kits', 'Medical', 120),
+(507, 'Clothes', 'Clothing', 250),
+(508, 'Milk Packets', 'Food', 180);
+
+INSERT INTO Rescue_Team VALUES
+(601, 'Mumbai Medical Squad', 'Medical', 20, 101),
+(602, 'Chennai Cyclone Rescuers', 'Rescue', 30, 102),
+(603, 'Kolkata Earthquake Relief', 'Army', 50, 103),
+(604, 'Dehradun Hill Rescuers', 'Rescue', 15, 104),
+(605, 'Hyderabad Fire Fighters', 'Fire', 25, 105),
+(606, 'Assam Flood Rescue Team', 'Rescue', 18, 106),
+(607, 'Odisha Cyclone Relief Force', 'Army', 40, 107),
+(608, 'Shimla Emergency Unit', 'Other', 10, 108);
+
+INSERT INTO Donor VALUES
+(701, 'Reliance Foundation', '9111000001'),
+(702, 'Infosys Trust', '9111000002'),
+(703, 'Rotary Club', '9111000003'),
+(704, 'Azim Premji Philanthropy', '9111000004'),
+(705, 'HDFC Bank CSR', '9111000005'),
+(706, 'Adani Foundation', '9111000006'),
+(707, 'Red Cross India', '9111000007'),
+(708, 'Tata Trusts', '9111000008');
+
+INSERT INTO Donation VALUES
+(801, 701, 500000.00, '2024-07-16', 501),
+(802, 702, 300000.00, '2024-11-06', 503),
+(803, 703, 200000.00, '2023-02-21', 502),
+(804, 704, 800000.00, '2023-08-13', 505),
+(805, 705, 1000000.00, '2024-04-04', 504),
+(806, 706, 250000.00, '2022-06-29', 507),
+(807, 707, 150000.00, '2023-10-20', 506),
+(808, 708, 1200000.00, '2024-01-13', 508);
+
+-- The seed donations are history, not live changes.
+DELETE FROM Change_Log;
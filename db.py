@@ -0,0 +1,636 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, has_request_context, session
+
+from config import Config
+
+_driver = None
+
+def driver():
+    """The DB-API module of Config.DB_BACKEND, imported on first use rather
+    than with this module, so factory.configure() can still choose it."""
+    global _driver
+    if _driver is None:
+        if Config.DB_BACKEND == 'mysql':
+            import MySQLdb
+            import MySQLdb.cursors
+            _driver = MySQLdb
+        elif Config.DB_BACKEND == 'sqlite':
+            import sqlite_db
+            _driver = sqlite_db
+        else:
+            raise ValueError('Unknown DB_BACKEND %r' % Config.DB_BACKEND)
+    return _driver
+
+
+def __getattr__(name):
+    # db.DatabaseError, db.IntegrityError, db.OperationalError are the
+    # driver's; sqlite_db raises them with MySQL's error codes.
+    if name in ('DatabaseError', 'IntegrityError', 'OperationalError'):
+        return getattr(driver(), name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """A bounded pool of MySQL connections shared by all request threads.
+
+    Connections are validated with ping() when they have sat idle longer than
+    ping_interval, replaced once they are older than recycle seconds, and
+    closed when idle longer than idle_timeout (down to min_size).  Checkout
+    blocks for at most timeout seconds once max_size connections are in use.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10, recycle=3600,
+                 idle_timeout=300, ping_interval=30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self._idle = []  # (conn, released_at), most recently used last
+        self._created_at = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._warm = False
+        self._stats = dict(checkouts=0, waits=0, wait_time=0.0, max_wait=0.0, timeouts=0,
+                           created=0, closed=0, recycled=0, failed_pings=0)
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats['created'] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+
+    def _prefill(self):
+        with self._cond:
+            if self._warm:
+                return
+            self._warm = True
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        for _ in range(missing):
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self):
+        if not self._warm:
+            self._prefill()
+        deadline = None
+        waited_from = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = released_at = None
+                    break
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.timeout
+                    waited_from = now
+                    self._stats['waits'] += 1
+                if now >= deadline:
+                    self._stats['timeouts'] += 1
+                    self._stats['wait_time'] += now - waited_from
+                    raise PoolTimeout('No database connection free after %ss' % self.timeout)
+                self._cond.wait(deadline - now)
+            if waited_from is not None:
+                waited = time.monotonic() - waited_from
+                self._stats['wait_time'] += waited
+                self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+            self._stats['checkouts'] += 1
+
+        if conn is None:
+            try:
+                return self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        return self._validate(conn, released_at)
+
+    def _validate(self, conn, released_at):
+        now = time.monotonic()
+        if self.recycle and now - self._created_at.get(id(conn), now) > self.recycle:
+            with self._cond:
+                self._stats['recycled'] += 1
+            return self._replace(conn)
+        if self.ping_interval is not None and now - released_at >= self.ping_interval:
+            try:
+                conn.ping()
+            except Exception:
+                with self._cond:
+                    self._stats['failed_pings'] += 1
+                return self._replace(conn)
+        return conn
+
+    def _replace(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+            self._stats['closed'] += 1
+        try:
+            return self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                # Never hand the next request an open transaction or an old snapshot.
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._close(conn)
+            return
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            self._idle.append((conn, now))
+            if self.idle_timeout:
+                while len(self._idle) > 1 and self._size - len(expired) > self.min_size \
+                        and now - self._idle[0][1] > self.idle_timeout:
+                    expired.append(self._idle.pop(0)[0])
+            self._cond.notify()
+        for old in expired:
+            self._close(old)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self._size, idle=len(self._idle), in_use=self._size - len(self._idle),
+                         min_size=self.min_size, max_size=self.max_size)
+        return stats
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+def mysql_connect(host=None, port=None):
+    return driver().connect(host=host or Config.MYSQL_HOST, port=port or Config.MYSQL_PORT, user=Config.MYSQL_USER,
+                           passwd=Config.MYSQL_PASSWORD, db=Config.MYSQL_DB, charset='utf8mb4')
+
+
+def connect():
+    """A new primary connection for the configured backend."""
+    if Config.DB_BACKEND == 'sqlite':
+        return driver().connect()
+    return mysql_connect()
+
+
+def make_pool(connect):
+    return ConnectionPool(
+        connect,
+        min_size=Config.DB_POOL_MIN_SIZE,
+        max_size=Config.DB_POOL_MAX_SIZE,
+        timeout=Config.DB_POOL_TIMEOUT,
+        recycle=Config.DB_POOL_RECYCLE,
+        idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+        ping_interval=Config.DB_POOL_PING_INTERVAL,
+    )
+
+
+pool = make_pool(connect)
+
+
+# --- READ REPLICAS ---
+
+# Client errors meaning the server could not be reached, not that the query was wrong.
+CONNECTION_ERRORS = {2002, 2003, 2006, 2013}
+
+
+def replication_lag(conn):
+    """Seconds the server is behind its source, or None if it is not
+    replicating (no replica status, or the SQL thread is stopped)."""
+    cur = conn.cursor(driver().cursors.DictCursor)
+    try:
+        try:
+            cur.execute("SHOW REPLICA STATUS")
+        except driver().ProgrammingError:
+            cur.execute("SHOW SLAVE STATUS")  # MySQL before 8.0.22
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    if not row:
+        return None
+    return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+
+class Replica:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.pool = make_pool(lambda: mysql_connect(host, port))
+        self.down_until = 0.0
+        self.checked_at = 0.0
+        self.lag = None
+        self.error = None
+
+    @property
+    def name(self):
+        return '%s:%s' % (self.host, self.port)
+
+
+class ReplicaSet:
+    """The read replicas behind fetch_all/fetch_one.
+
+    Reads go to the healthy replica with the fewest connections in use.  A
+    replica that refuses connections, drops one mid-query, stops replicating
+    or falls more than max_lag seconds behind is skipped for retry seconds;
+    with no healthy replica left, reads go to the primary.  Lag is checked
+    on checkout at most every check_interval seconds per replica.
+    """
+
+    def __init__(self, replicas, max_lag=10, check_interval=5, retry=30):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry = retry
+
+    def mark_down(self, replica, error):
+        replica.down_until = time.monotonic() + self.retry
+        replica.error = str(error)
+
+    def check(self, replica, conn):
+        """Refresh the replica's lag; False (and marked down) if it is unusable."""
+        try:
+            lag = replication_lag(conn)
+        except driver().DatabaseError as e:
+            self.mark_down(replica, e)
+            return False
+        replica.lag = lag
+        replica.checked_at = time.monotonic()
+        if lag is None or lag > self.max_lag:
+            self.mark_down(replica, 'not replicating' if lag is None else '%ss behind the primary' % lag)
+            return False
+        replica.error = None
+        return True
+
+    def acquire(self):
+        """(replica, connection) from the least busy healthy replica, or (None, None)."""
+        now = time.monotonic()
+        candidates = sorted((r for r in self.replicas if r.down_until <= now),
+                            key=lambda r: r.pool.stats()['in_use'])
+        for replica in candidates:
+            try:
+                conn = replica.pool.acquire()
+            except PoolTimeout:
+                continue
+            except Exception as e:
+                self.mark_down(replica, e)
+                continue
+            if now - replica.checked_at >= self.check_interval and not self.check(replica, conn):
+                replica.pool.release(conn)
+                continue
+            return replica, conn
+        return None, None
+
+    def stats(self):
+        now = time.monotonic()
+        return [dict(r.pool.stats(), replica=r.name, healthy=r.down_until <= now, lag=r.lag, error=r.error)
+                for r in self.replicas]
+
+
+# An embedded database has no replicas.
+replicas = ReplicaSet([Replica(host, port) for host, port in Config.MYSQL_REPLICAS
+                       if Config.DB_BACKEND == 'mysql'],
+                      max_lag=Config.REPLICA_MAX_LAG, check_interval=Config.REPLICA_CHECK_INTERVAL,
+                      retry=Config.REPLICA_RETRY)
+
+
+# --- READ-YOUR-WRITES ---
+
+def note_write(conn):
+    """After a commit, pin this request's reads to the primary, and this
+    session's for READ_YOUR_WRITES_SECONDS (so the redirect after a form
+    post shows the change).  With REPLICA_GTID_WAIT the session also keeps
+    the primary's GTID set, so a replica that has caught up can serve it."""
+    if not replicas.replicas or not has_app_context():
+        return
+    g._read_primary = True
+    if not has_request_context():
+        return
+    gtid = None
+    if Config.REPLICA_GTID_WAIT:
+        cur = conn.cursor()
+        cur.execute("SELECT @@GLOBAL.gtid_executed")
+        gtid = cur.fetchone()[0]
+        cur.close()
+    session['_db_written'] = [time.time() + Config.READ_YOUR_WRITES_SECONDS, gtid]
+
+def recent_write():
+    """(until, gtid) of this session's last write if it is still recent."""
+    if not has_request_context():
+        return None
+    written = session.get('_db_written')
+    if not written:
+        return None
+    if written[0] < time.time():
+        session.pop('_db_written')
+        return None
+    return written
+
+def caught_up(conn, gtid):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT WAIT_FOR_EXECUTED_GTID_SET(%s, %s)", (gtid, Config.REPLICA_GTID_WAIT))
+        return cur.fetchone()[0] == 0
+    except driver().DatabaseError:
+        return False
+    finally:
+        cur.close()
+
+def acquire_replica():
+    """(replica, connection) to read from, or (None, None) for the primary."""
+    written = recent_write()
+    if written and not (Config.REPLICA_GTID_WAIT and written[1]):
+        return None, None
+    replica, conn = replicas.acquire()
+    if conn is not None and written and not caught_up(conn, written[1]):
+        replica.pool.release(conn)
+        return None, None
+    return replica, conn
+
+
+# --- REQUEST CONNECTIONS ---
+
+def get_connection():
+    # One pooled primary connection per app context, checked out on first use.
+    if '_db_conn' not in g:
+        g._db_conn = pool.acquire()
+    return g._db_conn
+
+
+def discard_connection():
+    """Close the app context's primary connection instead of pooling it
+    again, after an error that may have left it unusable; closing also
+    rolls back its open transaction.  The next get_connection() checks out
+    another one."""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        pool.release(conn, discard=True)
+
+
+def get_read_connection():
+    """The app context's connection for reads: a replica when one is
+    healthy and this session has not just written, else the primary."""
+    if not replicas.replicas or g.get('_read_primary'):
+        return get_connection()
+    if '_db_replica' not in g:
+        replica, conn = acquire_replica()
+        if conn is None:
+            g._read_primary = True
+            return get_connection()
+        g._db_replica = (replica, conn)
+    return g._db_replica[1]
+
+
+def drop_replica(error):
+    # The replica went away mid-request: finish the request on the primary.
+    replica, conn = g.pop('_db_replica')
+    replicas.mark_down(replica, error)
+    replica.pool.release(conn, discard=True)
+    g._read_primary = True
+
+
+def release_connection(exc=None):
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        pool.release(conn)
+    replica = g.pop('_db_replica', None)
+    if replica is not None:
+        replica[0].pool.release(replica[1])
+
+
+def init_app(app):
+    app.teardown_appcontext(release_connection)
+
+
+# --- WRITE TRACKING ---
+
+WRITE_RE = re.compile(r'^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)', re.IGNORECASE)
+
+# Writes to the key table also change these tables through ON DELETE
+# CASCADE / SET NULL and trg_disaster_before_delete.
+CASCADES = {
+    'Disaster': ['Victim', 'Disaster_Delete_Log'],
+    'Relief_Camp': ['Victim'],
+}
+
+write_listeners = []
+
+def written_table(query):
+    match = WRITE_RE.match(query)
+    return match.group(1) if match else None
+
+def affected_tables(table):
+    return [table] + CASCADES.get(table, [])
+
+def on_write(listener):
+    write_listeners.append(listener)
+    return listener
+
+def notify_write(table):
+    for affected in affected_tables(table):
+        for listener in write_listeners:
+            listener(affected)
+
+def version_bump(*tables):
+    tables = sorted({affected for table in tables for affected in affected_tables(table)})
+    return ("UPDATE Table_Version SET Version = Version + 1 WHERE Table_name IN (%s)"
+            % ','.join(['%s'] * len(tables)), tables)
+
+def bump_versions(cur, *tables):
+    # Runs inside the writing transaction, so a table's version changes
+    # exactly when its committed contents do.
+    cur.execute(*version_bump(*tables))
+
+def table_version(table):
+    row = fetch_one("SELECT Version FROM Table_Version WHERE Table_name=%s", (table,))
+    return row[0] if row else 0
+
+def table_versions(tables):
+    rows = fetch_all("SELECT Table_name, Version FROM Table_Version WHERE Table_name IN (%s)"
+                     % ','.join(['%s'] * len(tables)), tuple(tables))
+    return dict(rows)
+
+
+# --- INSTRUMENTATION ---
+
+query_listeners = []
+commit_listeners = []
+
+def on_query(listener):
+    """listener(conn, query, args, seconds, rows) runs after every query made
+    through the helpers below (for iter_rows(), when the stream ends) and the
+    async ones in aiodb, with conn=None."""
+    query_listeners.append(listener)
+    return listener
+
+def on_commit(listener):
+    commit_listeners.append(listener)
+    return listener
+
+def _timed(conn, cur, query, args, fetch=None):
+    start = time.perf_counter()
+    cur.execute(query, args)
+    if fetch == 'all':
+        result = cur.fetchall()
+        rows = len(result)
+    elif fetch == 'one':
+        result = cur.fetchone()
+        rows = 0 if result is None else 1
+    else:
+        result, rows = None, max(cur.rowcount, 0)
+    elapsed = time.perf_counter() - start
+    for listener in query_listeners:
+        listener(conn, query, args, elapsed, rows)
+    return result
+
+def commit(conn):
+    start = time.perf_counter()
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    for listener in commit_listeners:
+        listener(elapsed)
+    note_write(conn)
+
+
+# --- QUERY HELPERS ---
+
+def _read(query, args, fetch):
+    conn = get_read_connection()
+    cur = conn.cursor()
+    try:
+        result = _timed(conn, cur, query, args, fetch)
+    except driver().OperationalError as e:
+        replica = g.get('_db_replica')
+        if replica is None or replica[1] is not conn or e.args[0] not in CONNECTION_ERRORS:
+            raise
+        drop_replica(e)
+        return _read(query, args, fetch)
+    cur.close()
+    return result
+
+def fetch_all(query, args=None):
+    return _read(query, args or (), 'all')
+
+def fetch_one(query, args):
+    return _read(query, args, 'one')
+
+def write(conn, query, args):
+    """Run one write on conn and commit it, bumping the written table's
+    version; returns (rowcount, lastrowid)."""
+    cur = conn.cursor()
+    _timed(conn, cur, query, args)
+    rowcount, lastrowid = cur.rowcount, cur.lastrowid
+    table = written_table(query)
+    if table and rowcount:
+        bump_versions(cur, table)
+    commit(conn)
+    cur.close()
+    if table and rowcount:
+        notify_write(table)
+    return rowcount, lastrowid
+
+def _execute_write(query, args):
+    return write(get_connection(), query, args)
+
+def execute_commit(query, args):
+    return _execute_write(query, args)[0]
+
+def execute_insert(query, args):
+    return _execute_write(query, args)[1]
+
+def iter_rows(query, args=None, size=1000):
+    """Yield rows one at a time from an unbuffered server-side cursor.
+
+    Uses its own pooled connection (from a replica when there is one) so a
+    long export never holds the request's connection.  If the consumer stops
+    early the connection is discarded rather than draining the rest of the
+    result set.
+
+    The query listeners hear of it once the stream ends, with the time spent
+    executing and fetching (not the consumer's) and the rows read; a stream
+    stopped early is reported with conn=None, as its connection is mid-result.
+    """
+    replica, conn = acquire_replica() if replicas.replicas else (None, None)
+    source = replica.pool if replica else pool
+    if conn is None:
+        conn = pool.acquire()
+    executed = finished = False
+    elapsed, count = 0.0, 0
+    try:
+        # SQLite cursors already step through the result as it is fetched.
+        cur = conn.cursor(driver().cursors.SSCursor) if Config.DB_BACKEND == 'mysql' else conn.cursor()
+        start = time.perf_counter()
+        cur.execute(query, args or ())
+        executed = True
+        while True:
+            rows = cur.fetchmany(size)
+            elapsed += time.perf_counter() - start
+            if not rows:
+                break
+            count += len(rows)
+            for row in rows:
+                yield row
+            start = time.perf_counter()
+        cur.close()
+        finished = True
+    finally:
+        try:
+            if executed:
+                for listener in query_listeners:
+                    listener(conn if finished else None, query, args, elapsed, count)
+        finally:
+            source.release(conn, discard=not finished)
@@ -0,0 +1,216 @@
+import os
+import socket
+import threading
+import time
+
+from flask import current_app
+
+import db
+import search
+from config import Config
+from entities import BY_TABLE
+
+WORKER = '%s:%d' % (socket.gethostname(), os.getpid())
+
+CLAIMABLE = ("Status = 'queued' OR (Status = 'running' AND Updated_At < NOW() - INTERVAL %s SECOND)")
+
+
+class DeleteJobError(Exception):
+    pass
+
+
+class DeleteRefused(DeleteJobError):
+    """Rows that are not deleted with the parent still refer to it."""
+
+
+def count_rows(entity, id):
+    """Rows a delete of this parent removes: its dependents plus itself."""
+    total = 1
+    for table, column, pk in entity.dependents:
+        total += db.fetch_one("SELECT COUNT(*) FROM %s WHERE %s=%%s" % (table, column), (id,))[0]
+    return total
+
+
+def enqueue(entity, id):
+    """Queue the delete of one parent row; returns (job id, total rows).
+
+    A delete already queued or running for the row is reused rather than
+    queued twice.
+    """
+    if not entity.get(db.fetch_one, id):
+        raise DeleteJobError('%s %s not found' % (entity.label, id))
+    for table, column in entity.restricted:
+        count = db.fetch_one("SELECT COUNT(*) FROM %s WHERE %s=%%s" % (table, column), (id,))[0]
+        if count:
+            raise DeleteRefused('%s %s is still referenced by %d %s row(s); delete or move them first'
+                                % (entity.label, id, count, table))
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT Job_ID, Total FROM Delete_Job WHERE Table_name=%s AND Row_ID=%s "
+                    "AND Status IN ('queued', 'running') FOR UPDATE", (entity.table, id))
+        row = cur.fetchone()
+        if row:
+            db.commit(conn)
+            return row
+        total = count_rows(entity, id)
+        cur.execute("INSERT INTO Delete_Job (Table_name, Row_ID, Total) VALUES (%s, %s, %s)",
+                    (entity.table, id, total))
+        job_id = cur.lastrowid
+        db.bump_versions(cur, 'Delete_Job')
+        db.commit(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return job_id, total
+
+
+def delete_later(entity, id):
+    """Delete a parent and its dependents.
+
+    Small deletes (everything fits in one chunk) run right away in the
+    request; larger ones are left to the background worker.  Returns
+    (job id, total rows, finished).
+    """
+    job_id, total = enqueue(entity, id)
+    if total <= Config.DELETE_CHUNK_SIZE and claim(job_id):
+        run(job_id)
+        return job_id, total, True
+    current_app.extensions['delete_jobs'].wake()
+    return job_id, total, False
+
+
+# --- RUNNING JOBS ---
+
+def claim(job_id):
+    return db.execute_commit("UPDATE Delete_Job SET Status='running', Worker=%s, Updated_At=NOW() "
+                             "WHERE Job_ID=%s AND (" + CLAIMABLE + ")",
+                             (WORKER, job_id, Config.DELETE_JOB_STALE)) == 1
+
+
+def claim_next():
+    """Claim the oldest queued job, or a running one whose worker died."""
+    while True:
+        row = db.fetch_one("SELECT Job_ID FROM Delete_Job WHERE " + CLAIMABLE + " ORDER BY Job_ID LIMIT 1",
+                           (Config.DELETE_JOB_STALE,))
+        if row is None:
+            return None
+        if claim(row[0]):
+            return row[0]
+
+
+def delete_chunk(cur, job_id, table, column, pk, id):
+    cur.execute("SELECT %s FROM %s WHERE %s=%%s ORDER BY %s LIMIT %d FOR UPDATE"
+                % (pk, table, column, pk, Config.DELETE_CHUNK_SIZE), (id,))
+    ids = [r[0] for r in cur.fetchall()]
+    if ids:
+        cur.execute("DELETE FROM %s WHERE %s IN (%s)" % (table, pk, ','.join(['%s'] * len(ids))), ids)
+        deleted = cur.rowcount
+        db.bump_versions(cur, table)
+        cur.execute("UPDATE Delete_Job SET Deleted = Deleted + %s, Updated_At = NOW() WHERE Job_ID=%s",
+                    (deleted, job_id))
+    return ids
+
+
+def run(job_id):
+    """Carry out a claimed job: dependents first, DELETE_CHUNK_SIZE rows per
+    transaction, then the parent row itself, whose delete triggers write
+    the usual log entries.  Every chunk commits its progress with it, so
+    running the job again after a crash simply carries on."""
+    table, id = db.fetch_one("SELECT Table_name, Row_ID FROM Delete_Job WHERE Job_ID=%s", (job_id,))
+    entity = BY_TABLE[table]
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        for dependent, column, pk in entity.dependents:
+            while True:
+                ids = delete_chunk(cur, job_id, dependent, column, pk, id)
+                if not ids:
+                    db.commit(conn)
+                    break
+                db.bump_versions(cur, 'Delete_Job')
+                db.commit(conn)
+                db.notify_write(dependent)
+                for row_id in ids:
+                    search.row_deleted(dependent, row_id)
+                if len(ids) < Config.DELETE_CHUNK_SIZE:
+                    break
+                time.sleep(Config.DELETE_CHUNK_PAUSE)
+        cur.execute(entity.delete_sql, (id,))
+        deleted = cur.rowcount
+        db.bump_versions(cur, table)
+        cur.execute("UPDATE Delete_Job SET Status='done', Deleted = Deleted + %s, Updated_At = NOW() "
+                    "WHERE Job_ID=%s", (deleted, job_id))
+        db.bump_versions(cur, 'Delete_Job')
+        db.commit(conn)
+        db.notify_write(table)
+        search.row_deleted(table, id)
+    except Exception as e:
+        # What failed may be the connection itself (lost, or left mid-result),
+        # so the failure is not written on it: it is thrown away and the job
+        # marked failed on a fresh one.
+        try:
+            cur.close()
+            conn.rollback()
+        except Exception:
+            pass  # closing the connection rolls back as well
+        db.discard_connection()
+        fail(job_id, e)
+        raise
+    cur.close()
+
+
+def fail(job_id, error):
+    db.execute_commit("UPDATE Delete_Job SET Status='failed', Error=%s, Updated_At = NOW() WHERE Job_ID=%s",
+                      (str(error)[:500], job_id))
+
+
+class DeleteWorker:
+    """Runs queued delete jobs in a background thread, one job at a time.
+
+    Every worker process starts one on its first request; they share the
+    Delete_Job queue, and a job is claimed with a conditional UPDATE so only
+    one of them runs it.  A running job whose Updated_At has not moved for
+    DELETE_JOB_STALE seconds (its worker crashed) is claimed again.
+    """
+
+    def __init__(self, app, interval=5):
+        self.app = app
+        self.interval = interval
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._event.set()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    job_id = claim_next()
+                    if job_id is not None:
+                        run(job_id)
+                        continue
+            except Exception as e:
+                self.app.logger.warning('delete job failed: %s', e)
+            self._event.wait(self.interval)
+            self._event.clear()
+
+
+def init_app(app):
+    worker = DeleteWorker(app, interval=Config.DELETE_JOB_POLL_INTERVAL)
+    app.extensions['delete_jobs'] = worker
+    app.before_request(worker.start)
+    return worker
@@ -0,0 +1,137 @@
+from collections import namedtuple
+
+from forms import LocationForm, DisasterForm, ReliefCampForm, VictimForm, VolunteersForm, ResourcesForm, ResourcesEditForm, RescueTeamForm, DonorForm, DonationForm
+from pagination import Paginator
+
+
+class Entity:
+    """Everything the app needs to know about one table.
+
+    The list/add/edit/delete pages, the JSON API, CSV import and export are
+    all driven from this metadata.  SQL is built once here and reused for
+    every request, and rows are returned as named records (namedtuples, so
+    row[0] style access in the templates keeps working).
+    """
+
+    def __init__(self, name, table, pk, columns, label, form_class=None, writable=(), sortable=(),
+                 default_order='asc', date_column=None, api_name=None, importable=False, dependents=(),
+                 restricted=(), edit_form_class=None, updatable=None):
+        self.name = name
+        self.table = table
+        self.pk = pk
+        self.columns = list(columns)
+        self.label = label
+        self.form_class = form_class
+        self.writable = list(writable)
+        # Columns set on create that an edit may change, and the edit page's
+        # form; both default to the create ones.
+        self.edit_form_class = edit_form_class or form_class
+        self.updatable = list(writable if updatable is None else updatable)
+        self.sortable = list(sortable)
+        self.default_order = default_order
+        self.date_column = date_column
+        self.api_name = api_name or name
+        self.importable = importable
+        # (table, foreign key column, primary key) of child rows that are
+        # deleted in chunks by a background job before this row (delete_jobs.py).
+        self.dependents = list(dependents)
+        # (table, foreign key column) of child rows that are not deleted with
+        # this row: its delete is refused while any of them refer to it.
+        self.restricted = list(restricted)
+        self.template = '%s.html' % name
+        self.record = namedtuple(table, self.columns)
+        self.paginator = Paginator(table, pk, self.columns, self.sortable, default_order, record=self.record)
+        self._paginators = {tuple(self.columns): self.paginator}
+        # Set by archive.attach() for tables whose old rows live in archive files.
+        self.wrap_paginator = None
+
+        self.select_sql = "SELECT %s FROM %s WHERE %s=%%s" % (', '.join(self.columns), table, pk)
+        self.delete_sql = "DELETE FROM %s WHERE %s=%%s" % (table, pk)
+        if self.writable:
+            self.insert_sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+                table, ', '.join(self.writable), ','.join(['%s'] * len(self.writable)))
+            self.update_sql = "UPDATE %s SET %s WHERE %s=%%s" % (
+                table, ', '.join('%s=%%s' % c for c in self.updatable), pk)
+        else:
+            self.insert_sql = self.update_sql = None
+
+    @property
+    def read_only(self):
+        return self.form_class is None
+
+    def paginator_for(self, columns):
+        # The API may ask for a subset of columns; one Paginator per subset.
+        key = tuple(columns)
+        paginator = self._paginators.get(key)
+        if paginator is None:
+            paginator = Paginator(self.table, self.pk, columns, [c for c in self.sortable if c in columns],
+                                  self.default_order)
+            if self.wrap_paginator is not None:
+                paginator = self.wrap_paginator(paginator)
+            self._paginators[key] = paginator
+        return paginator
+
+    def get(self, fetch_one, id):
+        row = fetch_one(self.select_sql, (id,))
+        return self.record._make(row) if row else None
+
+    def form_values(self, form):
+        return tuple(form[c].data for c in self.writable)
+
+    def update_values(self, form):
+        return tuple(form[c].data for c in self.updatable)
+
+
+ENTITIES = {}
+
+
+def register(entity):
+    ENTITIES[entity.name] = entity
+    return entity
+
+
+register(Entity('location', 'Location', 'Location_ID', ['Location_ID', 'City', 'District', 'State'], 'Location',
+    LocationForm, ['City', 'District', 'State'], ['City'], api_name='locations'))
+register(Entity('disaster', 'Disaster', 'Disaster_ID', ['Disaster_ID', 'D_type', 'D_date', 'D_time', 'Location_ID'], 'Disaster',
+    DisasterForm, ['D_type', 'D_date', 'D_time', 'Location_ID'], ['D_type', 'D_date'],
+    date_column='D_date', api_name='disasters',
+    dependents=[('Victim', 'Disaster_ID', 'Victim_ID')], restricted=[('Rescue_Team', 'Disaster_ID')]))
+register(Entity('relief_camp', 'Relief_Camp', 'Camp_ID', ['Camp_ID', 'Camp_Name', 'Location', 'Capacity', 'Incharge'], 'Relief Camp',
+    ReliefCampForm, ['Camp_Name', 'Location', 'Capacity', 'Incharge'], ['Camp_Name', 'Capacity'], api_name='relief_camps'))
+# Age is computed from DOB by the trg_victim_before_* triggers, so it is listed but never written.
+register(Entity('victim', 'Victim', 'Victim_ID', ['Victim_ID', 'Vic_name', 'DOB', 'Age', 'Contact', 'Disaster_ID', 'Camp_ID'], 'Victim',
+    VictimForm, ['Vic_name', 'DOB', 'Contact', 'Disaster_ID', 'Camp_ID'], ['Vic_name', 'DOB', 'Contact', 'Disaster_ID'],
+    date_column='DOB', api_name='victims', importable=True))
+register(Entity('volunteers', 'Volunteers', 'Volunteer_ID', ['Volunteer_ID', 'V_name', 'Age', 'Gender', 'Contact_Info'], 'Volunteer',
+    VolunteersForm, ['V_name', 'Age', 'Gender', 'Contact_Info'], ['V_name', 'Age'], importable=True))
+# Quantity is the opening stock on create; after that it only changes through inventory.py
+# (see database.txt, RESOURCE INVENTORY), so edits leave it alone and show it read-only.
+register(Entity('resources', 'Resources', 'Resource_ID', ['Resource_ID', 'R_name', 'R_type', 'Quantity', 'Reserved'], 'Resource',
+    ResourcesForm, ['R_name', 'R_type', 'Quantity'], ['R_name', 'R_type', 'Quantity'], importable=True,
+    edit_form_class=ResourcesEditForm, updatable=['R_name', 'R_type']))
+register(Entity('rescue_team', 'Rescue_Team', 'Team_ID', ['Team_ID', 'Team_name', 'Team_type', 'No_of_People', 'Disaster_ID'], 'Rescue Team',
+    RescueTeamForm, ['Team_name', 'Team_type', 'No_of_People', 'Disaster_ID'], ['Team_name', 'No_of_People', 'Disaster_ID'],
+    api_name='rescue_teams'))
+register(Entity('donor', 'Donor', 'Donor_ID', ['Donor_ID', 'Donor_name', 'Contact'], 'Donor',
+    DonorForm, ['Donor_name', 'Contact'], ['Donor_name', 'Contact'], api_name='donors'))
+register(Entity('donation', 'Donation', 'Donation_ID', ['Donation_ID', 'Donor_ID', 'Amount', 'Donation_date', 'Resource_ID'], 'Donation',
+    DonationForm, ['Donor_ID', 'Amount', 'Donation_date', 'Resource_ID'], ['Donor_ID', 'Amount', 'Donation_date', 'Resource_ID'],
+    date_column='Donation_date', api_name='donations'))
+# Written only by trg_disaster_before_delete.
+register(Entity('disaster_delete_log', 'Disaster_Delete_Log', 'Log_ID',
+    ['Log_ID', 'Disaster_ID', 'D_type', 'D_date', 'D_time', 'Location_ID', 'Deleted_At'], 'Deleted Disaster',
+    default_order='desc', date_column='Deleted_At'))
+# Written only by delete_jobs.py.
+register(Entity('delete_job', 'Delete_Job', 'Job_ID',
+    ['Job_ID', 'Table_name', 'Row_ID', 'Status', 'Total', 'Deleted', 'Worker', 'Error', 'Created_At', 'Updated_At'],
+    'Delete Job', default_order='desc', date_column='Created_At', api_name='delete_jobs'))
+# Written only by inventory.py.
+register(Entity('resource_reservation', 'Resource_Reservation', 'Reservation_ID',
+    ['Reservation_ID', 'Resource_ID', 'Quantity', 'Status', 'Reference', 'Created_At', 'Updated_At'],
+    'Reservation', default_order='desc', date_column='Created_At', api_name='reservations'))
+register(Entity('stock_movement', 'Stock_Movement', 'Movement_ID',
+    ['Movement_ID', 'Resource_ID', 'Kind', 'Quantity_Change', 'Reserved_Change', 'Reservation_ID', 'Reference',
+     'Created_At'],
+    'Stock Movement', default_order='desc', date_column='Created_At', api_name='stock_movements'))
+
+BY_TABLE = {entity.table: entity for entity in ENTITIES.values()}
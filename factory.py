@@ -0,0 +1,33 @@
+"""Build the app with some Config settings overridden, e.g. on SQLite:
+
+    flask --app "factory:create_app(DB_BACKEND='sqlite')" run
+    flask --app "factory:create_app(DB_BACKEND='sqlite', SQLITE_PATH=':memory:')" routes
+
+The connection pool, caches and background workers are set up when the
+app is first imported, and the storage backend on the first query, from
+the Config values at that moment, so settings can only be chosen once per
+process: before the first create_app() (or `import app`).
+"""
+import sys
+
+from config import Config
+
+
+def configure(**settings):
+    """Override Config settings before the app's modules are imported."""
+    for name in settings:
+        if not name.isupper() or not hasattr(Config, name):
+            raise TypeError('Unknown setting %r' % name)
+    db = sys.modules.get('db')
+    if 'app' in sys.modules or (db is not None and db._driver is not None):
+        changed = [name for name, value in settings.items() if getattr(Config, name) != value]
+        if changed:
+            raise RuntimeError('The app is already set up; cannot change %s' % ', '.join(sorted(changed)))
+    for name, value in settings.items():
+        setattr(Config, name, value)
+
+
+def create_app(**settings):
+    configure(**settings)
+    from app import app
+    return app
@@ -0,0 +1,207 @@
+from flask import jsonify, request
+
+import db
+import search
+from api import api, ApiError, RESOURCES, to_item, validate
+from config import Config
+
+OPS = ('create', 'update', 'delete')
+DEADLOCK = 1213  # InnoDB rolled back the whole transaction
+MAX_ATTEMPTS = 3
+
+
+class Conflict(Exception):
+    """The group has to be redone: it deadlocked (status 503), or a
+    concurrent sync of the same journal recorded one of its keys first
+    (409)."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse(body):
+    """(client id, operations) of a sync request body."""
+    operations = body.get('operations') if isinstance(body, dict) else None
+    if not isinstance(operations, list):
+        raise ApiError(400, 'Request body must be {"client": "...", "operations": [...]}')
+    client = body.get('client')
+    if not isinstance(client, str) or not 0 < len(client) <= 64:
+        raise ApiError(400, 'client must be the device id, 1-64 characters')
+    if len(operations) > Config.SYNC_MAX_OPERATIONS:
+        raise ApiError(413, 'At most %d operations per request' % Config.SYNC_MAX_OPERATIONS)
+    seen = set()
+    for i, op in enumerate(operations):
+        if not isinstance(op, dict):
+            raise ApiError(400, 'Operation %d is not an object' % i)
+        key = op.get('key')
+        if not isinstance(key, str) or not 0 < len(key) <= 100:
+            raise ApiError(400, 'Operation %d needs a key of 1-100 characters' % i)
+        if key in seen:
+            raise ApiError(400, 'Duplicate key in batch: %s' % key)
+        seen.add(key)
+        if op.get('op') not in OPS:
+            raise ApiError(400, 'Operation %s: op must be one of %s' % (key, ', '.join(OPS)))
+    return client, operations
+
+
+def resolve(value, results):
+    # {"$ref": "<key>"} stands for the id created or touched by an earlier
+    # operation, so a journal can add a disaster and then its victims.
+    if isinstance(value, dict) and '$ref' in value:
+        result = results.get(value['$ref'])
+        if result is None or result['status'] >= 300 or result.get('id') is None:
+            raise ApiError(424, 'Referenced operation %s did not succeed' % value['$ref'])
+        return result['id']
+    return value
+
+
+def apply_op(cur, op, results):
+    """Run one operation on the group's transaction; returns (status, id, values)."""
+    resource = RESOURCES.get(op.get('resource'))
+    if resource is None:
+        raise ApiError(404, 'Unknown resource: %s' % op.get('resource'))
+    if resource.read_only:
+        raise ApiError(405, '%s is read-only' % resource.table)
+    data = op.get('data') or {}
+    if not isinstance(data, dict):
+        raise ApiError(400, 'data must be an object')
+    data = {k: resolve(v, results) for k, v in data.items()}
+    if op['op'] == 'create':
+        values = validate(resource, data)
+        cur.execute(resource.insert_sql, values)
+        return 201, cur.lastrowid, values
+
+    id = resolve(op.get('id'), results)
+    if not isinstance(id, int):
+        raise ApiError(400, 'id must be an integer')
+    if op['op'] == 'update':
+        cur.execute(resource.select_sql + " FOR UPDATE", (id,))
+        row = cur.fetchone()
+        if not row:
+            raise ApiError(404, '%s %s not found' % (resource.table, id))
+        current = to_item(resource.columns, row)
+        values = validate(resource, data, current, current)
+        cur.execute(resource.update_sql, values + (id,))
+        return 200, id, values
+
+    if resource.dependents:
+        raise ApiError(409, '%s deletes run as background jobs: use DELETE /api/v1/%s/%s'
+                       % (resource.table, resource.api_name, id))
+    cur.execute(resource.delete_sql, (id,))
+    if not cur.rowcount:
+        raise ApiError(404, '%s %s not found' % (resource.table, id))
+    return 204, id, None
+
+
+def apply_group(client, operations, results):
+    """Apply a group of a client's operations in one transaction.
+
+    A failing operation only loses its own statement (MySQL rolls back the
+    statement, not the transaction) and is reported with its error; the
+    rest of the group still commits.  Returns (group results, saved rows).
+    """
+    conn = db.get_connection()
+    cur = conn.cursor()
+    keys = [op['key'] for op in operations]
+    # Keys are only unique per client: another device may use the same ones.
+    cur.execute("SELECT Op_Key, Resource, Row_ID, Status FROM Sync_Operation WHERE Client_ID=%%s AND Op_Key IN (%s)"
+                % ','.join(['%s'] * len(keys)), [client] + keys)
+    done = {row[0]: row for row in cur.fetchall()}
+    group = {}
+    lookup = dict(results)
+    journal, touched, saved = [], set(), []
+    for op in operations:
+        key = op['key']
+        if key in done:
+            _, resource, row_id, status = done[key]
+            result = {'key': key, 'status': status, 'id': row_id, 'replayed': True}
+        else:
+            try:
+                status, row_id, values = apply_op(cur, op, lookup)
+            except ApiError as e:
+                result = {'key': key, 'status': e.status, 'error': e.message}
+                if e.fields:
+                    result['fields'] = e.fields
+            except db.DatabaseError as e:
+                if e.args[0] == DEADLOCK:
+                    raise Conflict(503, str(e))
+                if e.args[0] in db.CONNECTION_ERRORS:
+                    raise
+                result = {'key': key, 'status': 409, 'error': str(e)}
+            else:
+                resource = RESOURCES[op['resource']]
+                result = {'key': key, 'status': status, 'id': row_id}
+                journal.append((client, key, resource.api_name, row_id, status))
+                touched.add(resource.table)
+                saved.append((resource.table, row_id, values))
+        group[key] = lookup[key] = result
+    if journal:
+        try:
+            cur.executemany("INSERT INTO Sync_Operation (Client_ID, Op_Key, Resource, Row_ID, Status) "
+                            "VALUES (%s, %s, %s, %s, %s)", journal)
+        except db.IntegrityError as e:
+            raise Conflict(409, str(e))
+    for table in touched:
+        db.bump_versions(cur, table)
+    db.commit(conn)
+    cur.close()
+    for table in touched:
+        db.notify_write(table)
+    return group, saved
+
+
+def not_applied(operations, status, error):
+    return {op['key']: {'key': op['key'], 'status': status, 'error': error, 'retry': True} for op in operations}
+
+
+def apply_journal(client, operations):
+    """Apply a client's journal, SYNC_GROUP_SIZE operations per transaction,
+    and return one result per operation, in order.
+
+    A group that still conflicts after MAX_ATTEMPTS is answered with its
+    status (503 deadlock, 409 concurrent sync) on each of its operations,
+    and the groups after it are not tried (503), since they may depend on
+    it: the groups before it stay committed, so sending the whole journal
+    again replays those and applies the rest."""
+    results = {}
+    for start in range(0, len(operations), Config.SYNC_GROUP_SIZE):
+        chunk = operations[start:start + Config.SYNC_GROUP_SIZE]
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                group, saved = apply_group(client, chunk, results)
+                break
+            except Conflict as e:
+                # The retry reads the journal afresh and replays what the other sync applied.
+                db.get_connection().rollback()
+                if attempt == MAX_ATTEMPTS - 1:
+                    results.update(not_applied(chunk, e.status, 'Not applied (%s); send the journal again' % e))
+                    results.update(not_applied(operations[start + len(chunk):], 503,
+                                               'Not applied: an earlier group failed; send the journal again'))
+                    return [results[op['key']] for op in operations]
+            except Exception:
+                db.get_connection().rollback()
+                raise
+        results.update(group)
+        for table, row_id, values in saved:
+            if values is None:
+                search.row_deleted(table, row_id)
+            else:
+                search.row_saved(table, row_id, values[0])
+    return [results[op['key']] for op in operations]
+
+
+@api.route('/sync', methods=['POST'])
+def sync():
+    client, operations = parse(request.get_json(silent=True))
+    results = apply_journal(client, operations)
+    retry = sum(1 for r in results if r.get('retry'))
+    failed = sum(1 for r in results if r['status'] >= 300) - retry
+    replayed = sum(1 for r in results if r.get('replayed'))
+    response = jsonify(results=results, applied=len(results) - failed - replayed - retry, replayed=replayed,
+                       failed=failed, not_applied=retry)
+    if retry:
+        # Part of the journal is committed; the client sends all of it again.
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+    return response
@@ -0,0 +1,82 @@
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, IntegerField, DateField, TimeField, DecimalField, SelectField, validators
+
+class LocationForm(FlaskForm):
+    City = StringField('City', [validators.InputRequired(), validators.Length(max=50)])
+    District = StringField('District', [validators.InputRequired(), validators.Length(max=50)])
+    State = StringField('State', [validators.InputRequired(), validators.Length(max=50)])
+
+class DisasterForm(FlaskForm):
+    D_type = SelectField('Disaster Type', choices=[
+        ('Flood','Flood'),('Cyclone','Cyclone'),('Earthquake','Earthquake'),
+        ('Landslide','Landslide'),('Fire','Fire'),('Other','Other')
+    ])
+    D_date = DateField('Date', format='%Y-%m-%d')
+    D_time = TimeField('Time', format=['%H:%M', '%H:%M:%S'])
+    Location_ID = IntegerField('Location ID', [validators.InputRequired()])
+
+class ReliefCampForm(FlaskForm):
+    Camp_Name = StringField('Camp Name', [validators.InputRequired(), validators.Length(max=100)])
+    Location = StringField('Location', [validators.InputRequired(), validators.Length(max=100)])
+    Capacity = IntegerField('Capacity', [validators.InputRequired(), validators.NumberRange(min=1)])
+    Incharge = StringField('Incharge', [validators.InputRequired(), validators.Length(max=100)])
+
+class VictimForm(FlaskForm):
+    Vic_name = StringField('Name', [validators.InputRequired(), validators.Length(max=100)])
+    DOB = DateField('Date of Birth', format='%Y-%m-%d')
+    Contact = StringField('Contact', [validators.InputRequired(), validators.Length(max=15)])
+    Disaster_ID = IntegerField('Disaster ID', [validators.InputRequired()])
+    Camp_ID = IntegerField('Camp ID (optional)', [validators.Optional()])
+
+class VolunteersForm(FlaskForm):
+    V_name = StringField('Name', [validators.InputRequired(), validators.Length(max=100)])
+    Age = IntegerField('Age', [validators.InputRequired(), validators.NumberRange(min=18)])
+    Gender = SelectField('Gender', choices=[('Male','Male'), ('Female','Female'), ('Other','Other')])
+    Contact_Info = StringField('Contact', [validators.InputRequired(), validators.Length(max=15)])
+
+class ResourcesForm(FlaskForm):
+    R_name = StringField('Resource Name', [validators.InputRequired(), validators.Length(max=100)])
+    R_type = StringField('Resource Type', [validators.InputRequired(), validators.Length(max=50)])
+    Quantity = IntegerField('Quantity', [validators.InputRequired(), validators.NumberRange(min=0)])
+
+class ResourcesEditForm(FlaskForm):
+    R_name = StringField('Resource Name', [validators.InputRequired(), validators.Length(max=100)])
+    R_type = StringField('Resource Type', [validators.InputRequired(), validators.Length(max=50)])
+    # Shown, never saved: the stock moves through receive/dispatch/adjust only.
+    Quantity = IntegerField('Quantity', [validators.Optional()], render_kw={'readonly': True},
+                            description='Change stock on the Stock page (/resources/stock) or through /api/v1/inventory.')
+
+class RescueTeamForm(FlaskForm):
+    Team_name = StringField('Team Name', [validators.InputRequired(), validators.Length(max=100)])
+    Team_type = SelectField('Team Type', choices=[('Medical','Medical'),('Rescue','Rescue'),('Army','Army'),('Fire','Fire'),('Other','Other')])
+    No_of_People = IntegerField('Number of People', [validators.InputRequired(), validators.NumberRange(min=1)])
+    Disaster_ID = IntegerField('Disaster ID', [validators.InputRequired()])
+
+class DonorForm(FlaskForm):
+    Donor_name = StringField('Donor Name', [validators.InputRequired(), validators.Length(max=100)])
+    Contact = StringField('Contact', [validators.InputRequired(), validators.Length(max=15)])
+
+class DonationForm(FlaskForm):
+    Donor_ID = IntegerField('Donor ID', [validators.InputRequired()])
+    Amount = DecimalField('Amount', [validators.InputRequired(), validators.NumberRange(min=0.01)])
+    Donation_date = DateField('Donation Date', format='%Y-%m-%d')
+    Resource_ID = IntegerField('Resource ID', [validators.InputRequired()])
+
+class ImportForm(FlaskForm):
+    File = FileField('CSV or JSON file', [FileRequired(), FileAllowed(['csv', 'json', 'jsonl'], 'Upload a .csv, .json or .jsonl file')])
+
+class AllocationForm(FlaskForm):
+    Disaster_ID = IntegerField('Disaster ID', [validators.InputRequired()])
+    Camp_IDs = StringField('Camp IDs (optional, comma-separated; default: camps in the disaster city)',
+        [validators.Optional(), validators.Regexp(r'^\s*\d+(\s*,\s*\d+)*\s*$', message='Enter camp IDs separated by commas')])
+
+class StockForm(FlaskForm):
+    Action = SelectField('Action', choices=[
+        ('dispatch', 'Dispatch'), ('reserve', 'Reserve for later dispatch'),
+        ('receive', 'Receive'), ('adjust', 'Adjust after a count (+/-)')
+    ])
+    Items = StringField('Items (resource ID:quantity, comma-separated, e.g. 502:40, 506:10)',
+        [validators.InputRequired(), validators.Regexp(r'^\s*\d+\s*:\s*-?\d+(\s*,\s*\d+\s*:\s*-?\d+)*\s*$',
+                                                       message='Enter resource:quantity pairs separated by commas')])
+    Reference = StringField('Reference (camp, team, delivery note...)', [validators.Optional(), validators.Length(max=100)])
@@ -0,0 +1,189 @@
+import db
+
+DEADLOCK = 1213
+MAX_ATTEMPTS = 3
+# Tables every stock movement writes, bumped together at commit.
+TABLES = ('Resources', 'Resource_Reservation', 'Stock_Movement')
+
+
+class InventoryError(Exception):
+    pass
+
+
+class InsufficientStock(InventoryError):
+    def __init__(self, resource_id, requested):
+        super().__init__('Not enough stock of resource %s for %d' % (resource_id, requested))
+        self.resource_id = resource_id
+        self.requested = requested
+
+
+def parse_items(value):
+    """Parse "501:20, 502:5" (resource id:quantity pairs) into items."""
+    items = []
+    for part in value.split(','):
+        resource_id, _, quantity = part.strip().partition(':')
+        try:
+            items.append((int(resource_id), int(quantity)))
+        except ValueError:
+            raise InventoryError('Expected resource:quantity pairs, got %r' % part.strip())
+    return items
+
+
+def normalize(items, allow_negative=False):
+    """Merge repeated resources and sort by id.
+
+    Every transaction locks Resources rows in id order, so two batches over
+    the same resources queue behind each other instead of deadlocking.
+    """
+    totals = {}
+    for resource_id, quantity in items:
+        if not isinstance(quantity, int) or quantity == 0 or (quantity < 0 and not allow_negative):
+            raise InventoryError('Invalid quantity %r for resource %s' % (quantity, resource_id))
+        totals[resource_id] = totals.get(resource_id, 0) + quantity
+    if not totals:
+        raise InventoryError('No items given')
+    return sorted(totals.items())
+
+
+def in_transaction(work):
+    """Run work(cur) and append the movements it returns to the ledger, in
+    one transaction; a deadlock victim is retried from the start."""
+    conn = db.get_connection()
+    for attempt in range(MAX_ATTEMPTS):
+        cur = conn.cursor()
+        try:
+            result, movements = work(cur)
+            cur.executemany("INSERT INTO Stock_Movement (Resource_ID, Kind, Quantity_Change, Reserved_Change, "
+                            "Reservation_ID, Reference) VALUES (%s, %s, %s, %s, %s, %s)", movements)
+            for table in TABLES:
+                db.bump_versions(cur, table)
+            db.commit(conn)
+            break
+        except db.DatabaseError as e:
+            conn.rollback()
+            if e.args[0] != DEADLOCK or attempt == MAX_ATTEMPTS - 1:
+                raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    for table in TABLES:
+        db.notify_write(table)
+    return result
+
+
+def _change(cur, resource_id, quantity, reserved, need):
+    # The condition is checked on the locked row, so the change either
+    # applies to the current stock or not at all: no lost updates.
+    cur.execute("UPDATE Resources SET Quantity = Quantity + %s, Reserved = Reserved + %s, "
+                "Stock_Version = Stock_Version + 1 WHERE Resource_ID=%s AND Quantity - Reserved >= %s",
+                (quantity, reserved, resource_id, need))
+    if cur.rowcount != 1:
+        cur.execute("SELECT 1 FROM Resources WHERE Resource_ID=%s", (resource_id,))
+        if cur.fetchone() is None:
+            raise InventoryError('Resource %s not found' % resource_id)
+        raise InsufficientStock(resource_id, need)
+
+
+# --- STOCK WITHOUT RESERVATION ---
+
+def receive(items, reference=None):
+    """Add stock (deliveries, donations in kind)."""
+    items = normalize(items)
+    def work(cur):
+        for resource_id, quantity in items:
+            _change(cur, resource_id, quantity, 0, 0)
+        return len(items), [(r, 'receive', q, 0, None, reference) for r, q in items]
+    return in_transaction(work)
+
+
+def adjust(items, reference=None):
+    """Correct stock after a count: positive or negative changes, never
+    below what is reserved."""
+    items = normalize(items, allow_negative=True)
+    def work(cur):
+        for resource_id, change in items:
+            _change(cur, resource_id, change, 0, max(-change, 0))
+        return len(items), [(r, 'adjust', q, 0, None, reference) for r, q in items]
+    return in_transaction(work)
+
+
+def dispatch_items(items, reference=None):
+    """Send out unreserved stock of several resources: all or nothing."""
+    items = normalize(items)
+    def work(cur):
+        for resource_id, quantity in items:
+            _change(cur, resource_id, -quantity, 0, quantity)
+        return len(items), [(r, 'dispatch', -q, 0, None, reference) for r, q in items]
+    return in_transaction(work)
+
+
+# --- RESERVATIONS ---
+
+def reserve(items, reference=None):
+    """Hold stock of several resources for a later dispatch: all or nothing.
+    Returns the new reservation ids, in resource id order."""
+    items = normalize(items)
+    def work(cur):
+        ids, movements = [], []
+        for resource_id, quantity in items:
+            _change(cur, resource_id, 0, quantity, quantity)
+            cur.execute("INSERT INTO Resource_Reservation (Resource_ID, Quantity, Reference) VALUES (%s, %s, %s)",
+                        (resource_id, quantity, reference))
+            ids.append(cur.lastrowid)
+            movements.append((resource_id, 'reserve', 0, quantity, cur.lastrowid, reference))
+        return ids, movements
+    return in_transaction(work)
+
+
+def _close(reservation_ids, status, reference):
+    if not reservation_ids:
+        raise InventoryError('No reservations given')
+    kind = 'dispatch' if status == 'dispatched' else 'release'
+    def work(cur):
+        placeholders = ','.join(['%s'] * len(reservation_ids))
+        cur.execute("SELECT Reservation_ID, Resource_ID, Quantity FROM Resource_Reservation "
+                    "WHERE Reservation_ID IN (%s) AND Status='held' FOR UPDATE" % placeholders, tuple(reservation_ids))
+        rows = cur.fetchall()
+        if len(rows) != len(set(reservation_ids)):
+            missing = sorted(set(reservation_ids) - {row[0] for row in rows})
+            raise InventoryError('Reservation(s) %s not found or no longer held' % ', '.join(map(str, missing)))
+        cur.execute("UPDATE Resource_Reservation SET Status=%%s, Updated_At=NOW() WHERE Reservation_ID IN (%s)"
+                    % placeholders, (status,) + tuple(reservation_ids))
+        totals = {}
+        for _, resource_id, quantity in rows:
+            totals[resource_id] = totals.get(resource_id, 0) + quantity
+        for resource_id, quantity in sorted(totals.items()):
+            _change(cur, resource_id, -quantity if status == 'dispatched' else 0, -quantity, 0)
+        return len(rows), [(resource_id, kind, -quantity if status == 'dispatched' else 0, -quantity, id, reference)
+                           for id, resource_id, quantity in rows]
+    return in_transaction(work)
+
+
+def dispatch(reservation_ids, reference=None):
+    """Send out held reservations: the stock leaves Quantity and Reserved."""
+    return _close(reservation_ids, 'dispatched', reference)
+
+
+def release(reservation_ids, reference=None):
+    """Cancel held reservations, making their stock available again."""
+    return _close(reservation_ids, 'released', reference)
+
+
+# Batch operations by name, for the stock form and the API.
+ACTIONS = {'receive': receive, 'adjust': adjust, 'dispatch': dispatch_items, 'reserve': reserve}
+
+
+# --- CHECKS ---
+
+def mismatches():
+    """Resources whose Quantity or Reserved differs from the sum of their
+    ledger entries: (Resource_ID, Quantity, Reserved, ledger quantity,
+    ledger reserved).  Empty unless stock was changed outside inventory.py."""
+    return db.fetch_all(
+        "SELECT r.Resource_ID, r.Quantity, r.Reserved, IFNULL(SUM(m.Quantity_Change), 0), "
+        "IFNULL(SUM(m.Reserved_Change), 0) FROM Resources r "
+        "LEFT JOIN Stock_Movement m ON m.Resource_ID = r.Resource_ID "
+        "GROUP BY r.Resource_ID, r.Quantity, r.Reserved "
+        "HAVING r.Quantity <> IFNULL(SUM(m.Quantity_Change), 0) OR r.Reserved <> IFNULL(SUM(m.Reserved_Change), 0)")
@@ -0,0 +1,228 @@
+import logging
+import re
+import threading
+import time
+
+from flask import Response, g, request, template_rendered, before_render_template
+
+import db
+from config import Config
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+slow_log = logging.getLogger('slow_query')
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        with self.lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self.series.items())
+        for label_values, (counts, count, total) in items:
+            labels = format_labels(self.labels, label_values)
+            for bound, n in zip(self.buckets, counts):
+                lines.append('%s_bucket{%s} %d' % (self.name, join_labels(labels, 'le="%s"' % format_number(bound)), n))
+            lines.append('%s_bucket{%s} %d' % (self.name, join_labels(labels, 'le="+Inf"'), count))
+            lines.append('%s_count%s %d' % (self.name, braces(labels), count))
+            lines.append('%s_sum%s %s' % (self.name, braces(labels), format_number(total)))
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s counter' % self.name]
+        with self.lock:
+            items = sorted(self.series.items())
+        for label_values, value in items:
+            lines.append('%s%s %s' % (self.name, braces(format_labels(self.labels, label_values)), format_number(value)))
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    return ','.join('%s="%s"' % (n, escape(v)) for n, v in zip(names, values))
+
+
+def join_labels(labels, extra):
+    return labels + ',' + extra if labels else extra
+
+
+def braces(labels):
+    return '{%s}' % labels if labels else ''
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+QUERY_SECONDS = Histogram('db_query_duration_seconds', 'Time to execute and fetch a query.', ('statement',))
+QUERY_ROWS = Histogram('db_query_rows', 'Rows returned (or affected, for writes) per query.', ('statement',), ROW_BUCKETS)
+SLOW_QUERIES = Counter('db_slow_queries_total', 'Queries slower than SLOW_QUERY_SECONDS.', ('statement',))
+COMMITS = Counter('db_commits_total', 'Transactions committed.')
+COMMIT_SECONDS = Histogram('db_commit_duration_seconds', 'Time spent in COMMIT.', ())
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time to handle a request, by route.',
+                            ('endpoint', 'method', 'status'))
+RENDER_SECONDS = Histogram('template_render_duration_seconds', 'Time to render a template.', ('template',))
+PAGE_CACHE = Counter('page_cache_requests_total', 'Cached page requests, by result (hit, miss, not_modified).',
+                     ('endpoint', 'result'))
+
+# ConnectionPool.stats() keys that are levels rather than running totals.
+POOL_GAUGES = {'size', 'idle', 'in_use', 'min_size', 'max_size', 'max_wait'}
+
+METRICS = [QUERY_SECONDS, QUERY_ROWS, SLOW_QUERIES, COMMITS, COMMIT_SECONDS, REQUEST_SECONDS, RENDER_SECONDS,
+           PAGE_CACHE]
+
+
+# --- SQL NORMALIZATION ---
+
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\b\d+(?:\.\d+)?\b")
+SPACE_RE = re.compile(r'\s+')
+normalized_cache = {}
+
+
+def normalize_sql(query):
+    """Collapse a statement to its shape so it can be used as a metric label:
+    literals become ?, placeholder lists become (...)."""
+    shape = normalized_cache.get(query)
+    if shape is None:
+        shape = SPACE_RE.sub(' ', query).strip()
+        shape = IN_LIST_RE.sub('(...)', shape)
+        shape = LITERAL_RE.sub('?', shape).replace('%s', '?')
+        if len(normalized_cache) < 5000:
+            normalized_cache[query] = shape
+    return shape
+
+
+# --- SLOW QUERY LOG ---
+
+def explain(conn, query, args):
+    cur = conn.cursor()
+    try:
+        cur.execute('EXPLAIN ' + query, args)
+        columns = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    except Exception as e:
+        # Diagnostics only: never let the plan lookup fail the request.
+        return 'EXPLAIN failed: %s' % e
+    finally:
+        cur.close()
+    return '\n'.join([' | '.join(columns)] + [' | '.join(str(v) for v in row) for row in rows])
+
+
+def record_query(conn, query, args, seconds, rows):
+    statement = normalize_sql(query)
+    QUERY_SECONDS.observe(seconds, statement)
+    QUERY_ROWS.observe(rows, statement)
+    if Config.SLOW_QUERY_SECONDS and seconds >= Config.SLOW_QUERY_SECONDS:
+        SLOW_QUERIES.inc(statement)
+        message = '%.3fs rows=%d %s args=%r' % (seconds, rows, SPACE_RE.sub(' ', query).strip(), tuple(args or ()))
+        # Writes are not re-planned: EXPLAIN of a finished INSERT/UPDATE says little.
+        # Async queries (conn is None) are logged without a plan.
+        if Config.SLOW_QUERY_EXPLAIN and conn is not None and query.lstrip()[:6].upper() == 'SELECT':
+            message += '\n' + explain(conn, query, args)
+        slow_log.warning(message)
+
+
+def record_commit(seconds):
+    COMMITS.inc()
+    COMMIT_SECONDS.observe(seconds)
+
+
+# --- REQUEST HOOKS ---
+
+def start_timer():
+    g._request_started = time.perf_counter()
+
+
+def record_request(response):
+    started = g.pop('_request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                request.endpoint or 'unmatched', request.method, response.status_code)
+    return response
+
+
+def start_render(sender, template, context, **extra):
+    g.setdefault('_render_started', []).append(time.perf_counter())
+
+
+def record_render(sender, template, context, **extra):
+    started = g.get('_render_started')
+    if started:
+        RENDER_SECONDS.observe(time.perf_counter() - started.pop(), template.name or 'string')
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    pool = db.pool.stats()
+    for key in sorted(pool):
+        if key in POOL_GAUGES:
+            lines.append('# TYPE db_pool_%s gauge' % key)
+            lines.append('db_pool_%s %s' % (key, format_number(pool[key])))
+        else:
+            lines.append('# TYPE db_pool_%s_total counter' % key)
+            lines.append('db_pool_%s_total %s' % (key, format_number(pool[key])))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view():
+    return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def init_app(app):
+    """Time every query, commit, request and template render, and serve the
+    numbers at /metrics in the Prometheus text format.
+
+    Metrics are kept per worker process, so each worker reports only the
+    traffic it served.
+    """
+    db.on_query(record_query)
+    db.on_commit(record_commit)
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    before_render_template.connect(start_render, app)
+    template_rendered.connect(record_render, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    if Config.SLOW_QUERY_LOG:
+        handler = logging.FileHandler(Config.SLOW_QUERY_LOG)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_log.addHandler(handler)
+        slow_log.propagate = False
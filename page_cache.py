@@ -0,0 +1,211 @@
+import functools
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from flask import Response, current_app, make_response, request, session
+
+import db
+import metrics
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# Best first; identity is always acceptable.
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+COMPRESSIBLE = {'text/html', 'text/plain', 'text/csv', 'application/json'}
+PRUNE_INTERVAL = 60
+
+
+def compress(body, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(body, Config.COMPRESS_LEVEL, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=Config.COMPRESS_LEVEL)
+    return body
+
+
+def negotiate():
+    """The best encoding the client accepts, from its Accept-Encoding header."""
+    for encoding in ENCODINGS:
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return 'identity'
+
+
+class PageCache:
+    """Rendered pages stored as files, one per page and content encoding.
+
+    A page's key includes the versions of the tables it shows (Table_Version
+    is bumped in the same transaction as every write), so a write makes the
+    old entries unreachable instead of having to find and delete them; they
+    age out, or go oldest first once the directory passes max_bytes.  Files
+    are replaced atomically, so every worker process on the host can share
+    one directory, and the compressed forms are stored alongside the page so
+    a hit is a file read.
+    """
+
+    def __init__(self, directory, max_age=3600, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._pruned_at = time.monotonic()
+        self._prune_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name, encoding):
+        return os.path.join(self.directory, '%s.%s' % (name, encoding))
+
+    def _read(self, name, encoding):
+        try:
+            with open(self._path(name, encoding), 'rb') as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime > self.max_age:
+                    return None
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name, encoding, body):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, self._path(name, encoding))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(self, name, encoding):
+        body = self._read(name, encoding)
+        if body is None and encoding != 'identity':
+            # Another client cached the page in another encoding.
+            page = self._read(name, 'identity')
+            if page is not None:
+                body = compress(page, encoding)
+                self._write(name, encoding, body)
+        return body
+
+    def put(self, name, encoding, page):
+        self._write(name, 'identity', page)
+        body = page
+        if encoding != 'identity':
+            body = compress(page, encoding)
+            self._write(name, encoding, body)
+        self.maybe_prune()
+        return body
+
+    def maybe_prune(self):
+        if time.monotonic() - self._pruned_at < PRUNE_INTERVAL or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._pruned_at = time.monotonic()
+            self.prune()
+        finally:
+            self._prune_lock.release()
+
+    def prune(self, everything=False):
+        """Delete expired entries, then the oldest until under max_bytes;
+        returns the number of files deleted."""
+        now = time.time()
+        files, deleted = [], 0
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if everything or now - stat.st_mtime > self.max_age:
+                deleted += self._unlink(entry.path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            deleted += self._unlink(path)
+            total -= size
+        return deleted
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def stats(self):
+        files = [entry.stat().st_size for entry in os.scandir(self.directory) if not entry.name.startswith('.')]
+        return {'directory': self.directory, 'files': len(files), 'bytes': sum(files)}
+
+    def respond(self, tables, view, args, kwargs):
+        versions = db.table_versions(tables)
+        key = '%s %s %s' % (request.endpoint, request.full_path, ' '.join('%s=%d' % v for v in sorted(versions.items())))
+        name = hashlib.sha1(key.encode()).hexdigest()
+        encoding = negotiate()
+        etag = '%s-%s' % (name[:20], encoding)
+        if etag in request.if_none_match:
+            metrics.PAGE_CACHE.inc(request.endpoint, 'not_modified')
+            return self._response(Response(status=304), etag, encoding)
+
+        body = self.get(name, encoding)
+        if body is not None:
+            metrics.PAGE_CACHE.inc(request.endpoint, 'hit')
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.mimetype != 'text/html' or response.is_streamed:
+                return response
+            metrics.PAGE_CACHE.inc(request.endpoint, 'miss')
+            body = self.put(name, encoding, response.get_data())
+        return self._response(Response(body, mimetype='text/html'), etag, encoding)
+
+    def _response(self, response, etag, encoding):
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        # Browsers revalidate every time; an unchanged page costs one Table_Version query and a 304.
+        response.cache_control.no_cache = True
+        return response
+
+
+def cached(tables):
+    """Serve a GET view from the page cache, keyed on the URL and the
+    versions of `tables`, which must cover every table the page reads.
+
+    Pages with flashed messages waiting are rendered as usual and not stored.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('page_cache')
+            if cache is None or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            return cache.respond(tables, view, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def compress_response(response):
+    """Compress other HTML and JSON responses when the client accepts it."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate()
+    if encoding == 'identity' or (response.content_length or 0) < Config.COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    if Config.PAGE_CACHE:
+        directory = Config.PAGE_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'disaster-page-cache')
+        app.extensions['page_cache'] = PageCache(directory, Config.PAGE_CACHE_MAX_AGE, Config.PAGE_CACHE_MAX_BYTES)
+    app.after_request(compress_response)
@@ -0,0 +1,165 @@
+import base64
+import datetime
+import decimal
+import json
+from collections import namedtuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    def plain(v):
+        if isinstance(v, (datetime.date, datetime.time, datetime.timedelta, decimal.Decimal)):
+            return str(v)
+        return v
+    raw = json.dumps([plain(v) for v in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    # Only scalars can be bound as query parameters.
+    if any(isinstance(v, bool) or not isinstance(v, (str, int, float)) for v in values):
+        return None
+    return values
+
+
+PagePlan = namedtuple('PagePlan', 'sort order size key backward sql args')
+
+
+class Page:
+    def __init__(self, rows, sort, order, size, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.sort = sort
+        self.order = order
+        self.size = size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def args(self, **overrides):
+        # Query-string arguments that keep the current sort/size when following a link.
+        args = {'sort': self.sort, 'order': self.order, 'size': self.size}
+        args.update(overrides)
+        return {k: v for k, v in args.items() if v is not None}
+
+
+class Paginator:
+    """Keyset (seek) pagination over a single table.
+
+    Rows are ordered by (sort column, primary key) and each page is fetched with
+    a WHERE clause that starts right after the last key seen, so the cost of a
+    page does not depend on how deep into the table it is.  Only NOT NULL,
+    indexed columns should be listed as sortable.
+    """
+
+    def __init__(self, table, pk, columns, sortable=(), default_order='asc', per_page=DEFAULT_PAGE_SIZE, record=None):
+        self.table = table
+        self.pk = pk
+        self.columns = list(columns)
+        self.sortable = [pk] + [c for c in sortable if c != pk]
+        self.default_order = default_order
+        self.per_page = per_page
+        self.record = record
+        self._sql = {}
+
+    def query(self, sort, order, key=None, backward=False, limit=DEFAULT_PAGE_SIZE):
+        if key is None:
+            args = ()
+        elif sort == self.pk:
+            args = (key[1],)
+        else:
+            args = (key[0], key[0], key[1])
+        # Only a handful of distinct statements exist per table; build each once.
+        shape = (sort, order, key is not None, backward, limit)
+        sql = self._sql.get(shape)
+        if sql is None:
+            sql = self._sql[shape] = self._build(sort, order, key is not None, backward, limit)
+        return sql, args
+
+    def _build(self, sort, order, seek, backward, limit):
+        # Walking backwards is the same seek with the comparison and ORDER BY flipped.
+        ascending = (order == 'asc') != backward
+        op, direction = ('>', 'ASC') if ascending else ('<', 'DESC')
+        sql = "SELECT %s FROM %s" % (', '.join(self.columns), self.table)
+        if seek:
+            if sort == self.pk:
+                sql += " WHERE %s %s %%s" % (self.pk, op)
+            else:
+                sql += " WHERE (%s %s %%s OR (%s = %%s AND %s %s %%s))" % (sort, op, sort, self.pk, op)
+        if sort == self.pk:
+            sql += " ORDER BY %s %s" % (self.pk, direction)
+        else:
+            sql += " ORDER BY %s %s, %s %s" % (sort, direction, self.pk, direction)
+        sql += " LIMIT %d" % limit
+        return sql
+
+    def key_of(self, row, sort):
+        return [row[self.columns.index(sort)], row[self.columns.index(self.pk)]]
+
+    def page(self, fetch_all, params):
+        plan = self.plan(params)
+        return self.finish(plan, fetch_all(plan.sql, plan.args))
+
+    async def page_async(self, fetch_all, params):
+        plan = self.plan(params)
+        return self.finish(plan, await fetch_all(plan.sql, plan.args))
+
+    def plan(self, params):
+        """Work out the sort, page size and seek key from the request
+        parameters, and the statement that fetches the page."""
+        sort = params.get('sort')
+        if sort not in self.sortable:
+            sort = self.pk
+        order = params.get('order')
+        if order not in ('asc', 'desc'):
+            order = self.default_order
+        try:
+            size = int(params.get('size', self.per_page))
+        except (TypeError, ValueError):
+            size = self.per_page
+        size = max(1, min(size, MAX_PAGE_SIZE))
+
+        after, before = params.get('after'), params.get('before')
+        backward = bool(before) and not after
+        key = decode_cursor(before if backward else after) if (after or before) else None
+        if key is None:
+            backward = False
+
+        sql, args = self.query(sort, order, key, backward, size + 1)
+        return PagePlan(sort, order, size, key, backward, sql, args)
+
+    def finish(self, plan, rows):
+        rows = list(rows)
+        if self.record is not None:
+            rows = [self.record._make(row) for row in rows]
+        more = len(rows) > plan.size
+        rows = rows[:plan.size]
+        if plan.backward:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            first = encode_cursor(self.key_of(rows[0], plan.sort))
+            last = encode_cursor(self.key_of(rows[-1], plan.sort))
+            if plan.backward:
+                next_cursor = last
+                prev_cursor = first if more else None
+            else:
+                next_cursor = last if more else None
+                prev_cursor = first if plan.key is not None else None
+        return Page(rows, plan.sort, plan.order, plan.size, next_cursor, prev_cursor)
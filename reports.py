@@ -0,0 +1,89 @@
+import db
+
+# Rollup table -> query that recomputes it from the raw tables.  All queries
+# here go through the driver's %-formatting, hence the doubled %%.
+ROLLUPS = {
+    'Donation_By_Donor': "SELECT Donor_ID, COUNT(*), SUM(Amount) FROM Donation GROUP BY Donor_ID",
+    'Donation_By_Resource': "SELECT Resource_ID, COUNT(*), SUM(Amount) FROM Donation GROUP BY Resource_ID",
+    'Donation_By_Month': "SELECT DATE_FORMAT(Donation_date, '%%Y-%%m-01'), COUNT(*), SUM(Amount) FROM Donation "
+                         "GROUP BY DATE_FORMAT(Donation_date, '%%Y-%%m-01')",
+    'Victim_By_Disaster': "SELECT Disaster_ID, COUNT(*) FROM Victim GROUP BY Disaster_ID",
+    'Victim_By_Age_Band': "SELECT age_band(Age), COUNT(*) FROM Victim GROUP BY age_band(Age)",
+    'Rescue_By_Disaster_Type': "SELECT Disaster_ID, IFNULL(Team_type, 'Unknown'), COUNT(*), SUM(No_of_People) "
+                               "FROM Rescue_Team GROUP BY Disaster_ID, IFNULL(Team_type, 'Unknown')",
+}
+
+# Tables the rollups are computed from or the reports look names up in; a
+# cached /reports page is keyed on their versions.
+TABLES = ['Donation', 'Donor', 'Resources', 'Victim', 'Disaster', 'Relief_Camp', 'Rescue_Team']
+
+class Report:
+    def __init__(self, key, title, columns, query, group):
+        self.key = key
+        self.title = title
+        self.columns = columns
+        self.query = query
+        self.group = group
+
+
+# Every report reads a rollup table (plus primary-key lookups for names).
+REPORTS = [
+    Report('donor', 'Donations per donor (top 50)', ['Donor', 'Donations', 'Total (₹)'],
+           "SELECT IFNULL(d.Donor_name, CONCAT('#', r.Donor_ID)), r.Donations, r.Total FROM Donation_By_Donor r "
+           "LEFT JOIN Donor d ON d.Donor_ID = r.Donor_ID WHERE r.Donations > 0 ORDER BY r.Total DESC LIMIT 50",
+           'donations'),
+    Report('resource', 'Donations per resource', ['Resource', 'Donations', 'Total (₹)'],
+           "SELECT IFNULL(CONCAT(s.R_name, ' (', s.R_type, ')'), CONCAT('#', r.Resource_ID)), r.Donations, r.Total "
+           "FROM Donation_By_Resource r LEFT JOIN Resources s ON s.Resource_ID = r.Resource_ID "
+           "WHERE r.Donations > 0 ORDER BY r.Total DESC LIMIT 100",
+           'donations'),
+    Report('month', 'Donations per month', ['Month', 'Donations', 'Total (₹)'],
+           "SELECT DATE_FORMAT(Month, '%%Y-%%m'), Donations, Total FROM Donation_By_Month "
+           "WHERE Donations > 0 ORDER BY Month DESC LIMIT 36",
+           'donations'),
+    Report('disaster', 'Victims per disaster', ['Disaster', 'Victims'],
+           "SELECT IFNULL(CONCAT('#', d.Disaster_ID, ' ', d.D_type, ', ', d.D_date), CONCAT('#', r.Disaster_ID)), r.Victims "
+           "FROM Victim_By_Disaster r LEFT JOIN Disaster d ON d.Disaster_ID = r.Disaster_ID "
+           "WHERE r.Victims > 0 ORDER BY r.Victims DESC LIMIT 100",
+           'victims'),
+    Report('camp', 'Victims per relief camp', ['Camp', 'Victims', 'Capacity'],
+           "SELECT c.Camp_Name, o.Occupied, c.Capacity FROM Camp_Occupancy o "
+           "JOIN Relief_Camp c ON c.Camp_ID = o.Camp_ID WHERE o.Occupied > 0 ORDER BY o.Occupied DESC LIMIT 100",
+           'victims'),
+    Report('age', 'Victims per age band', ['Age band', 'Victims'],
+           "SELECT Band, Victims FROM Victim_By_Age_Band WHERE Victims > 0 ORDER BY Band",
+           'victims'),
+    Report('rescue_disaster', 'Rescue personnel per disaster', ['Disaster', 'Teams', 'People'],
+           "SELECT IFNULL(CONCAT('#', d.Disaster_ID, ' ', d.D_type, ', ', d.D_date), CONCAT('#', r.Disaster_ID)), "
+           "SUM(r.Teams), SUM(r.People) FROM Rescue_By_Disaster_Type r "
+           "LEFT JOIN Disaster d ON d.Disaster_ID = r.Disaster_ID GROUP BY r.Disaster_ID "
+           "HAVING SUM(r.Teams) > 0 ORDER BY SUM(r.People) DESC LIMIT 100",
+           'rescue'),
+    Report('rescue_type', 'Rescue personnel per team type', ['Team type', 'Teams', 'People'],
+           "SELECT Team_type, SUM(Teams), SUM(People) FROM Rescue_By_Disaster_Type "
+           "GROUP BY Team_type HAVING SUM(Teams) > 0 ORDER BY SUM(People) DESC",
+           'rescue'),
+]
+
+
+def run_reports(group=None):
+    return [(report, db.fetch_all(report.query)) for report in REPORTS if group in (None, report.group)]
+
+
+def rebuild_rollups():
+    """Recompute every rollup from the raw tables in one transaction."""
+    conn = db.get_connection()
+    cur = conn.cursor()
+    counts = {}
+    try:
+        for table, query in ROLLUPS.items():
+            cur.execute("DELETE FROM %s" % table)
+            cur.execute("INSERT INTO %s %s" % (table, query), ())
+            counts[table] = cur.rowcount
+        db.commit(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return counts
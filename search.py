@@ -0,0 +1,287 @@
+import heapq
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from operator import itemgetter
+
+import db
+from config import Config
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+PHONE_CHARS_RE = re.compile(r'[\s\-+().]')
+
+MIN_SCORE = 0.4          # share of the query's trigrams a name must contain
+CANDIDATES = 200         # best raw matches re-scored exactly
+POSTINGS_BUDGET = 20000  # ids merged per query, rarest trigrams first
+
+
+def words(text):
+    return WORD_RE.findall((text or '').lower())
+
+
+def name_trigrams(name):
+    # Each word is padded on both sides, so '  s', ' sh' anchor word prefixes.
+    grams = set()
+    for word in words(name):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def query_trigrams(tokens):
+    # No trailing pad: a query token may be the prefix of a longer word.
+    grams = set()
+    for token in tokens:
+        padded = '  ' + token
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """In-memory trigram index over one name column.
+
+    Postings are append-only int arrays; edits and deletes leave stale
+    entries behind, which are filtered out when candidates are re-scored
+    against the current name and dropped when the index is compacted.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.postings = {}
+        self.max_id = 0
+        self.stale = 0
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def _add(self, id, name):
+        old = self.names.get(id)
+        if old is not None:
+            self.stale += len(name_trigrams(old))
+        self.names[id] = name
+        for gram in name_trigrams(name):
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('i')
+            posting.append(id)
+            self.total += 1
+        if id > self.max_id:
+            self.max_id = id
+
+    def add(self, id, name):
+        with self.lock:
+            self._add(id, name)
+            self._maybe_compact()
+
+    def add_many(self, rows):
+        with self.lock:
+            for id, name in rows:
+                self._add(id, name)
+            self._maybe_compact()
+
+    def remove(self, id):
+        with self.lock:
+            name = self.names.pop(id, None)
+            if name is not None:
+                self.stale += len(name_trigrams(name))
+                self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.stale > 1000 and self.stale * 4 > self.total:
+            names = self.names
+            self.names, self.postings, self.stale, self.total = {}, {}, 0, 0
+            for id, name in names.items():
+                self._add(id, name)
+
+    def search(self, query, limit=20):
+        tokens = words(query)
+        if not tokens:
+            return []
+        grams = query_trigrams(tokens)
+        with self.lock:
+            lists = sorted((self.postings.get(g, ()) for g in grams), key=len)
+            hits = Counter()
+            room = POSTINGS_BUDGET
+            for posting in lists:
+                # Rare trigrams are merged first and decide the candidates; a
+                # common trigram only contributes a bounded slice of its ids.
+                if room <= 0:
+                    break
+                if len(posting) > room:
+                    posting = posting[:room]
+                hits.update(posting)
+                room -= len(posting)
+            candidates = heapq.nlargest(CANDIDATES, hits.items(), key=itemgetter(1))
+            names = [(id, self.names.get(id)) for id, _ in candidates]
+
+        results = []
+        for id, name in names:
+            if name is None:
+                continue
+            name_grams = name_trigrams(name)
+            overlap = len(grams & name_grams)
+            if overlap < MIN_SCORE * len(grams):
+                continue
+            # Mostly query coverage; the rest prefers names without extra letters.
+            score = 0.8 * overlap / len(grams) + 0.2 * overlap / len(name_grams)
+            name_words = words(name)
+            if all(any(w.startswith(t) for w in name_words) for t in tokens):
+                score += 0.5
+            if all(t in name_words for t in tokens):
+                score += 0.25
+            results.append((round(score, 3), id, name))
+        results.sort(key=lambda r: (-r[0], len(r[2]), r[1]))
+        return results[:limit]
+
+
+class SearchTarget:
+    def __init__(self, kind, table, pk, name_column, contact_column):
+        self.kind = kind
+        self.table = table
+        self.pk = pk
+        self.name_column = name_column
+        self.contact_column = contact_column
+        self.index = TrigramIndex()
+        self.ready = False
+        self.version = None
+        self.built_at = 0.0
+        self.pending = None
+        self._building = threading.Lock()
+
+    def build(self):
+        # Runs without a request: read straight from the pool.
+        if not self._building.acquire(blocking=False):
+            return
+        try:
+            # Changes saved by this worker while the scan runs are replayed on top.
+            self.pending = []
+            version = list(db.iter_rows("SELECT Version FROM Table_Version WHERE Table_name=%s", (self.table,)))
+            index = TrigramIndex()
+            index.add_many(db.iter_rows("SELECT %s, %s FROM %s" % (self.pk, self.name_column, self.table)))
+            pending, self.pending = self.pending, None
+            for id, name in pending:
+                if name is None:
+                    index.remove(id)
+                else:
+                    index.add(id, name)
+            self.index = index
+            self.version = version[0][0] if version else 0
+            self.built_at = time.monotonic()
+            self.ready = True
+        finally:
+            self.pending = None
+            self._building.release()
+
+    def saved(self, id, name):
+        if self.pending is not None:
+            self.pending.append((id, name))
+        if self.ready:
+            self.index.add(id, name)
+
+    def deleted(self, id):
+        if self.pending is not None:
+            self.pending.append((id, None))
+        if self.ready:
+            self.index.remove(id)
+
+    def build_in_background(self):
+        if not self._building.locked():
+            threading.Thread(target=self.build, daemon=True).start()
+
+    def refresh(self):
+        """Bring the index up to date with writes made by other workers.
+
+        New rows are appended cheaply (pk > max indexed id).  Edits made by
+        other processes are only picked up by the periodic full rebuild.
+        """
+        version = db.table_version(self.table)
+        if version == self.version:
+            return
+        rows = db.fetch_all("SELECT %s, %s FROM %s WHERE %s > %%s ORDER BY %s"
+                            % (self.pk, self.name_column, self.table, self.pk, self.pk), (self.index.max_id,))
+        self.index.add_many(rows)
+        self.version = version
+        if time.monotonic() - self.built_at > Config.SEARCH_REBUILD_INTERVAL:
+            self.build_in_background()
+
+    def search_names(self, query, limit):
+        if not self.ready:
+            # Index still loading: fall back to the name index in MySQL (prefix only).
+            self.build_in_background()
+            rows = db.fetch_all("SELECT %s, %s FROM %s WHERE %s LIKE %%s ESCAPE '!' ORDER BY %s LIMIT %d"
+                                % (self.pk, self.name_column, self.table, self.name_column, self.name_column, limit),
+                                (escape_like(query.strip()) + '%',))
+            return [(1.0, id, name) for id, name in rows]
+        self.refresh()
+        return self.index.search(query, limit)
+
+    def search_contacts(self, digits, limit):
+        rows = db.fetch_all("SELECT %s, %s FROM %s WHERE %s LIKE %%s ORDER BY %s LIMIT %d"
+                            % (self.pk, self.contact_column, self.table, self.contact_column, self.contact_column, limit),
+                            (digits + '%',))
+        return [(1.0 if contact == digits else 0.5 + len(digits) / (2.0 * len(contact)), id, contact)
+                for id, contact in rows]
+
+    def load(self, ids):
+        if not ids:
+            return {}
+        rows = db.fetch_all("SELECT %s, %s, %s FROM %s WHERE %s IN (%s)"
+                            % (self.pk, self.name_column, self.contact_column, self.table, self.pk,
+                               ','.join(['%s'] * len(ids))), tuple(ids))
+        return {row[0]: row for row in rows}
+
+
+TARGETS = {
+    'victim': SearchTarget('victim', 'Victim', 'Victim_ID', 'Vic_name', 'Contact'),
+    'volunteers': SearchTarget('volunteers', 'Volunteers', 'Volunteer_ID', 'V_name', 'Contact_Info'),
+    'donor': SearchTarget('donor', 'Donor', 'Donor_ID', 'Donor_name', 'Contact'),
+}
+BY_TABLE = {target.table: target for target in TARGETS.values()}
+
+
+def escape_like(value):
+    return value.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+
+def row_saved(table, id, name):
+    if table in BY_TABLE:
+        BY_TABLE[table].saved(id, name)
+
+
+def row_deleted(table, id):
+    if table in BY_TABLE:
+        BY_TABLE[table].deleted(id)
+
+
+def search(query, kinds=None, limit=20):
+    """Ranked name/contact search across victims, volunteers and donors.
+
+    A query that is mostly digits is matched against contact numbers
+    (exact, then prefix) through their UNIQUE index; anything else is a
+    prefix/fuzzy name match through the trigram index.  Hits are re-read
+    from the database by primary key, so deleted rows never show up.
+    """
+    query = (query or '').strip()
+    targets = [TARGETS[k] for k in (kinds or TARGETS) if k in TARGETS]
+    digits = PHONE_CHARS_RE.sub('', query)
+    by_contact = digits.isdigit() and len(digits) >= 3
+    if not by_contact and len(query) < 2:
+        return []
+
+    hits = []
+    for target in targets:
+        matches = target.search_contacts(digits, limit) if by_contact else target.search_names(query, limit)
+        hits.extend((score, target, id) for score, id, _ in matches)
+    hits.sort(key=lambda h: -h[0])
+    hits = hits[:limit]
+
+    rows = {}
+    for target in targets:
+        rows[target.kind] = target.load([id for _, t, id in hits if t is target])
+    results = []
+    for score, target, id in hits:
+        row = rows[target.kind].get(id)
+        if row is not None:
+            results.append({'type': target.kind, 'id': id, 'name': row[1], 'contact': row[2], 'score': score})
+    return results
@@ -0,0 +1,323 @@
+"""Embedded SQLite storage, used when Config.DB_BACKEND is 'sqlite'.
+
+connect() returns a connection that stands in for a MySQLdb one under the
+pool in db.py: queries keep their %s placeholders and the few MySQL
+functions the app uses (NOW(), CONCAT(), DATE_FORMAT(), age_band(), ...),
+DATE/DATETIME/TIME/DECIMAL columns come back as the same Python types, and
+errors carry MySQL error codes, so callers that check for a deadlock, a
+duplicate key or a trigger's SIGNAL need no SQLite branch.
+
+SQLite allows one writer at a time.  A transaction starts with BEGIN
+IMMEDIATE at its first write or SELECT ... FOR UPDATE and holds the write
+lock until commit, so row locks become one database lock: transactions
+never deadlock, they queue for at most SQLITE_BUSY_TIMEOUT seconds.  Reads
+outside a write transaction see the latest commit (WAL mode) and never wait.
+"""
+import atexit
+import datetime
+import decimal
+import functools
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+
+from config import Config
+
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_sqlite.sql')
+
+DatabaseError = sqlite3.DatabaseError
+IntegrityError = sqlite3.IntegrityError
+OperationalError = sqlite3.OperationalError
+ProgrammingError = sqlite3.ProgrammingError
+
+# MySQL error codes for SQLite's errors (see the module docstring).
+DUPLICATE_KEY = 1062
+NOT_NULL = 1048
+ROW_REFERENCED = 1451
+NO_REFERENCED_ROW = 1452
+CHECK_FAILED = 3819
+SIGNAL = 1644
+LOCK_WAIT_TIMEOUT = 1205
+UNKNOWN = 1105
+
+CONSTRAINT_ERRORS = [
+    ('UNIQUE constraint failed', DUPLICATE_KEY),
+    ('NOT NULL constraint failed', NOT_NULL),
+    ('CHECK constraint failed', CHECK_FAILED),
+    ('FOREIGN KEY constraint failed', NO_REFERENCED_ROW),
+]
+
+
+# --- TYPES ---
+# Values are stored as MySQL prints them and read back as MySQLdb returns
+# them.  Every DECIMAL column in the schema has two decimal places.
+
+CENTS = decimal.Decimal('0.01')
+
+def _time_text(value):
+    seconds = int(value.total_seconds())
+    return '%02d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def _timedelta(text):
+    hours, minutes, seconds = text.split(':')
+    return datetime.timedelta(hours=int(hours), minutes=int(minutes), seconds=float(seconds))
+
+def _converter(parse):
+    def convert(value):
+        text = value.decode()
+        try:
+            return parse(text)
+        except (ValueError, decimal.InvalidOperation):
+            return text
+    return convert
+
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' ', 'seconds'))
+sqlite3.register_adapter(datetime.time, lambda value: value.isoformat('seconds'))
+sqlite3.register_adapter(datetime.timedelta, _time_text)
+sqlite3.register_adapter(decimal.Decimal, str)
+sqlite3.register_converter('DATE', _converter(datetime.date.fromisoformat))
+sqlite3.register_converter('DATETIME', _converter(datetime.datetime.fromisoformat))
+sqlite3.register_converter('TIME', _converter(_timedelta))
+sqlite3.register_converter('DECIMAL', _converter(lambda text: decimal.Decimal(text).quantize(CENTS)))
+
+
+# --- MYSQL FUNCTIONS ---
+
+DATE_FORMATS = {'%Y': '%Y', '%m': '%m', '%d': '%d', '%H': '%H', '%i': '%M', '%s': '%S', '%%': '%%'}
+
+def _now():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _seconds_ago(seconds):
+    return (datetime.datetime.now() - datetime.timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S')
+
+def _concat(*parts):
+    # NULL if any part is NULL, as in MySQL (SQLite's own concat() skips them).
+    if any(part is None for part in parts):
+        return None
+    return ''.join(str(part) for part in parts)
+
+def _date_format(value, format):
+    if value is None:
+        return None
+    when = datetime.datetime.fromisoformat(str(value))
+    return when.strftime(re.sub(r'%.', lambda m: DATE_FORMATS.get(m.group(), m.group()), format))
+
+def _age_band(age):
+    # Same bands as the age_band() function in database.txt.
+    if age is None:
+        return None
+    if age < 18:
+        return '0-17'
+    if age < 30:
+        return '18-29'
+    if age < 45:
+        return '30-44'
+    if age < 60:
+        return '45-59'
+    return '60+'
+
+def _age_years(dob):
+    # TIMESTAMPDIFF(YEAR, dob, CURDATE())
+    if dob is None:
+        return None
+    born, today = datetime.date.fromisoformat(str(dob)[:10]), datetime.date.today()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+FUNCTIONS = [
+    ('NOW', 0, _now, False),
+    ('SECONDS_AGO', 1, _seconds_ago, False),
+    ('CONCAT', -1, _concat, True),
+    ('DATE_FORMAT', 2, _date_format, True),
+    ('age_band', 1, _age_band, True),
+    ('age_years', 1, _age_years, False),
+]
+
+
+# --- QUERIES ---
+
+PARAM_RE = re.compile(r'%([s%])')
+INTERVAL_RE = re.compile(r'NOW\(\)\s*-\s*INTERVAL\s+(%s|\d+)\s+SECOND', re.IGNORECASE)
+LOCKING_RE = re.compile(r'\s+FOR\s+UPDATE\s*$', re.IGNORECASE)
+WRITE_RE = re.compile(r'^\s*(?:INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+@functools.lru_cache(maxsize=1024)
+def translate(query, formatted):
+    """(SQLite statement, whether it needs the write lock) for a query
+    written for MySQLdb.  Like MySQLdb, %-sequences are only interpreted
+    when the query is given arguments."""
+    query, locking = LOCKING_RE.subn('', query)
+    query = INTERVAL_RE.sub(r'SECONDS_AGO(\1)', query)
+    if query.lstrip()[:8].upper() == 'EXPLAIN ':
+        query = 'EXPLAIN QUERY PLAN ' + query.lstrip()[8:]
+    if formatted:
+        query = PARAM_RE.sub(lambda m: '?' if m.group(1) == 's' else '%', query)
+    return query, bool(locking or WRITE_RE.match(query))
+
+
+def mysql_error(e, statement=''):
+    """The SQLite error e with MySQLdb-style (code, message) arguments."""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        for prefix, code in CONSTRAINT_ERRORS:
+            if message.startswith(prefix):
+                if code == NO_REFERENCED_ROW and statement.lstrip()[:6].upper() == 'DELETE':
+                    code = ROW_REFERENCED
+                return sqlite3.IntegrityError(code, message)
+        # RAISE(ABORT, ...) in a trigger: MySQLdb reports SIGNAL as an OperationalError.
+        return sqlite3.OperationalError(SIGNAL, message)
+    if isinstance(e, sqlite3.OperationalError) and 'locked' in message:
+        return sqlite3.OperationalError(LOCK_WAIT_TIMEOUT, message)
+    return type(e)(UNKNOWN, message)
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._conn.cursor()
+
+    def execute(self, query, args=None):
+        statement, writes = translate(query, args is not None)
+        self.connection._begin(writes)
+        try:
+            self._cursor.execute(statement, tuple(args or ()))
+        except sqlite3.Error as e:
+            raise mysql_error(e, statement) from e
+
+    def executemany(self, query, args):
+        statement, _ = translate(query, True)
+        self.connection._begin(True)
+        try:
+            self._cursor.executemany(statement, [tuple(row) for row in args])
+        except sqlite3.Error as e:
+            raise mysql_error(e, statement) from e
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return tuple(self._cursor.fetchall())
+
+    def fetchmany(self, size):
+        return tuple(self._cursor.fetchmany(size))
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path, scratch=False):
+        self._conn = sqlite3.connect(path, timeout=Config.SQLITE_BUSY_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        for name, args, function, deterministic in FUNCTIONS:
+            self._conn.create_function(name, args, function, deterministic=deterministic)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        # A scratch database is thrown away at exit, so it need not survive a power cut either.
+        self._conn.execute('PRAGMA synchronous = %s' % ('OFF' if scratch else 'NORMAL'))
+
+    def _begin(self, writes):
+        if writes and not self._conn.in_transaction:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+            except sqlite3.Error as e:
+                raise mysql_error(e) from e
+
+    def cursor(self, *_):
+        return Cursor(self)
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+# --- DATABASE FILE ---
+
+_scratch = None
+_ready = set()
+_lock = threading.Lock()
+
+def database_path():
+    global _scratch
+    path = Config.SQLITE_PATH
+    if path == ':memory:':
+        # Every pooled connection must see the same data, which a real
+        # :memory: database cannot offer, so use a temporary file.
+        with _lock:
+            if _scratch is None:
+                fd, _scratch = tempfile.mkstemp(prefix='disaster-', suffix='.db')
+                os.close(fd)
+                atexit.register(_remove, _scratch)
+        return _scratch
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    return path
+
+def _remove(path):
+    for name in (path, path + '-wal', path + '-shm'):
+        try:
+            os.unlink(name)
+        except FileNotFoundError:
+            pass
+
+
+def schema_statements():
+    statement = ''
+    with open(SCHEMA, encoding='utf-8') as f:
+        for line in f:
+            statement += line
+            if sqlite3.complete_statement(statement):
+                yield statement
+                statement = ''
+
+
+def load_schema(conn):
+    """Create the tables if the database is empty.  Runs under the write
+    lock, so worker processes starting together create them once."""
+    raw = conn._conn
+    raw.execute('PRAGMA journal_mode = WAL')
+    raw.execute('BEGIN IMMEDIATE')
+    try:
+        if raw.execute("SELECT 1 FROM sqlite_master WHERE name = 'Table_Version'").fetchone() is None:
+            for statement in schema_statements():
+                raw.execute(statement)
+        raw.execute('COMMIT')
+    except BaseException:
+        raw.execute('ROLLBACK')
+        raise
+
+
+def connect():
+    path = database_path()
+    conn = Connection(path, scratch=path == _scratch)
+    if path not in _ready:
+        with _lock:
+            if path not in _ready:
+                load_schema(conn)
+                _ready.add(path)
+    return conn
@@ -0,0 +1,37 @@
+"""The whole suite runs against one app on a scratch SQLite database that
+starts with the seed data of database_sqlite.sql (disasters 101-108, camps
+201-208, victims 301-308, resources 501-508, donors 701-708).
+
+The app can only be configured once per process (see factory.py), so the
+database is shared by every test: tests create the rows they change and
+use unique() for values that must not collide, such as contacts.
+"""
+import itertools
+import tempfile
+
+import pytest
+
+import factory
+
+app = factory.create_app(DB_BACKEND='sqlite', SQLITE_PATH=':memory:', ARCHIVE_DIR=tempfile.mkdtemp(prefix='archive-'),
+                         PAGE_CACHE=False, DELETE_CHUNK_SIZE=5, DELETE_CHUNK_PAUSE=0)
+_numbers = itertools.count(1)
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def ctx():
+    # An app context for calling modules directly; its pooled connection is
+    # returned when the test ends.
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def unique():
+    """unique(prefix) -> a 10-digit string not used elsewhere in the run."""
+    return lambda prefix=3: '%d%09d' % (prefix, next(_numbers))
@@ -0,0 +1,13 @@
+import allocation
+import db
+
+
+def test_rebuild_occupancy_repairs_drift_and_bumps_versions(ctx):
+    expected = allocation.occupancy([201, 202])
+    db.execute_commit("UPDATE Camp_Occupancy SET Occupied = Occupied + 5 WHERE Camp_ID = %s", (201,))
+    before = db.table_versions(['Relief_Camp', 'Victim'])
+
+    allocation.rebuild_occupancy()
+    assert allocation.occupancy([201, 202]) == expected
+    after = db.table_versions(['Relief_Camp', 'Victim'])
+    assert all(after[table] > before[table] for table in before)
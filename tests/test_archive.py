@@ -0,0 +1,38 @@
+import datetime
+
+import archive
+import db
+
+
+def test_old_log_rows_move_to_the_archive_and_stay_listed(client, ctx):
+    conn = db.get_connection()
+    cur = conn.cursor()
+    ids = []
+    for days in (400, 430, 800):
+        cur.execute("INSERT INTO Disaster_Delete_Log (Disaster_ID, D_type, Deleted_At) VALUES (%s, %s, %s)",
+                    (90000 + days, 'Flood', datetime.datetime.now() - datetime.timedelta(days=days)))
+        ids.append(cur.lastrowid)
+    cur.execute("INSERT INTO Sync_Operation (Client_ID, Op_Key, Resource, Row_ID, Status, Applied_At) "
+                "VALUES ('old-device', 'k1', 'donors', 701, 201, %s)", (datetime.datetime(2015, 1, 1),))
+    db.commit(conn)
+    cur.close()
+
+    assert archive.run(dry_run=True)['Disaster_Delete_Log'] == (3, [])
+    moved, dropped = archive.run()['Disaster_Delete_Log']
+    assert (moved, dropped) == (3, [])
+    assert archive.run()['Disaster_Delete_Log'] == (0, [])
+    marks = ','.join(['%s'] * len(ids))
+    assert db.fetch_one("SELECT COUNT(*) FROM Disaster_Delete_Log WHERE Log_ID IN (%s)" % marks, ids)[0] == 0
+
+    listed = []
+    url = '/api/v1/disaster_delete_log?size=2&order=asc'
+    while url:
+        body = client.get(url).get_json()
+        listed += [item['Log_ID'] for item in body['items']]
+        url = body['next']
+    assert set(ids) <= set(listed)
+    assert listed == sorted(listed)
+
+    # Sync keys are never archived: they are what makes an old journal replay safely.
+    assert 'Sync_Operation' not in archive.POLICIES
+    assert db.fetch_one("SELECT COUNT(*) FROM Sync_Operation WHERE Client_ID='old-device'", ())[0] == 1
@@ -0,0 +1,84 @@
+import io
+
+import pytest
+
+import db
+from bulk_import import IMPORTS, ImportReport, import_rows, insert_batch, read_rows
+
+
+def test_import_csv_rejects_only_bad_rows(ctx, unique):
+    first, second = unique(), unique()
+    data = ('Vic_name,DOB,Contact,Disaster_ID,Camp_ID\n'
+            'Asha Rao,1990-04-01,%s,101,\n'
+            'No Date,,%s,101,\n'
+            'Asha Twin,1990-04-01,%s,101,\n'
+            'Kiran Das,1985-01-01,%s,102,202\n') % (first, unique(), first, second)
+    report = import_rows('victim', read_rows(io.StringIO(data), 'victims.csv'), batch_size=10)
+    assert (report.rows, report.inserted, report.failed) == (4, 2, 2)
+    assert [line for line, _ in report.errors] == [3, 4]
+    assert 'UNIQUE' in report.errors[1][1]
+    assert db.fetch_one("SELECT COUNT(*) FROM Victim WHERE Contact IN (%s, %s)", (first, second))[0] == 2
+
+
+def test_import_jsonl(ctx, unique):
+    data = '{"V_name": "Ila", "Age": 30, "Gender": "Female", "Contact_Info": "%s"}\n\nnot json\n' % unique()
+    report = import_rows('volunteers', read_rows(io.StringIO(data), 'volunteers.jsonl'))
+    assert (report.rows, report.inserted, report.failed) == (2, 1, 1)
+    assert report.errors[0][0] == 3
+
+
+class FlakyConnection:
+    """Fails the first `failures` statements with a MySQL error code."""
+
+    def __init__(self, failures, code=1213):
+        self.failures = failures
+        self.code = code
+        self.commits = 0
+
+    def cursor(self):
+        return FlakyCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FlakyCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, args=None):
+        if self.conn.failures:
+            self.conn.failures -= 1
+            raise db.OperationalError(self.conn.code, 'Deadlock found when trying to get lock')
+
+    executemany = execute
+
+    def close(self):
+        pass
+
+
+def test_deadlocked_batch_is_retried_whole(ctx):
+    batch = [(2, ()), (3, ())]
+    report = ImportReport()
+    conn = FlakyConnection(failures=2)
+    insert_batch(conn, IMPORTS['victim'], batch, report)
+    assert (report.inserted, report.failed, conn.commits) == (2, 0, 1)
+
+    report = ImportReport()
+    insert_batch(FlakyConnection(failures=10), IMPORTS['victim'], batch, report)
+    assert (report.inserted, report.failed) == (0, 2)
+    assert report.errors[0][1].startswith('Not imported')
+
+
+def test_rows_are_counted_after_commit(ctx):
+    class FailingCommit(FlakyConnection):
+        def commit(self):
+            raise db.OperationalError(1105, 'disk full')
+
+    report = ImportReport()
+    with pytest.raises(db.OperationalError):
+        insert_batch(FailingCommit(failures=0), IMPORTS['victim'], [(2, ())], report)
+    assert report.inserted == 0
@@ -0,0 +1,38 @@
+from unittest import mock
+
+import changefeed
+import db
+from changefeed import ChangeFeed
+
+
+def log_change(change_id):
+    db.execute_commit("INSERT INTO Change_Log (Change_ID, Table_name, Row_ID, Op, Amount_Delta) "
+                      "VALUES (%s, 'Donation', 0, 'I', 1)", (change_id,))
+
+
+def test_late_commits_are_read_once(ctx):
+    feed = ChangeFeed(ctx, cache=None)
+    top = db.fetch_one("SELECT COALESCE(MAX(Change_ID), 0) FROM Change_Log", ())[0]
+    feed.last_change = top
+
+    # top + 1 took its id first but has not committed yet.
+    log_change(top + 2)
+    assert [row[0] for row in feed.read_changes()] == [top + 2]
+    assert list(feed.missing) == [top + 1]
+
+    log_change(top + 1)
+    assert [row[0] for row in feed.read_changes()] == [top + 1]
+    assert feed.read_changes() == []
+    assert feed.missing == {}
+
+
+def test_missing_ids_are_given_up_after_a_while(ctx):
+    feed = ChangeFeed(ctx, cache=None)
+    top = db.fetch_one("SELECT COALESCE(MAX(Change_ID), 0) FROM Change_Log", ())[0]
+    feed.last_change = top
+    log_change(top + 3)
+    feed.read_changes()
+    assert sorted(feed.missing) == [top + 1, top + 2]
+    with mock.patch.object(changefeed, 'GAP_TIMEOUT', 0):
+        assert feed.read_changes() == []
+    assert feed.missing == {}
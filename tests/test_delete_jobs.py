@@ -0,0 +1,83 @@
+import time
+from unittest import mock
+
+import pytest
+
+import db
+import delete_jobs
+from entities import BY_TABLE
+
+
+def new_disaster(client, victims, unique):
+    response = client.post('/api/v1/disasters', json={'D_type': 'Landslide', 'D_date': '2023-08-14', 'D_time': '04:30:00', 'Location_ID': 1})
+    assert response.status_code == 201
+    id = response.get_json()['Disaster_ID']
+    for i in range(victims):
+        assert client.post('/api/v1/victims', json={'Vic_name': 'Evacuee %d' % i, 'DOB': '1980-01-01',
+                                                    'Contact': unique(), 'Disaster_ID': id}).status_code == 201
+    return id
+
+
+def wait_for(client, url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(url).get_json()
+        if job['Status'] in ('done', 'failed') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_small_delete_runs_in_the_request(client, ctx, unique):
+    id = new_disaster(client, 2, unique)
+    assert client.delete('/api/v1/disasters/%d' % id).status_code == 204
+    assert db.fetch_one("SELECT COUNT(*) FROM Victim WHERE Disaster_ID=%s", (id,))[0] == 0
+    assert db.fetch_one("SELECT COUNT(*) FROM Disaster_Delete_Log WHERE Disaster_ID=%s", (id,))[0] == 1
+
+
+def test_large_delete_runs_in_chunks_in_the_background(client, ctx, unique):
+    id = new_disaster(client, 12, unique)  # DELETE_CHUNK_SIZE is 5 in the tests
+    response = client.delete('/api/v1/disasters/%d' % id)
+    assert response.status_code == 202
+    assert response.get_json()['Total'] == 13
+    job = wait_for(client, response.headers['Location'])
+    assert (job['Status'], job['Deleted'], job['Total']) == ('done', 13, 13)
+    assert client.get('/api/v1/disasters/%d' % id).status_code == 404
+    assert client.delete('/api/v1/disasters/%d' % id).status_code == 404
+
+
+def test_failed_job_is_recorded_on_a_fresh_connection(client, ctx, unique):
+    id = new_disaster(client, 1, unique)
+
+    def lost_connection(*args):
+        raise db.OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    # The background worker must not claim the job first.
+    with mock.patch.object(delete_jobs, 'claim_next', return_value=None), \
+            mock.patch.object(delete_jobs, 'delete_chunk', lost_connection):
+        job_id, total = delete_jobs.enqueue(BY_TABLE['Disaster'], id)
+        assert delete_jobs.claim(job_id)
+        broken = db.get_connection()
+        with pytest.raises(db.OperationalError):
+            delete_jobs.run(job_id)
+    assert db.get_connection() is not broken
+    status, error = db.fetch_one("SELECT Status, Error FROM Delete_Job WHERE Job_ID=%s", (job_id,))
+    assert status == 'failed'
+    assert 'Lost connection' in error
+    assert client.get('/api/v1/disasters/%d' % id).status_code == 200
+
+
+def test_disaster_with_rescue_teams_is_not_deleted(client, ctx, unique):
+    id = new_disaster(client, 1, unique)
+    team = client.post('/api/v1/rescue_teams', json={'Team_name': 'Ridge Unit', 'Team_type': 'Rescue',
+                                                     'No_of_People': 6, 'Disaster_ID': id}).get_json()['Team_ID']
+    response = client.delete('/api/v1/disasters/%d' % id)
+    assert response.status_code == 409
+    assert 'Rescue_Team' in response.get_json()['error']
+    with mock.patch.dict(client.application.config, WTF_CSRF_ENABLED=False):
+        page = client.post('/disaster/delete/%d' % id, follow_redirects=True)
+    assert b'still referenced by 1 Rescue_Team' in page.data
+    assert db.fetch_one("SELECT COUNT(*) FROM Victim WHERE Disaster_ID=%s", (id,))[0] == 1
+    assert db.fetch_one("SELECT COUNT(*) FROM Delete_Job WHERE Table_name='Disaster' AND Row_ID=%s", (id,))[0] == 0
+
+    assert client.delete('/api/v1/rescue_teams/%d' % team).status_code == 204
+    assert client.delete('/api/v1/disasters/%d' % id).status_code == 204
@@ -0,0 +1,24 @@
+from unittest import mock
+
+import db
+
+
+def test_export_streams_every_row(client, ctx):
+    lines = client.get('/export/victim.csv?columns=Victim_ID,Contact').data.decode().splitlines()
+    assert lines[0] == 'Victim_ID,Contact'
+    assert len(lines) - 1 == db.fetch_one("SELECT COUNT(*) FROM Victim", ())[0]
+
+
+def test_streamed_queries_reach_the_query_listeners(ctx):
+    heard = []
+    with mock.patch.object(db, 'query_listeners', [lambda *call: heard.append(call)]):
+        rows = list(db.iter_rows("SELECT Victim_ID FROM Victim WHERE Victim_ID < %s", (305,), size=2))
+        stream = db.iter_rows("SELECT Victim_ID FROM Victim", size=2)
+        next(stream)
+        stream.close()
+    (conn, query, args, seconds, count), (early_conn, _, _, _, early_count) = heard
+    assert query == "SELECT Victim_ID FROM Victim WHERE Victim_ID < %s"
+    assert (args, count, len(rows)) == ((305,), 4, 4)
+    assert conn is not None and seconds >= 0
+    # Abandoned mid-result: no connection to EXPLAIN on.
+    assert (early_conn, early_count) == (None, 2)
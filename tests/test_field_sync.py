@@ -0,0 +1,64 @@
+from unittest import mock
+
+import db
+import field_sync
+
+
+def create_location(key, city):
+    return {'key': key, 'op': 'create', 'resource': 'locations', 'data': {'City': city, 'District': 'D', 'State': 'S'}}
+
+
+def sync(client, device, operations):
+    return client.post('/api/v1/sync', json={'client': device, 'operations': operations})
+
+
+def test_replayed_journal_is_applied_once(client, ctx):
+    journal = [
+        create_location('loc', 'Sync Town'),
+        {'key': 'dis', 'op': 'create', 'resource': 'disasters',
+         'data': {'D_type': 'Flood', 'D_date': '2024-07-01', 'D_time': '10:00:00', 'Location_ID': {'$ref': 'loc'}}},
+        {'key': 'bad', 'op': 'update', 'resource': 'disasters', 'id': 999999, 'data': {'D_type': 'Fire'}},
+    ]
+    first = sync(client, 'device-1', journal).get_json()
+    assert [r['status'] for r in first['results']] == [201, 201, 404]
+    assert (first['applied'], first['failed'], first['replayed']) == (2, 1, 0)
+
+    again = sync(client, 'device-1', journal).get_json()
+    assert [r.get('replayed') for r in again['results'][:2]] == [True, True]
+    assert [r['id'] for r in again['results'][:2]] == [r['id'] for r in first['results'][:2]]
+    assert db.fetch_one("SELECT COUNT(*) FROM Location WHERE City = 'Sync Town'", ())[0] == 1
+
+
+def test_keys_are_scoped_to_the_client(client, ctx):
+    a = sync(client, 'device-a', [create_location('1', 'Client A Town')]).get_json()
+    b = sync(client, 'device-b', [create_location('1', 'Client B Town')]).get_json()
+    assert not b['results'][0].get('replayed')
+    assert a['results'][0]['id'] != b['results'][0]['id']
+
+
+def test_client_is_required(client):
+    response = client.post('/api/v1/sync', json={'operations': [create_location('1', 'Nowhere')]})
+    assert response.status_code == 400
+
+
+def test_conflicting_group_is_answered_not_raised(client, ctx):
+    real = field_sync.apply_group
+
+    def deadlock_on_second(device, operations, results):
+        if operations[0]['key'] == 'two':
+            raise field_sync.Conflict(503, '(1213, Deadlock found)')
+        return real(device, operations, results)
+
+    journal = [create_location('one', 'Group One'), create_location('two', 'Group Two'), create_location('three', 'Group Three')]
+    with mock.patch.object(field_sync.Config, 'SYNC_GROUP_SIZE', 1), \
+            mock.patch.object(field_sync, 'apply_group', deadlock_on_second):
+        response = sync(client, 'device-c', journal)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    body = response.get_json()
+    assert [r['status'] for r in body['results']] == [201, 503, 503]
+    assert (body['applied'], body['not_applied']) == (1, 2)
+
+    again = sync(client, 'device-c', journal).get_json()
+    assert [r.get('replayed', False) for r in again['results']] == [True, False, False]
+    assert db.fetch_one("SELECT COUNT(*) FROM Location WHERE City LIKE 'Group %%'", ())[0] == 3
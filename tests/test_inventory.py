@@ -0,0 +1,56 @@
+from unittest import mock
+
+import db
+import inventory
+
+
+def new_resource(client, quantity=10):
+    response = client.post('/api/v1/resources', json={'R_name': 'Tarpaulins', 'R_type': 'Shelter', 'Quantity': quantity})
+    assert response.status_code == 201
+    return response.get_json()['Resource_ID']
+
+
+def stock(resource_id):
+    return tuple(db.fetch_one("SELECT Quantity, Reserved FROM Resources WHERE Resource_ID=%s", (resource_id,)))
+
+
+def test_stock_movements_keep_the_ledger_balanced(client, ctx):
+    id = new_resource(client)
+    assert client.post('/api/v1/inventory/receive', json={'items': [{'Resource_ID': id, 'Quantity': 5}]}).status_code == 200
+    response = client.post('/api/v1/inventory/reserve', json={'items': [{'Resource_ID': id, 'Quantity': 8}]})
+    assert response.status_code == 201
+    reservation = response.get_json()['reservations'][0]['Reservation_ID']
+    assert stock(id) == (15, 8)
+
+    # Only the unreserved stock can be dispatched or reserved again.
+    assert client.post('/api/v1/inventory/dispatch', json={'items': [{'Resource_ID': id, 'Quantity': 8}]}).status_code == 409
+    assert client.post('/api/v1/inventory/reserve', json={'items': [{'Resource_ID': id, 'Quantity': 8}]}).status_code == 409
+    assert stock(id) == (15, 8)
+
+    assert client.post('/api/v1/reservations/%d/dispatch' % reservation, json={}).status_code == 200
+    assert stock(id) == (7, 0)
+    assert client.post('/api/v1/reservations/%d/release' % reservation, json={}).status_code == 409
+    assert client.post('/api/v1/inventory/adjust', json={'items': [{'Resource_ID': id, 'Quantity': -2}]}).status_code == 200
+    assert stock(id) == (5, 0)
+    assert inventory.mismatches() == ()
+
+
+def test_edits_leave_quantity_alone(client, ctx):
+    id = new_resource(client, quantity=40)
+    assert client.patch('/api/v1/resources/%d' % id, json={'R_name': 'Tents'}).status_code == 200
+    assert client.put('/api/v1/resources/%d' % id, json={'R_name': 'Tents', 'R_type': 'Shelter', 'Quantity': 40}).status_code == 200
+    response = client.patch('/api/v1/resources/%d' % id, json={'Quantity': 1})
+    assert response.status_code == 409
+    assert 'Quantity' in response.get_json()['fields']
+
+    with mock.patch.dict(client.application.config, WTF_CSRF_ENABLED=False):
+        response = client.post('/resources/edit/%d' % id, data={'R_name': 'Tarps', 'R_type': 'Shelter', 'Quantity': '3'})
+    assert response.status_code == 302
+    assert db.fetch_one("SELECT R_name, Quantity FROM Resources WHERE Resource_ID=%s", (id,)) == ('Tarps', 40)
+    assert inventory.mismatches() == ()
+
+
+def test_dispatching_the_last_unit_leaves_zero(client, ctx):
+    id = new_resource(client, quantity=3)
+    assert client.post('/api/v1/inventory/dispatch', json={'items': [{'Resource_ID': id, 'Quantity': 3}]}).status_code == 200
+    assert stock(id) == (0, 0)
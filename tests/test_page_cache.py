@@ -0,0 +1,73 @@
+import gzip
+import os
+from unittest import mock
+
+import pytest
+
+import metrics
+from page_cache import PageCache
+
+
+@pytest.fixture
+def cache(client, tmp_path, monkeypatch):
+    # The suite runs with PAGE_CACHE off; these tests switch it on in a temp directory.
+    page_cache = PageCache(str(tmp_path))
+    monkeypatch.setitem(client.application.extensions, 'page_cache', page_cache)
+    return page_cache
+
+
+def counted(result, endpoint='location_list'):
+    return metrics.PAGE_CACHE.series.get((endpoint, result), 0)
+
+
+def stored(cache):
+    return sorted(name for name in os.listdir(cache.directory) if not name.startswith('.'))
+
+
+def test_second_get_is_a_hit_and_etag_answers_304(client, cache):
+    first = client.get('/location')
+    assert first.status_code == 200
+    hits = counted('hit')
+    second = client.get('/location')
+    assert counted('hit') == hits + 1
+    assert second.data == first.data
+    assert second.headers['ETag'] == first.headers['ETag']
+
+    not_modified = counted('not_modified')
+    response = client.get('/location', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+    assert counted('not_modified') == not_modified + 1
+
+
+def test_a_write_shows_on_the_next_get(client, cache):
+    before = client.get('/location?sort=City')
+    assert client.get('/location?sort=City').headers['ETag'] == before.headers['ETag']
+    assert b'Cachetown' not in before.data
+    assert client.post('/api/v1/locations', json={'City': 'Cachetown', 'District': 'D', 'State': 'S'}).status_code == 201
+    after = client.get('/location?sort=City')
+    assert b'Cachetown' in after.data
+    assert after.headers['ETag'] != before.headers['ETag']
+
+
+def test_gzip_body_is_the_same_page(client, cache):
+    plain = client.get('/location').data
+    response = client.get('/location', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == plain
+
+
+def test_pages_with_pending_flashes_are_not_stored(client, cache):
+    with mock.patch.dict(client.application.config, WTF_CSRF_ENABLED=False):
+        response = client.post('/location/add', data={'City': 'Flashville', 'District': 'D', 'State': 'S'})
+    assert response.status_code == 302
+    files = stored(cache)
+    page = client.get('/location?sort=City&order=desc')
+    assert b'Flashville' in page.data
+    assert b'alert' in page.data
+    assert stored(cache) == files
+
+    # The flash was shown once; the same page is now cached without it.
+    page = client.get('/location?sort=City&order=desc')
+    assert b'alert' not in page.data
+    assert len(stored(cache)) > len(files)
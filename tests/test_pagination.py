@@ -0,0 +1,51 @@
+import datetime
+
+import db
+from pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    token = encode_cursor([datetime.date(2024, 2, 29), 301])
+    assert '=' not in token
+    assert decode_cursor(token) == ['2024-02-29', 301]
+    assert decode_cursor('not a cursor') is None
+    assert decode_cursor(encode_cursor([1, 2, 3])) is None
+    assert decode_cursor(encode_cursor([1, [1]])) is None
+    assert decode_cursor(encode_cursor(['a', {}])) is None
+    assert decode_cursor(encode_cursor([True, 1])) is None
+
+
+def test_crafted_cursors_fall_back_to_the_first_page(client):
+    first = client.get('/api/v1/victims?size=3').get_json()
+    for cursor in ('WzEsWzFdXQ', encode_cursor([1, {'a': 1}])):  # [1,[1]] and an object
+        response = client.get('/api/v1/victims?size=3&after=%s' % cursor)
+        assert response.status_code == 200
+        assert response.get_json()['items'] == first['items']
+        assert client.get('/api/v1/victims?size=3&before=%s' % cursor).status_code == 200
+    assert client.get('/victim?sort=Vic_name&after=WyJhIix7fV0').status_code == 200
+
+
+def walk(client, url, direction='next'):
+    pages = []
+    while url:
+        body = client.get(url).get_json()
+        pages.append([item['Victim_ID'] for item in body['items']])
+        url = body[direction]
+    return pages
+
+
+def test_api_pages_follow_the_sort_order(client, ctx, unique):
+    for name in ('Zed', 'Amit Sharma', 'amit sharma', 'Mira'):
+        client.post('/api/v1/victims', json={'Vic_name': name, 'DOB': '1990-01-01', 'Contact': unique(), 'Disaster_ID': 102})
+    expected = [row[0] for row in db.fetch_all("SELECT Victim_ID FROM Victim ORDER BY Vic_name DESC, Victim_ID DESC")]
+
+    pages = walk(client, '/api/v1/victims?sort=Vic_name&order=desc&size=3&fields=Victim_ID,Vic_name')
+    assert [id for page in pages for id in page] == expected
+    assert all(len(page) == 3 for page in pages[:-1])
+
+    # The last page's prev links lead back through the same pages.
+    body = client.get('/api/v1/victims?sort=Vic_name&order=desc&size=3').get_json()
+    while body['next']:
+        body = client.get(body['next']).get_json()
+    back = [[item['Victim_ID'] for item in body['items']]] + walk(client, body['prev'], 'prev')
+    assert back == pages[::-1]
@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+import db
+from sqlite_db import mysql_error, translate
+
+
+def sqlite_error(*statements):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.executescript("""
+        CREATE TABLE Parent (Id INTEGER PRIMARY KEY, Name TEXT NOT NULL UNIQUE, Size INT CHECK (Size > 0));
+        CREATE TABLE Child (Id INTEGER PRIMARY KEY, Parent_ID INT REFERENCES Parent(Id));
+        CREATE TRIGGER no_big BEFORE INSERT ON Child WHEN NEW.Id > 100 BEGIN SELECT RAISE(ABORT, 'Too big'); END;
+        INSERT INTO Parent VALUES (1, 'a', 1);
+        INSERT INTO Child VALUES (1, 1);
+    """)
+    try:
+        for statement in statements:
+            conn.execute(statement)
+    except sqlite3.Error as e:
+        return e, statement
+    finally:
+        conn.close()
+    raise AssertionError('no error')
+
+
+@pytest.mark.parametrize('statement, error, code', [
+    ("INSERT INTO Parent VALUES (2, 'a', 1)", sqlite3.IntegrityError, 1062),
+    ("INSERT INTO Parent VALUES (2, NULL, 1)", sqlite3.IntegrityError, 1048),
+    ("INSERT INTO Parent VALUES (2, 'b', 0)", sqlite3.IntegrityError, 3819),
+    ("INSERT INTO Child VALUES (2, 99)", sqlite3.IntegrityError, 1452),
+    ("DELETE FROM Parent WHERE Id = 1", sqlite3.IntegrityError, 1451),
+    ("INSERT INTO Child VALUES (101, 1)", sqlite3.OperationalError, 1644),
+    ("SELECT * FROM Nowhere", sqlite3.OperationalError, 1105),
+])
+def test_mysql_error_codes(statement, error, code):
+    e, statement = sqlite_error(statement)
+    mapped = mysql_error(e, statement)
+    assert type(mapped) is error
+    assert mapped.args[0] == code
+    assert mapped.args[1] == str(e)
+
+
+def test_mysql_error_lock_timeout():
+    e = sqlite3.OperationalError('database is locked')
+    assert mysql_error(e).args[0] == 1205
+
+
+def test_translate():
+    assert translate("SELECT * FROM Victim WHERE Victim_ID=%s FOR UPDATE", True) == \
+        ("SELECT * FROM Victim WHERE Victim_ID=?", True)
+    assert translate("SELECT 1 FROM Delete_Job WHERE Updated_At < NOW() - INTERVAL %s SECOND", True) == \
+        ("SELECT 1 FROM Delete_Job WHERE Updated_At < SECONDS_AGO(?)", False)
+    assert translate("EXPLAIN SELECT * FROM Victim", False) == ("EXPLAIN QUERY PLAN SELECT * FROM Victim", False)
+    assert translate("UPDATE Victim SET Vic_name=%s WHERE Vic_name LIKE 'a%%'", True) == \
+        ("UPDATE Victim SET Vic_name=? WHERE Vic_name LIKE 'a%'", True)
+    # Without arguments %-sequences are left alone, as MySQLdb does.
+    assert translate("SELECT DATE_FORMAT(D_date, '%Y-%m') FROM Disaster", False) == \
+        ("SELECT DATE_FORMAT(D_date, '%Y-%m') FROM Disaster", False)
+
+
+def test_errors_reach_callers_with_mysql_codes(ctx):
+    conn = db.get_connection()
+    cur = conn.cursor()
+    insert = "INSERT INTO Victim (Vic_name, DOB, Contact, Disaster_ID) VALUES (%s, %s, %s, %s)"
+    try:
+        with pytest.raises(db.IntegrityError) as duplicate:
+            cur.execute(insert, ('Dup', '1990-01-01', '9876543210', 101))  # victim 301's contact
+        with pytest.raises(db.IntegrityError) as orphan:
+            cur.execute(insert, ('Orphan', '1990-01-01', '0000000001', 999))
+    finally:
+        conn.rollback()
+        cur.close()
+    assert duplicate.value.args[0] == 1062
+    assert orphan.value.args[0] == 1452